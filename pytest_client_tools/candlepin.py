@@ -3,7 +3,7 @@
 
 import time
 
-from .restclient import RestClient
+from .restclient import AsyncRestClient, RestClient
 from .util import Version
 
 
@@ -19,10 +19,12 @@ class Candlepin:
         self._port = port
         self._prefix = prefix
         self._insecure = insecure
-        self._rest_client = RestClient(
-            base_url=f"https://{self._host}:{self._port}{self._prefix}",
-            verify=False,
-        )
+        self._rest_client_kwargs = {
+            "base_url": f"https://{self._host}:{self._port}{self._prefix}",
+            "verify": False,
+        }
+        self._rest_client = RestClient(**self._rest_client_kwargs)
+        self._async_rest_client = None
 
     @property
     def host(self):
@@ -64,6 +66,23 @@ class Candlepin:
         """
         return self._rest_client.post(path, data, **kwargs)
 
+    def _get_async_rest_client(self):
+        if self._async_rest_client is None:
+            self._async_rest_client = AsyncRestClient(**self._rest_client_kwargs)
+        return self._async_rest_client
+
+    async def aget(self, path, **kwargs):
+        """
+        Perform a GET REST call, using asyncio.
+        """
+        return await self._get_async_rest_client().get(path, **kwargs)
+
+    async def apost(self, path, data, **kwargs):
+        """
+        Perform a POST REST call, using asyncio.
+        """
+        return await self._get_async_rest_client().post(path, data, **kwargs)
+
     def status(self):
         """
         Get the status of the Candlepin server.
@@ -0,0 +1,413 @@
+# SPDX-FileCopyrightText: Red Hat
+# SPDX-License-Identifier: MIT
+
+import email.parser
+import email.policy
+import itertools
+import json
+import os
+import pathlib
+import shutil
+import threading
+import urllib.parse
+import uuid
+import zipfile
+
+from .fake_inventory import FakeInventoryServer, _FakeInventoryHandler
+from .logger import LOGGER
+from .util import Version
+
+
+# the canonical facts of the uploads which are stored as fields of the hosts
+_HOST_FACTS = ("display_name", "fqdn", "subscription_manager_id", "bios_uuid")
+# the paths of the core egg served, and its signature
+EGG_PATH = "/v1/static/core/insights-core.egg"
+EGG_GPG_PATH = EGG_PATH + ".asc"
+# the base path of the core egg as returned by the module update router
+_EGG_RELEASE_PATH = "/release"
+# the paths served for the core egg, mapped to the index of the file in
+# EggMirror.files()
+_EGG_FILES = {
+    EGG_PATH: 0,
+    EGG_GPG_PATH: 1,
+    _EGG_RELEASE_PATH + "/insights-core.egg": 0,
+    _EGG_RELEASE_PATH + "/insights-core.egg.asc": 1,
+}
+# the core eggs installed in the system
+_SYSTEM_EGGS = (
+    "/var/lib/insights/newest.egg",
+    "/var/lib/insights/last_stable.egg",
+    "/etc/insights-client/rpm.egg",
+)
+
+
+def _is_version(name):
+    # other directories may be in the mirror, e.g. "lost+found"
+    try:
+        Version(name)
+    except ValueError:
+        return False
+    return True
+
+
+class EggMirror:
+    """
+    Mirror of the core eggs of `insights-client`.
+
+    The eggs, together with their GPG signatures, are stored in a directory
+    by version (e.g. `3.4.5/insights-core.egg`), so they can be kept
+    across test sessions.
+
+    `FakeInsightsServer` serves the egg of the selected version (by default
+    the newest one) when its `egg_mirror` is set.
+    """
+
+    def __init__(self, directory):
+        """
+        Create a new EggMirror object.
+
+        :param directory: The directory where to store the eggs
+        :type directory: pathlib.Path
+        """
+        self.directory = pathlib.Path(directory)
+        self._selected = None
+
+    @staticmethod
+    def egg_version(egg):
+        """
+        Return the version of the insights-core in an egg.
+
+        :param egg: The path of the egg
+        :type egg: pathlib.Path
+        :return: The version, e.g. `3.4.5`
+        :rtype: str
+        """
+        with zipfile.ZipFile(egg) as z:
+            return z.read("insights/VERSION").decode().strip()
+
+    def add(self, egg, gpg):
+        """
+        Add an egg to the mirror, unless its version is there already.
+
+        Raises `ValueError` if the version of the egg is not valid.
+
+        :param egg: The path of the egg
+        :type egg: pathlib.Path
+        :param gpg: The path of the GPG signature of the egg
+        :type gpg: pathlib.Path
+        :return: The version of the egg
+        :rtype: str
+        """
+        version = self.egg_version(egg)
+        # the version is used as directory name
+        if not _is_version(version):
+            raise ValueError(f"invalid version of the egg {egg}: {version!r}")
+        target = self.directory / version
+        if not (target / "insights-core.egg.asc").exists():
+            LOGGER.debug("adding the egg %s (version %s) to the mirror", egg, version)
+            target.mkdir(parents=True, exist_ok=True)
+            shutil.copyfile(str(egg), str(target / "insights-core.egg"))
+            # the signature last, as it marks the egg as complete
+            shutil.copyfile(str(gpg), str(target / "insights-core.egg.asc"))
+        return version
+
+    def add_system_eggs(self):
+        """
+        Add to the mirror the eggs installed in the system, if any.
+
+        :return: The versions of the eggs found
+        :rtype: list
+        """
+        versions = []
+        for egg in _SYSTEM_EGGS:
+            gpg = egg + ".asc"
+            if os.path.exists(egg) and os.path.exists(gpg):
+                try:
+                    versions.append(self.add(egg, gpg))
+                except ValueError as e:
+                    LOGGER.warning("cannot add the egg to the mirror: %s", e)
+        return versions
+
+    @property
+    def versions(self):
+        """
+        The sorted list of the versions of the eggs in the mirror.
+        """
+        if not self.directory.is_dir():
+            return []
+        versions = [
+            p.name
+            for p in self.directory.iterdir()
+            if _is_version(p.name) and (p / "insights-core.egg.asc").exists()
+        ]
+        return sorted(versions, key=Version)
+
+    @property
+    def selected(self):
+        """
+        The version of the egg to serve; by default the newest one.
+        """
+        if self._selected is not None:
+            return self._selected
+        versions = self.versions
+        return versions[-1] if versions else None
+
+    def select(self, version):
+        """
+        Select the version of the egg to serve.
+
+        :param version: The version of the egg, or `None` for the newest one
+        :type version: str
+        """
+        if version is not None and version not in self.versions:
+            raise ValueError(f"no egg with version {version} in the mirror")
+        self._selected = version
+
+    def files(self):
+        """
+        Return the paths of the selected egg and of its signature, or `None`
+        if the mirror is empty.
+
+        :rtype: tuple
+        """
+        version = self.selected
+        if version is None:
+            return None
+        target = self.directory / version
+        return target / "insights-core.egg", target / "insights-core.egg.asc"
+
+
+class FakeInsightsUpload:
+    """
+    An archive uploaded to `FakeInsightsServer`.
+
+    The attributes are:
+
+    - `request_id`: the ID of the upload request, as returned to the client
+    - `path`: the path where the archive is stored
+    - `filename`: the name of the archive, as sent by the client
+    - `content_type`: the content type of the archive
+    - `metadata`: the metadata sent together with the archive (usually the
+      canonical facts of the system), or `None`
+    - `host_id`: the ID of the Inventory host of the upload, if any
+    """
+
+    def __init__(self, request_id, path, filename, content_type, metadata, host_id):
+        self.request_id = request_id
+        self.path = path
+        self.filename = filename
+        self.content_type = content_type
+        self.metadata = metadata
+        self.host_id = host_id
+
+    def __repr__(self):
+        return f"<FakeInsightsUpload {self.request_id} {self.filename}>"
+
+    def read(self):
+        """
+        Return the content of the archive.
+
+        :rtype: bytes
+        """
+        return self.path.read_bytes()
+
+
+def _parse_multipart(content_type, body):
+    # prepend the content type of the request as header, so the body can be
+    # parsed as MIME message
+    message = email.parser.BytesParser(policy=email.policy.HTTP).parsebytes(
+        b"Content-Type: " + content_type.encode() + b"\r\n\r\n" + body
+    )
+    if not message.is_multipart():
+        raise ValueError(f"not a multipart body: {content_type}")
+    fields = {}
+    for part in message.iter_parts():
+        name = part.get_param("name", header="content-disposition")
+        fields[name] = part
+    return fields
+
+
+class _FakeInsightsHandler(_FakeInventoryHandler):
+    def do_GET(self):
+        path = urllib.parse.urlsplit(self.path).path
+        if path in _EGG_FILES:
+            self._send_egg(_EGG_FILES[path])
+        elif path == "/module-update-router/v1/channel":
+            self.send_json({"url": _EGG_RELEASE_PATH})
+        elif path == "/v1/branch_info":
+            self.send_json({"remote_branch": -1, "remote_leaf": -1})
+        elif path == "/":
+            # used by "insights-client --test-connection"
+            self.send_json({})
+        else:
+            super().do_GET()
+
+    def _send_egg(self, index):
+        mirror = self.owner.egg_mirror
+        files = mirror.files() if mirror is not None else None
+        if files is None:
+            self.send_error_json(404, "Not Found")
+            return
+        self.send_body(files[index].read_bytes())
+
+    def do_POST(self):
+        path = urllib.parse.urlsplit(self.path).path
+        body = self.read_body()
+        if path == "/ingress/v1/upload":
+            self._upload(body)
+        elif path == self.owner.prefix + "/hosts/checkin":
+            self._checkin(body)
+        else:
+            self.send_error_json(404, "Not Found")
+
+    def _upload(self, body):
+        try:
+            fields = _parse_multipart(self.headers.get("Content-Type", ""), body)
+        except ValueError as e:
+            self.send_error_json(415, str(e))
+            return
+        archive = fields.get("file")
+        if archive is None:
+            self.send_error_json(400, "missing 'file' field")
+            return
+        metadata = fields.get("metadata")
+        if metadata is not None:
+            metadata = json.loads(metadata.get_payload(decode=True))
+        upload = self.owner._add_upload(
+            archive.get_filename() or "archive",
+            archive.get_content_type(),
+            archive.get_payload(decode=True),
+            metadata,
+        )
+        self.send_json(
+            {
+                "request_id": upload.request_id,
+                "upload": {"account_number": "0000001", "org_id": "0000001"},
+            },
+            202,
+        )
+
+    def _checkin(self, body):
+        facts = json.loads(body or b"{}")
+        host = self.owner.store.find_host(facts.get("insights_id"))
+        if host is None:
+            self.send_error_json(404, "Host not found")
+            return
+        self.owner.store.update_host(host["id"])
+        self.send_json(self.owner.store.get_host(host["id"]), 201)
+
+
+class FakeInsightsServer(FakeInventoryServer):
+    """
+    A local stand-in of the Insights platform, using HTTPS.
+
+    In addition to Inventory (see
+    [`FakeInventoryServer`][pytest_client_tools.fake_inventory.FakeInventoryServer]),
+    this server accepts the uploads of `insights-client` on the ingress
+    endpoint, storing the archives in a directory; they are available as
+    `uploads`, as list of
+    [`FakeInsightsUpload`][pytest_client_tools.fake_insights.FakeInsightsUpload].
+
+    Each upload adds its system (identified by the `insights_id` in its
+    metadata) as host in `store`, if not there already, like the real
+    platform does; this is what `insights-client` checks to know whether it
+    is registered.
+
+    When `egg_mirror` is set to an
+    [`EggMirror`][pytest_client_tools.fake_insights.EggMirror], the server
+    serves its core egg as the platform does for the updates of
+    `insights-client`.
+    """
+
+    _handler_class = _FakeInsightsHandler
+
+    def __init__(self, directory, certfile, keyfile):
+        """
+        Create a new FakeInsightsServer object.
+
+        :param directory: The directory where to store the uploaded archives
+        :type directory: pathlib.Path
+        :param certfile: The path of the certificate of the server, valid
+            for `127.0.0.1`
+        :type certfile: str
+        :param keyfile: The path of the key of the certificate
+        :type keyfile: str
+        """
+        super().__init__(certfile=certfile, keyfile=keyfile)
+        self.directory = pathlib.Path(directory)
+        self._uploads = []
+        self._uploads_lock = threading.Lock()
+        self._counter = itertools.count()
+        self.egg_mirror = None
+
+    @property
+    def base_url(self):
+        """
+        The base URL of the server, in the format of the `base_url` key of
+        the configuration of `insights-client` (i.e. without scheme).
+        """
+        return urllib.parse.urlsplit(self.url).netloc
+
+    @property
+    def upload_url(self):
+        """
+        The URL of the ingress endpoint.
+        """
+        return self.url + "/ingress/v1/upload"
+
+    @property
+    def uploads(self):
+        """
+        The list of the uploaded archives, oldest first.
+        """
+        with self._uploads_lock:
+            return list(self._uploads)
+
+    def clear(self):
+        """
+        Remove all the uploads, and all the hosts of the store.
+        """
+        with self._uploads_lock:
+            self._uploads = []
+            shutil.rmtree(self.directory, ignore_errors=True)
+        self.store.clear()
+
+    def configure(self, config):
+        """
+        Point a configuration of `insights-client` to this server.
+
+        Please note that the configuration is not saved.
+
+        :param config: The configuration of `insights-client`
+        :type config: pytest_client_tools.insights_client.InsightsClientConfig
+        """
+        config.base_url = self.base_url
+        config.upload_url = self.upload_url
+        config.cert_verify = self.certfile
+        # the legacy upload uses different endpoints, which are not available
+        config.legacy_upload = False
+
+    def _add_upload(self, filename, content_type, data, metadata):
+        host_id = None
+        facts = metadata if isinstance(metadata, dict) else {}
+        insights_id = facts.get("insights_id")
+        if insights_id:
+            fields = {k: facts[k] for k in _HOST_FACTS if facts.get(k)}
+            host = self.store.find_host(insights_id)
+            if host is None:
+                host_id = self.store.add_host(insights_id=insights_id, **fields)["id"]
+            else:
+                host_id = host["id"]
+                self.store.update_host(host_id, **fields)
+        request_id = uuid.uuid4().hex
+        # the file name comes from the client, so use only its last component
+        name = pathlib.PurePosixPath(filename).name
+        with self._uploads_lock:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            path = self.directory / f"{next(self._counter)}-{name}"
+            path.write_bytes(data)
+            upload = FakeInsightsUpload(
+                request_id, path, filename, content_type, metadata, host_id
+            )
+            self._uploads.append(upload)
+        return upload
@@ -0,0 +1,270 @@
+# SPDX-FileCopyrightText: Red Hat
+# SPDX-License-Identifier: MIT
+
+import copy
+import datetime
+import threading
+import urllib.parse
+import uuid
+
+from .httpserver import LocalHTTPServer, RequestHandler
+
+
+class FakeInventoryStore:
+    """
+    In-memory store of the hosts of `FakeInventoryServer`.
+
+    The hosts are dicts with the same keys as the hosts of Inventory; their
+    system profiles and tags are stored separately, as Inventory returns
+    them from separate endpoints.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._hosts = {}
+        self._profiles = {}
+        self._tags = {}
+
+    def clear(self):
+        """
+        Remove all the hosts.
+        """
+        with self._lock:
+            self._hosts.clear()
+            self._profiles.clear()
+            self._tags.clear()
+
+    def add_host(
+        self,
+        insights_id=None,
+        display_name=None,
+        system_profile=None,
+        tags=None,
+        **fields,
+    ):
+        """
+        Add a host.
+
+        :param insights_id: The insights UUID of the host (i.e. its
+            `machine-id`)
+        :type insights_id: str or uuid.UUID, optional
+        :param display_name: The display name of the host; if not specified,
+            the ID of the host is used
+        :type display_name: str, optional
+        :param system_profile: The system profile of the host
+        :type system_profile: dict, optional
+        :param tags: The tags of the host, as dicts with `namespace`, `key`,
+            and `value`
+        :type tags: list, optional
+        :param fields: Additional fields of the host
+        :return: The added host
+        :rtype: dict
+        """
+        host_id = str(uuid.uuid4())
+        now = datetime.datetime.now(datetime.timezone.utc).isoformat()
+        host = {
+            "id": host_id,
+            "insights_id": str(insights_id) if insights_id else None,
+            "display_name": display_name or host_id,
+            "created": now,
+            "updated": now,
+        }
+        host.update(fields)
+        with self._lock:
+            self._hosts[host_id] = host
+            self._profiles[host_id] = copy.deepcopy(system_profile or {})
+            self._tags[host_id] = copy.deepcopy(tags or [])
+        return copy.deepcopy(host)
+
+    def update_host(self, host_id, system_profile=None, tags=None, **fields):
+        """
+        Update a host.
+
+        The system profile is updated key by key, while the tags are
+        replaced.
+
+        :param host_id: The ID of the host
+        :type host_id: str
+        :param system_profile: The keys of the system profile to update
+        :type system_profile: dict, optional
+        :param tags: The new tags of the host
+        :type tags: list, optional
+        :param fields: The fields of the host to update
+        """
+        with self._lock:
+            host = self._hosts[host_id]
+            host.update(fields)
+            host["updated"] = datetime.datetime.now(datetime.timezone.utc).isoformat()
+            if system_profile:
+                self._profiles[host_id].update(copy.deepcopy(system_profile))
+            if tags is not None:
+                self._tags[host_id] = copy.deepcopy(tags)
+
+    def delete_host(self, host_id):
+        """
+        Delete a host.
+
+        :return: Whether the host existed
+        :rtype: bool
+        """
+        with self._lock:
+            self._profiles.pop(host_id, None)
+            self._tags.pop(host_id, None)
+            return self._hosts.pop(host_id, None) is not None
+
+    @property
+    def hosts(self):
+        """
+        The list of the hosts.
+        """
+        with self._lock:
+            return copy.deepcopy(list(self._hosts.values()))
+
+    def find_host(self, insights_id):
+        """
+        Return the host with the specified insights UUID, or `None`.
+        """
+        with self._lock:
+            for host in self._hosts.values():
+                if host["insights_id"] == str(insights_id):
+                    return copy.deepcopy(host)
+        return None
+
+    def get_host(self, host_id):
+        """
+        Return a host, or `None` if missing.
+        """
+        with self._lock:
+            host = self._hosts.get(host_id)
+            return copy.deepcopy(host) if host else None
+
+    def get_system_profile(self, host_id):
+        """
+        Return the system profile of a host, or `None` if missing.
+        """
+        with self._lock:
+            profile = self._profiles.get(host_id)
+            return copy.deepcopy(profile) if profile is not None else None
+
+    def get_tags(self, host_id):
+        """
+        Return the tags of a host, or `None` if missing.
+        """
+        with self._lock:
+            tags = self._tags.get(host_id)
+            return copy.deepcopy(tags) if tags is not None else None
+
+
+def _tag_string(tag):
+    return f"{tag.get('namespace')}/{tag.get('key')}={tag.get('value')}"
+
+
+def _paged(query, results):
+    per_page = int(query.get("per_page", ["50"])[0])
+    page = int(query.get("page", ["1"])[0])
+    start = (page - 1) * per_page
+    page_results = results[start:][:per_page]
+    return {
+        "total": len(results),
+        "count": len(page_results),
+        "page": page,
+        "per_page": per_page,
+        "results": page_results,
+    }
+
+
+class _FakeInventoryHandler(RequestHandler):
+    def _route(self):
+        url = urllib.parse.urlsplit(self.path)
+        prefix = self.owner.prefix.rstrip("/") + "/hosts"
+        if url.path != prefix and not url.path.startswith(prefix + "/"):
+            return None, None, None
+        parts = [p for p in url.path.partition(prefix)[2].split("/") if p]
+        return parts, urllib.parse.parse_qs(url.query), self.owner.store
+
+    def do_GET(self):
+        parts, query, store = self._route()
+        if parts is None:
+            self.send_error_json(404, "Not Found")
+        elif not parts:
+            self._list_hosts(store, query)
+        else:
+            ids = parts[0].split(",")
+            if any(store.get_host(host_id) is None for host_id in ids):
+                self.send_error_json(404, "Host not found")
+            elif len(parts) == 1:
+                self.send_json(_paged(query, [store.get_host(i) for i in ids]))
+            elif parts[1:] == ["system_profile"]:
+                self._send_system_profiles(store, query, ids)
+            elif parts[1:] == ["tags"]:
+                data = _paged(query, ids)
+                data["results"] = {i: store.get_tags(i) for i in data["results"]}
+                self.send_json(data)
+            else:
+                self.send_error_json(404, "Not Found")
+
+    def _list_hosts(self, store, query):
+        hosts = store.hosts
+        for key in ("insights_id", "fqdn"):
+            if key in query:
+                hosts = [h for h in hosts if h.get(key) == query[key][0]]
+        if "display_name" in query:
+            name = query["display_name"][0].lower()
+            hosts = [h for h in hosts if name in h["display_name"].lower()]
+        if "hostname_or_id" in query:
+            value = query["hostname_or_id"][0]
+            hosts = [
+                h
+                for h in hosts
+                if value in (h["id"], h.get("fqdn")) or value in h["display_name"]
+            ]
+        for tag in query.get("tags", []):
+            hosts = [
+                h for h in hosts if tag in map(_tag_string, store.get_tags(h["id"]))
+            ]
+        self.send_json(_paged(query, hosts))
+
+    def _send_system_profiles(self, store, query, ids):
+        fields = query.get("fields[system_profile]")
+        keys = fields[0].split(",") if fields else None
+        results = []
+        for host_id in ids:
+            profile = store.get_system_profile(host_id)
+            if keys is not None:
+                profile = {k: v for k, v in profile.items() if k in keys}
+            results.append({"id": host_id, "system_profile": profile})
+        self.send_json(_paged(query, results))
+
+    def do_DELETE(self):
+        parts, _, store = self._route()
+        if not parts or len(parts) != 1:
+            self.send_error_json(404, "Not Found")
+            return
+        ids = parts[0].split(",")
+        if any(store.get_host(host_id) is None for host_id in ids):
+            self.send_error_json(404, "Host not found")
+            return
+        for host_id in ids:
+            store.delete_host(host_id)
+        self.send_body(b"")
+
+
+class FakeInventoryServer(LocalHTTPServer):
+    """
+    A local stand-in of the Inventory service.
+
+    This server implements the main endpoints of Inventory (listing,
+    querying, and deleting hosts, and querying their system profiles and
+    tags) on top of an in-memory store of hosts, available as `store`
+    ([`FakeInventoryStore`][pytest_client_tools.fake_inventory.FakeInventoryStore]).
+
+    The endpoints are under `prefix`, i.e. `/inventory/v1` by default, so
+    `url` plays the role of the `insights.base_url` configuration key.
+    """
+
+    _handler_class = _FakeInventoryHandler
+
+    def __init__(self, prefix="/inventory/v1", certfile=None, keyfile=None):
+        super().__init__(self._handler_class, certfile=certfile, keyfile=keyfile)
+        self.prefix = prefix
+        self.store = FakeInventoryStore()
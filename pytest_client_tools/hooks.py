@@ -0,0 +1,52 @@
+# SPDX-FileCopyrightText: Red Hat
+# SPDX-License-Identifier: MIT
+
+"""
+Hooks provided by pytest-client-tools.
+
+These hooks are called only when implemented by some plugin; otherwise,
+pytest-client-tools does not do any extra work.
+"""
+
+
+def pytest_client_tools_span_start(span):
+    """
+    An operation traced by pytest-client-tools is starting.
+
+    The traced operations are the commands run, the REST calls, the Podman
+    operations, and the setup/teardown of the fixtures.
+
+    :param span: The operation; its `end` is `None` at this point
+    :type span: pytest_client_tools.tracing.Span
+    """
+
+
+def pytest_client_tools_span_end(span):
+    """
+    An operation traced by pytest-client-tools has finished.
+
+    :param span: The operation
+    :type span: pytest_client_tools.tracing.Span
+    """
+
+
+def pytest_client_tools_metric(name, value, tags):
+    """
+    A metric measured by pytest-client-tools.
+
+    The reported metrics are:
+
+    - `command.wall_time`, `command.cpu_time` (seconds), `command.max_rss`
+      (kilobytes): the resources used by each command run; the tags are the
+      `tool`, the `subcommand`, and the `returncode`
+    - `http.request_time` (seconds): the duration of each REST call; the
+      tags are the `method` and the `status` code
+
+    :param name: The name of the metric
+    :type name: str
+    :param value: The value of the metric
+    :type value: int or float
+    :param tags: Details of the metric, always including the ID of the
+        current test (`nodeid`) and the pytest-xdist worker ID (`worker`)
+    :type tags: dict
+    """
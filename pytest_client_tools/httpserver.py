@@ -0,0 +1,205 @@
+# SPDX-FileCopyrightText: Red Hat
+# SPDX-License-Identifier: MIT
+
+import hashlib
+import http.server
+import json
+import socketserver
+import subprocess
+import threading
+
+from .logger import LOGGER
+from .util import logged_run
+
+
+def generate_certificate(directory, days=7):
+    """
+    Generate a self-signed certificate valid for `localhost` and
+    `127.0.0.1`, using `openssl`.
+
+    The certificate is its own CA, so clients can verify it by using it as
+    CA bundle.
+
+    :param directory: The directory where to write the certificate
+        (`cert.pem`) and its key (`key.pem`)
+    :type directory: pathlib.Path
+    :param days: How many days the certificate is valid
+    :type days: int
+    :return: The paths of the certificate and of its key
+    :rtype: tuple
+    """
+    certfile = directory / "cert.pem"
+    keyfile = directory / "key.pem"
+    logged_run(
+        [
+            "openssl",
+            "req",
+            "-x509",
+            "-newkey",
+            "rsa:2048",
+            "-nodes",
+            "-days",
+            str(days),
+            "-subj",
+            "/CN=localhost",
+            "-addext",
+            "subjectAltName=DNS:localhost,IP:127.0.0.1",
+            "-keyout",
+            str(keyfile),
+            "-out",
+            str(certfile),
+        ],
+        check=True,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        text=True,
+        internal=True,
+    )
+    return certfile, keyfile
+
+
+class _ThreadingHTTPServer(socketserver.ThreadingMixIn, http.server.HTTPServer):
+    daemon_threads = True
+
+
+class RequestHandler(http.server.BaseHTTPRequestHandler):
+    """
+    Base handler of the requests of `LocalHTTPServer`.
+
+    The `LocalHTTPServer` is available as `self.owner`.
+    """
+
+    protocol_version = "HTTP/1.1"
+
+    @property
+    def owner(self):
+        return self.server.owner
+
+    def log_message(self, format, *args):
+        LOGGER.debug("%s: %s", type(self.owner).__name__, format % args)
+
+    def read_body(self):
+        """
+        Read the body of the request.
+
+        :rtype: bytes
+        """
+        length = int(self.headers.get("Content-Length") or 0)
+        return self.rfile.read(length) if length else b""
+
+    def send_body(self, body, status=200, content_type="application/octet-stream"):
+        """
+        Send a response.
+
+        Successful responses have an ETag; if it matches the
+        `If-None-Match` header of the request, then an empty
+        `304 Not Modified` response is sent instead.
+
+        :param body: The body of the response
+        :type body: bytes
+        :param status: The HTTP status of the response
+        :type status: int
+        :param content_type: The content type of the body
+        :type content_type: str
+        """
+        etag = None
+        if status == 200:
+            etag = f'"{hashlib.sha1(body).hexdigest()}"'
+            if self.headers.get("If-None-Match") == etag:
+                status = 304
+                body = b""
+        self.send_response(status)
+        if etag:
+            self.send_header("ETag", etag)
+        if body:
+            self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_json(self, data, status=200):
+        """
+        Send a response with a JSON body.
+        """
+        self.send_body(json.dumps(data).encode(), status, "application/json")
+
+    def send_error_json(self, status, detail):
+        """
+        Send an error response, with the error details as JSON.
+        """
+        self.send_json({"status": status, "detail": detail}, status)
+
+
+class LocalHTTPServer:
+    """
+    A HTTP server listening on localhost (`127.0.0.1`), running in a thread.
+
+    The server uses HTTPS when a certificate is specified.
+    """
+
+    def __init__(self, handler_class, certfile=None, keyfile=None):
+        """
+        Create a new LocalHTTPServer object.
+
+        :param handler_class: The class handling the requests
+        :type handler_class: pytest_client_tools.httpserver.RequestHandler
+        :param certfile: The path of the certificate of the server, valid
+            for `127.0.0.1`
+        :type certfile: str, optional
+        :param keyfile: The path of the key of the certificate
+        :type keyfile: str, optional
+        """
+        self._handler_class = handler_class
+        self._certfile = certfile
+        self._keyfile = keyfile
+        self._httpd = None
+        self._thread = None
+
+    @property
+    def certfile(self):
+        """
+        The path of the certificate of the server, if any.
+        """
+        return self._certfile
+
+    @property
+    def url(self):
+        """
+        The base URL of the server.
+        """
+        scheme = "https" if self._certfile else "http"
+        return f"{scheme}://127.0.0.1:{self._httpd.server_address[1]}"
+
+    def start(self):
+        """
+        Start the server, on a free port.
+        """
+        self._httpd = _ThreadingHTTPServer(("127.0.0.1", 0), self._handler_class)
+        self._httpd.owner = self
+        if self._certfile:
+            # imported here to not slow down the loading of the plugin
+            import ssl
+
+            context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+            context.load_cert_chain(self._certfile, self._keyfile)
+            self._httpd.socket = context.wrap_socket(
+                self._httpd.socket, server_side=True
+            )
+        self._thread = threading.Thread(
+            target=self._httpd.serve_forever,
+            kwargs={"poll_interval": 0.1},
+            daemon=True,
+        )
+        self._thread.start()
+
+    def stop(self):
+        """
+        Stop the server.
+        """
+        if self._httpd is None:
+            return
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        self._thread.join()
+        self._httpd = None
+        self._thread = None
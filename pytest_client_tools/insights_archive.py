@@ -0,0 +1,232 @@
+# SPDX-FileCopyrightText: Red Hat
+# SPDX-License-Identifier: MIT
+
+import collections
+import fnmatch
+import importlib
+import json
+import pathlib
+import posixpath
+import re
+import shutil
+import tarfile
+import tempfile
+import threading
+
+
+# the modules to decompress the archives, by magic number
+_DECOMPRESSORS = {
+    b"\x1f\x8b": "gzip",
+    b"BZh": "bz2",
+    b"\xfd7zXZ\x00": "lzma",
+}
+
+
+def _open_uncompressed(path):
+    # tarfile reads a member of a compressed archive by decompressing it
+    # again from the start at each backward seek, so compressed archives
+    # are decompressed once to a temporary file (removed when closed)
+    f = open(path, "rb")
+    magic = f.read(6)
+    f.seek(0)
+    for prefix, module in _DECOMPRESSORS.items():
+        if magic.startswith(prefix):
+            copy = tempfile.TemporaryFile()
+            try:
+                with f, importlib.import_module(module).open(f) as compressed:
+                    shutil.copyfileobj(compressed, copy, 1024 * 1024)
+            except BaseException:
+                copy.close()
+                raise
+            copy.seek(0)
+            return copy
+    return f
+
+
+def _normalize(name):
+    while name.startswith("./"):
+        name = name[2:]
+    name = name.rstrip("/")
+    return "" if name == "." else name
+
+
+class InsightsArchive:
+    """
+    Insights archive.
+
+    This class represents an archive collected by `insights-client`, giving
+    access to its files without extracting it.
+
+    The archive is read once, when opened, to index its files (compressed
+    archives are decompressed to a temporary file, so the files can be read
+    in any order); after that, the files are read only when requested.
+    Their paths are relative to the top-level directory of the archive,
+    e.g. `data/etc/hostname` or `meta_data/insights.specs.Specs.hostname.json`.
+
+    The content of the files read is cached, discarding the least recently
+    used files when the cache exceeds its size.
+    """
+
+    def __init__(self, path, cache_size=16 * 1024 * 1024):
+        """
+        Create a new InsightsArchive object.
+
+        :param path: The path of the archive, compressed or not
+        :type path: str or pathlib.Path
+        :param cache_size: The maximum size, in bytes, of the cached
+            content of the files
+        :type cache_size: int
+        """
+        self.path = pathlib.Path(path)
+        self._cache_size = cache_size
+        self._cache = collections.OrderedDict()
+        self._cache_used = 0
+        self._lock = threading.Lock()
+        self._file = None
+        self._tar = None
+        self._top = None
+        self._members = self._index()
+
+    def _open(self):
+        self._file = _open_uncompressed(self.path)
+        try:
+            self._tar = tarfile.open(fileobj=self._file, mode="r:")
+        except BaseException:
+            self._file.close()
+            self._file = None
+            raise
+
+    def _index(self):
+        members = {}
+        self._open()
+        try:
+            for info in self._tar:
+                name = _normalize(info.name)
+                if name:
+                    members[name] = info
+        except BaseException:
+            # e.g. a corrupted archive: do not leak its decompressed copy
+            self.close()
+            raise
+        # strip the top-level directory, if there is one
+        tops = {name.split("/", 1)[0] for name in members}
+        if len(tops) == 1:
+            (top,) = tops
+            if top not in members or members[top].isdir():
+                self._top = top
+        return {
+            self._relative(name): info
+            for name, info in members.items()
+            if info.isfile() or info.issym() or info.islnk()
+        }
+
+    def _relative(self, name):
+        if self._top is not None:
+            return name.split("/", 1)[-1]
+        return name
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, error_type, error_value, traceback):
+        self.close()
+
+    def __contains__(self, name):
+        return name in self._members
+
+    def close(self):
+        """
+        Close the archive, removing its decompressed copy, and drop the
+        cached files.
+        """
+        with self._lock:
+            if self._tar is not None:
+                self._tar.close()
+                self._file.close()
+                self._tar = self._file = None
+            self._cache.clear()
+            self._cache_used = 0
+
+    @property
+    def names(self):
+        """
+        The sorted list of the paths of the files in the archive.
+        """
+        return sorted(self._members)
+
+    def glob(self, pattern):
+        """
+        Return the paths of the files in the archive matching a pattern.
+
+        The pattern uses the `fnmatch` syntax, where `*` matches also `/`;
+        for example `data/etc/*.conf`.
+
+        :param pattern: The pattern to match
+        :type pattern: str
+        :return: The sorted list of the matching paths
+        :rtype: list
+        """
+        regex = re.compile(fnmatch.translate(pattern))
+        return sorted(name for name in self._members if regex.match(name))
+
+    def _resolve(self, name):
+        seen = set()
+        info = self._members.get(name)
+        while info is not None and (info.issym() or info.islnk()):
+            if name in seen:
+                raise KeyError(f"{name}: symbolic link loop")
+            seen.add(name)
+            if info.issym():
+                name = posixpath.normpath(
+                    posixpath.join(posixpath.dirname(name), info.linkname)
+                )
+            else:
+                # hard links point to names in the archive
+                name = self._relative(_normalize(info.linkname))
+            info = self._members.get(name)
+        if info is None:
+            raise KeyError(name)
+        return name, info
+
+    def _read_member(self, info):
+        if self._tar is None:
+            self._open()
+        return self._tar.extractfile(info).read()
+
+    def read(self, name, text=True):
+        """
+        Return the content of a file in the archive.
+
+        :param name: The path of the file, e.g. `data/etc/hostname`
+        :type name: str
+        :param text: Whether to return the content as text, decoding it as
+            UTF-8, or as bytes
+        :type text: bool
+        :return: The content of the file
+        :rtype: str or bytes
+        """
+        name, info = self._resolve(name)
+        with self._lock:
+            data = self._cache.get(name)
+            if data is not None:
+                self._cache.move_to_end(name)
+            else:
+                data = self._read_member(info)
+                if len(data) <= self._cache_size:
+                    self._cache[name] = data
+                    self._cache_used += len(data)
+                    while self._cache_used > self._cache_size:
+                        _, evicted = self._cache.popitem(last=False)
+                        self._cache_used -= len(evicted)
+        return data.decode(errors="replace") if text else data
+
+    def json(self, name):
+        """
+        Return the content of a JSON file in the archive, parsed.
+
+        :param name: The path of the file, e.g.
+            `meta_data/insights.specs.Specs.hostname.json`
+        :type name: str
+        :return: The parsed JSON content of the file
+        """
+        return json.loads(self.read(name, text=False))
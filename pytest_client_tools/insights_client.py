@@ -3,13 +3,24 @@
 
 import configparser
 import contextlib
+import hashlib
+import io
+import os
 import pathlib
 import re
 import subprocess
 import uuid
 
 from . import SystemNotRegisteredError
-from .util import SavedFile, Version, logged_run
+from .insights_archive import InsightsArchive
+from .logger import LOGGER
+from .profiling import async_profiled_run, profiled_run
+from .util import (
+    SavedFile,
+    StreamedProcess,
+    Version,
+    atomic_write_text,
+)
 
 
 INSIGHTS_CLIENT_FILES_TO_SAVE = (
@@ -48,6 +59,44 @@ INSIGHTS_CLIENT_FILES_TO_SAVE = (
     ),
 )
 
+# files changed by insights-client when its registration changes
+_REGISTRATION_FILES = (
+    "/etc/insights-client/machine-id",
+    "/etc/insights-client/.registered",
+    "/etc/insights-client/.unregistered",
+)
+
+# the suffixes of the archives written by insights-client, which appends the
+# one of its compressor to the output file when missing
+_ARCHIVE_SUFFIXES = (".tar.gz", ".tar.bz2", ".tar.xz", ".tar")
+
+# options of insights-client which do not change its registration
+_READ_ONLY_OPTIONS = frozenset(
+    [
+        "--check-results",
+        "--diagnosis",
+        "--help",
+        "--list-specs",
+        "--no-upload",
+        "--offline",
+        "--output-dir",
+        "--output-file",
+        "--show-results",
+        "--status",
+        "--test-connection",
+        "--version",
+    ]
+)
+
+# files referenced by the configuration of insights-client, which change the
+# content of its collections, mapped to their default paths
+_COLLECTION_FILES = {
+    "content_redaction_file": "/etc/insights-client/file-content-redaction.yaml",
+    "redaction_file": "/etc/insights-client/file-redaction.yaml",
+    "remove_file": "/etc/insights-client/remove.conf",
+    "tags_file": "/etc/insights-client/tags.yaml",
+}
+
 
 class InsightsClientConfig:
     """
@@ -67,6 +116,9 @@ class InsightsClientConfig:
 
     Please note that changing attributes does not automatically update the
     configuration file; `save()` must be called explicitly when needed.
+    Only setting a value different than the current one marks the
+    configuration as changed, and `save()` does nothing when there are no
+    changes.
     """
 
     # boolean config keys
@@ -143,60 +195,100 @@ class InsightsClientConfig:
         "cert_verify",
     }
 
+    # all the known config keys, mapped to their type and the name of the
+    # RawConfigParser method used to read them
+    _KEY_TYPES = {
+        **dict.fromkeys(_KEYS_BOOL, (bool, "getboolean")),
+        **dict.fromkeys(_KEYS_INT, (int, "getint")),
+        **dict.fromkeys(_KEYS_FLOAT, (float, "getfloat")),
+        **dict.fromkeys(_KEYS_STRING, (str, "get")),
+        **dict.fromkeys(_KEYS_BOOL_STRING, (bool, "getboolean")),
+    }
+
     def __init__(self, path="/etc/insights-client/insights-client.conf"):
         self._path = path
+        self._config = None
+        self._dirty = set()
+        self._file_signature = None
         self.reload()
 
-    def reload(self):
+    @property
+    def path(self):
+        """
+        The path of the configuration file.
+        """
+        return self._path
+
+    def _read_file_signature(self):
+        st = os.stat(self._path)
+        return (st.st_mtime_ns, st.st_size, st.st_ino)
+
+    def reload(self, force=False):
         """
         Reload the configuration.
 
         Reload the configuration from the underlying file, discarding all the
         values set in the instance.
+
+        The file is not parsed again if there are no pending changes, and the
+        modification time and the size of the file did not change since the
+        last time it was read or written.
+
+        :param force: Whether to parse the file even if it looks unchanged
+        :type force: bool
         """
+        signature = self._read_file_signature()
+        if (
+            not force
+            and not self._dirty
+            and self._config is not None
+            and signature == self._file_signature
+        ):
+            return
         with open(self._path) as f:
-            self._config = configparser.RawConfigParser()
-            self._config.read_file(f, source=self._path)
+            config = configparser.RawConfigParser()
+            config.read_file(f, source=str(self._path))
             with contextlib.suppress(configparser.DuplicateSectionError):
-                self._config.add_section("insights-client")
+                config.add_section("insights-client")
+        self._config = config
+        self._dirty = set()
+        self._file_signature = signature
 
     def save(self):
         """
         Save the configuration.
 
         Save the configuration values to the underlying configuration file.
+        Nothing is written if no configuration value was changed; otherwise,
+        the file is replaced atomically.
         """
-        with open(self._path, "w") as f:
-            self._config.write(f, space_around_delimiters=False)
+        if not self._dirty:
+            return
+        buf = io.StringIO()
+        self._config.write(buf, space_around_delimiters=False)
+        atomic_write_text(self._path, buf.getvalue())
+        self._dirty = set()
+        self._file_signature = self._read_file_signature()
 
     def __getattr__(self, name):
-        if name in self._KEYS_BOOL | self._KEYS_BOOL_STRING:
-            read_func = self._config.getboolean
-        elif name in self._KEYS_INT:
-            read_func = self._config.getint
-        elif name in self._KEYS_FLOAT:
-            read_func = self._config.getfloat
-        elif name in self._KEYS_STRING:
-            read_func = self._config.get
-        else:
-            raise KeyError(name)
+        try:
+            _, reader = self._KEY_TYPES[name]
+        except KeyError:
+            raise KeyError(name) from None
         try:
             try:
-                return read_func("insights-client", name)
+                return getattr(self._config, reader)("insights-client", name)
             except ValueError:
                 return self._config.get("insights-client", name)
         except configparser.NoOptionError:
             raise KeyError(name)
 
     def __setattr__(self, name, value):
-        if name in (
-            self._KEYS_BOOL
-            | self._KEYS_INT
-            | self._KEYS_FLOAT
-            | self._KEYS_STRING
-            | self._KEYS_BOOL_STRING
-        ):
-            self._config.set("insights-client", name, str(value))
+        if name in self._KEY_TYPES:
+            value = str(value)
+            if self._config.get("insights-client", name, fallback=None) != value:
+                self._config.set("insights-client", name, value)
+                self._dirty.add(name)
             return
         super().__setattr__(name, value)
 
@@ -210,10 +302,47 @@ class InsightsClient:
     It exposes a public `config` attribute (which is `InsightsClientConfig`)
     representing the configuration of `insights-client`, i.e.
     `/etc/insights-client/insights-client.conf`.
+
+    The registration status is cached, and queried again only after running
+    `insights-client` with options which may change it (e.g. `register()`),
+    or when the registration files of `insights-client` change.
     """
 
     def __init__(self):
         self.config = InsightsClientConfig()
+        self._registration = None
+
+    @staticmethod
+    def _registration_signature():
+        signature = []
+        for path in _REGISTRATION_FILES:
+            try:
+                st = os.stat(path)
+            except FileNotFoundError:
+                signature.append(None)
+            else:
+                signature.append((st.st_mtime_ns, st.st_size, st.st_ino))
+        return tuple(signature)
+
+    def _cached_registration(self):
+        if self._registration is None:
+            return None
+        signature, registered = self._registration
+        if signature != self._registration_signature():
+            self._registration = None
+            return None
+        return registered
+
+    def _cache_registration(self, registered):
+        # the signature is read after "--status", as it may touch the files
+        if registered is not None:
+            self._registration = (self._registration_signature(), registered)
+        return registered
+
+    def _invalidate_registration(self, args):
+        options = {str(arg).split("=", 1)[0] for arg in args}
+        if not options or not options <= _READ_ONLY_OPTIONS:
+            self._registration = None
 
     @property
     def is_registered(self):
@@ -223,7 +352,29 @@ class InsightsClient:
         :return: Whether `insights-client` is registered
         :rtype: bool
         """
+        registered = self._cached_registration()
+        if registered is not None:
+            return registered
         proc = self.run("--status", check=False)
+        return self._cache_registration(self._is_registered_from_status(proc))
+
+    async def async_is_registered(self):
+        """
+        Query whether `insights-client` is registered, using asyncio.
+
+        This is the same as `is_registered`, as coroutine.
+
+        :return: Whether `insights-client` is registered
+        :rtype: bool
+        """
+        registered = self._cached_registration()
+        if registered is not None:
+            return registered
+        proc = await self.arun("--status", check=False)
+        return self._cache_registration(self._is_registered_from_status(proc))
+
+    @staticmethod
+    def _is_registered_from_status(proc):
         if proc.returncode in [0, 1] and any(
             i in proc.stdout for i in ["NOT", "unregistered", "401: Unauthorized"]
         ):
@@ -296,7 +447,35 @@ class InsightsClient:
         :return: The result of the command execution
         :rtype: subprocess.CompletedProcess
         """
-        return logged_run(
+        self._invalidate_registration(args)
+        return profiled_run(
+            ["insights-client"] + list(args),
+            check=check,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            text=text,
+        )
+
+    async def arun(self, *args, check=True, text=True):
+        """
+        Run `insights-client` with the specified arguments, using asyncio.
+
+        This is the same as `run()`, as coroutine; see
+        [`run_concurrently()`][pytest_client_tools.util.run_concurrently].
+
+        :param args: The actual arguments to run using `insights-client`
+        :type args: list
+        :param check: Whether raise an exception if the process exits with
+            a return code different than 0
+        :type check: bool
+        :param text: Whether the stdin/stdout of the process are textual
+            (and not bytes)
+        :type text: bool
+        :return: The result of the command execution
+        :rtype: subprocess.CompletedProcess
+        """
+        self._invalidate_registration(args)
+        return await async_profiled_run(
             ["insights-client"] + list(args),
             check=check,
             stdout=subprocess.PIPE,
@@ -304,6 +483,55 @@ class InsightsClient:
             text=text,
         )
 
+    def stream(self, *args, check=True, tail=1000):
+        """
+        Run `insights-client` with the specified arguments, streaming its output.
+
+        The output (stdout and stderr merged) is logged and written to an
+        artifact line by line, keeping only its last lines in memory; see
+        [`StreamedProcess`][pytest_client_tools.util.StreamedProcess].
+
+        :param args: The actual arguments to run using `insights-client`
+        :type args: list
+        :param check: Whether raise an exception if the process exits with
+            a return code different than 0
+        :type check: bool
+        :param tail: How many lines of the output to keep in memory
+        :type tail: int
+        :return: The running command, to iterate for its output lines
+        :rtype: pytest_client_tools.util.StreamedProcess
+        """
+        self._invalidate_registration(args)
+        return StreamedProcess(["insights-client"] + list(args), check=check, tail=tail)
+
+    def collect(self, *args, path):
+        """
+        Collect an archive with `insights-client`, without uploading it.
+
+        Invokes `insights-client --offline --output-file=...`, with the
+        specified additional arguments.
+
+        :param args: Additional arguments for `insights-client`
+        :type args: list
+        :param path: The path of the archive, e.g. in the `tmp_path` of the
+            test; it is not removed when the archive is closed. If it does
+            not end with the extension of the compressor (e.g. `.tar.gz`),
+            `insights-client` appends it, and the returned archive has the
+            actual path
+        :type path: str or pathlib.Path
+        :return: The collected archive
+        :rtype: pytest_client_tools.insights_archive.InsightsArchive
+        """
+        path = pathlib.Path(path)
+        self.run("--offline", f"--output-file={path}", *args)
+        if not path.name.endswith(_ARCHIVE_SUFFIXES):
+            for suffix in _ARCHIVE_SUFFIXES:
+                actual_path = path.with_name(path.name + suffix)
+                if actual_path.exists():
+                    path = actual_path
+                    break
+        return InsightsArchive(path)
+
     def register(self):
         """
         Register with `insights-client`.
@@ -325,3 +553,77 @@ class InsightsClient:
         :rtype: subprocess.CompletedProcess
         """
         return self.run("--unregister")
+
+
+class InsightsCollectionCache:
+    """
+    Cache of the archives collected by `insights-client`.
+
+    The archives are keyed by the content of the configuration file of
+    `insights-client`, and by the content of the files it references which
+    change what is collected (e.g. the redaction files, and the tags file);
+    hence, a collection is run only once for each distinct configuration.
+
+    The archives are shared, so they must not be changed.
+    """
+
+    def __init__(self, directory):
+        """
+        Create a new InsightsCollectionCache object.
+
+        :param directory: The directory where to store the archives
+        :type directory: pathlib.Path
+        """
+        self._directory = pathlib.Path(directory)
+        self._archives = {}
+
+    @staticmethod
+    def _key(config, args):
+        digest = hashlib.sha256("\0".join(map(str, args)).encode())
+        with open(config.path, "rb") as f:
+            digest.update(f.read())
+        for key, default in sorted(_COLLECTION_FILES.items()):
+            try:
+                path = getattr(config, key) or default
+            except KeyError:
+                path = default
+            digest.update(f"\0{key}={path}\0".encode())
+            with contextlib.suppress(OSError):
+                with open(path, "rb") as f:
+                    digest.update(f.read())
+        return digest.hexdigest()
+
+    def get(self, insights_client, *args):
+        """
+        Return the archive collected by `insights-client` for its current
+        configuration, collecting it if needed.
+
+        The configuration is saved before computing its key.
+
+        :param insights_client: The `insights-client` to collect with
+        :type insights_client: pytest_client_tools.insights_client.InsightsClient
+        :param args: Additional arguments for the collection; they are part
+            of the key too
+        :type args: list
+        :return: The collected archive
+        :rtype: pytest_client_tools.insights_archive.InsightsArchive
+        """
+        insights_client.config.save()
+        key = self._key(insights_client.config, args)
+        archive = self._archives.get(key)
+        if archive is not None:
+            LOGGER.debug("reusing the insights-client collection %s", archive.path)
+            return archive
+        self._directory.mkdir(parents=True, exist_ok=True)
+        path = self._directory / f"insights-{key[:16]}-{len(self._archives)}.tar.gz"
+        archive = insights_client.collect(*args, path=path)
+        self._archives[key] = archive
+        return archive
+
+    def close(self):
+        """
+        Close all the archives.
+        """
+        for archive in self._archives.values():
+            archive.close()
+        self._archives = {}
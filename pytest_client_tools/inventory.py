@@ -1,7 +1,59 @@
 # SPDX-FileCopyrightText: Red Hat
 # SPDX-License-Identifier: MIT
 
-from .restclient import RestClient
+import random
+import threading
+import time
+
+from .logger import LOGGER
+from .restclient import AsyncRestClient, RestClient
+from .tracing import TRACER
+from .util import run_concurrently
+
+
+class InventoryTimeoutError(RuntimeError):
+    """
+    A resource did not show up in Inventory within the specified time.
+    """
+
+
+class _Poller:
+    # poller of a resource of Inventory: the last result is shared among
+    # all the waiters, and the resource is queried using the ETag of the
+    # last result, so unchanged resources are not transferred again
+
+    def __init__(self, inventory, path, params):
+        self._inventory = inventory
+        self._path = path
+        self._params = params
+        self._lock = threading.Lock()
+        self._etag = None
+        self._value = None
+        self._fetched = None
+
+    def fetch(self, max_age):
+        # imported here to not slow down the loading of the plugin
+        import requests
+
+        with self._lock:
+            now = time.monotonic()
+            if self._fetched is not None and now - self._fetched < max_age:
+                return self._value
+            headers = {"If-None-Match": self._etag} if self._etag else {}
+            try:
+                response = self._inventory.get(
+                    self._path, params=self._params, headers=headers
+                )
+            except requests.HTTPError as e:
+                if e.response is None or e.response.status_code != 404:
+                    raise
+                self._etag = self._value = None
+            else:
+                if response.status_code != 304:
+                    self._value = response.json()
+                    self._etag = response.headers.get("ETag")
+            self._fetched = time.monotonic()
+            return self._value
 
 
 class Inventory:
@@ -9,18 +61,34 @@ class Inventory:
     Inventory
 
     This class represents an Inventory server.
+
+    The latency of the last wait for a resource (e.g. `wait_for_system()`),
+    in seconds, is available as `last_wait_latency`.
     """
 
-    def __init__(self, base_url, verify=True):
-        self._rest_client = RestClient(
-            base_url=base_url,
-            verify=verify,
-            cert=(
-                "/etc/pki/consumer/cert.pem",
-                "/etc/pki/consumer/key.pem",
-            ),
-        )
+    def __init__(
+        self,
+        base_url,
+        verify=True,
+        cert=(
+            "/etc/pki/consumer/cert.pem",
+            "/etc/pki/consumer/key.pem",
+        ),
+        auth=None,
+    ):
+        self._rest_client_kwargs = {
+            "base_url": base_url,
+            "verify": verify,
+            "cert": cert,
+            "auth": auth,
+        }
+        self._rest_client = RestClient(**self._rest_client_kwargs)
+        self._async_rest_client = None
         self._insights_client = None
+        self._host_ids = {}
+        self._pollers = {}
+        self._pollers_lock = threading.Lock()
+        self.last_wait_latency = None
 
     @property
     def base_url(self):
@@ -41,6 +109,159 @@ class Inventory:
         """
         return self._rest_client.delete(path, **kwargs)
 
+    def _get_async_rest_client(self):
+        if self._async_rest_client is None:
+            self._async_rest_client = AsyncRestClient(**self._rest_client_kwargs)
+        return self._async_rest_client
+
+    async def aget(self, path, **kwargs):
+        """
+        Perform a GET REST call, using asyncio.
+        """
+        return await self._get_async_rest_client().get(path, **kwargs)
+
+    async def adelete(self, path, **kwargs):
+        """
+        Perform a DELETE REST call, using asyncio.
+        """
+        return await self._get_async_rest_client().delete(path, **kwargs)
+
+    def iter_hosts(self, filters=None, page_size=100):
+        """
+        Iterate over the hosts in Inventory.
+
+        The hosts are queried page by page; the next page is queried in the
+        background while the hosts of the current page are returned.
+
+        Since deleting hosts changes the pages, collect the hosts first
+        (e.g. using `list()`) when deleting them.
+
+        :param filters: The filters for the hosts, as parameters of the
+            `hosts` endpoint of Inventory, e.g.
+            `{"display_name": "test-"}`, or `{"tags": "ns/key=value"}`
+        :type filters: dict, optional
+        :param page_size: How many hosts to query at once
+        :type page_size: int
+        :return: An iterator over the dicts of the hosts
+        :rtype: iterator
+        """
+        # imported here to not slow down the loading of the plugin
+        import concurrent.futures
+
+        params = dict(filters or {}, per_page=page_size)
+
+        def fetch(page):
+            return self.get("hosts", params=dict(params, page=page)).json()
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=1) as executor:
+            page = 1
+            future = executor.submit(fetch, page)
+            count = 0
+            while True:
+                res_json = future.result()
+                results = res_json["results"]
+                count += len(results)
+                more = bool(results) and count < res_json["total"]
+                if more:
+                    page += 1
+                    future = executor.submit(fetch, page)
+                yield from results
+                if not more:
+                    return
+
+    def find_host_ids(self, insights_ids):
+        """
+        Query Inventory for the hosts of systems.
+
+        The systems are queried concurrently.
+
+        :param insights_ids: The UUIDs of the systems (i.e. their
+            `insights_id`)
+        :type insights_ids: list
+        :return: The IDs of the hosts of the systems; a system may have no
+            host, or more than one
+        :rtype: list
+        """
+        responses = run_concurrently(
+            *[
+                self.aget("hosts", params={"insights_id": str(insights_id)})
+                for insights_id in insights_ids
+            ]
+        )
+        return [
+            host["id"] for response in responses for host in response.json()["results"]
+        ]
+
+    def bulk_delete(self, ids, concurrency=10):
+        """
+        Delete hosts from Inventory.
+
+        The hosts are deleted concurrently; hosts already deleted are
+        ignored.
+
+        :param ids: The IDs of the hosts to delete
+        :type ids: list
+        :param concurrency: The maximum number of hosts deleted at the same
+            time
+        :type concurrency: int
+        :return: The IDs of the deleted hosts
+        :rtype: list
+        """
+        # imported here to not slow down the loading of the plugin
+        import asyncio
+        import requests
+
+        ids = list(ids)
+        # a client of its own, so its pool is as big as the concurrency
+        client = AsyncRestClient(concurrency=concurrency, **self._rest_client_kwargs)
+
+        async def delete_all():
+            async def delete(host_id):
+                try:
+                    await client.delete(f"hosts/{host_id}")
+                except requests.HTTPError as e:
+                    if e.response is None or e.response.status_code != 404:
+                        raise
+                    return False
+                return True
+
+            return await asyncio.gather(
+                *[delete(host_id) for host_id in ids], return_exceptions=True
+            )
+
+        try:
+            (results,) = run_concurrently(delete_all())
+        finally:
+            client.close()
+        # the hosts gone are not hosts of the current system anymore
+        gone = {
+            host_id
+            for host_id, result in zip(ids, results)
+            if not isinstance(result, Exception)
+        }
+        self._host_ids = {k: v for k, v in self._host_ids.items() if v not in gone}
+        # raise only after all the deletions are done
+        for result in results:
+            if isinstance(result, Exception):
+                raise result
+        return [host_id for host_id, deleted in zip(ids, results) if deleted]
+
+    @property
+    def seen_host_ids(self):
+        """
+        The IDs of all the hosts of the current system that this object
+        found in Inventory, e.g. using `this_system()`.
+
+        :rtype: set
+        """
+        return set(self._host_ids.values())
+
+    def _check_insights_client(self, caller):
+        if not self._insights_client:
+            raise RuntimeError(
+                f"Inventory.{caller}(): cannot invoke without insights_client"
+            )
+
     def this_system(self):
         """
         Query Inventory for the current system.
@@ -52,45 +273,59 @@ class Inventory:
         :return: The dict of the current system in Inventory
         :rtype: dict
         """
-        if not self._insights_client:
-            raise RuntimeError(
-                "Inventory.this_system(): cannot invoke without insights_client"
-            )
-        path = f"hosts?insights_id={self._insights_client.uuid}"
+        self._check_insights_client("this_system")
+        insights_id = self._insights_client.uuid
+        path = f"hosts?insights_id={insights_id}"
         res_json = self.get(path).json()
+        host = self._result_from_response("this_system", res_json)
+        self._host_ids[insights_id] = host["id"]
+        return host
+
+    def _this_system_id(self):
+        # the ID of a host does not change, so it is cached for the UUID of
+        # the system, which changes when the system is registered again
+        host_id = self._host_ids.get(self._insights_client.uuid)
+        if host_id is None:
+            host_id = self.this_system()["id"]
+        return host_id
+
+    @staticmethod
+    def _profile_params(fields):
+        if fields is None:
+            return None
+        # sparse fieldset, to transfer only the requested keys
+        return {"fields[system_profile]": ",".join(fields)}
+
+    def _result_from_response(self, caller, res_json, key=0):
+        # the single result of a query about the current system: the results
+        # are a list for hosts and system profiles, and a dict by host ID
+        # for tags
         if res_json["total"] != 1:
             raise RuntimeError(
-                f"Inventory.this_system(): {res_json['total']} hosts returned "
-                f"for the current UUID ({self._insights_client.uuid})"
+                f"Inventory.{caller}(): {res_json['total']} hosts "
+                f"returned for the current UUID ({self._insights_client.uuid})"
             )
-        return res_json["results"][0]
+        return res_json["results"][key]
 
-    def this_system_profile(self):
+    def this_system_profile(self, fields=None):
         """
         Query Inventory for the system profile of the current system.
 
         This assumes the current system is already registered with
         `insights-client`.
 
+        :param fields: The keys of the system profile to query; if not
+            specified, the whole system profile is queried
+        :type fields: list, optional
         :return: The dict of the system profile of the current system in
                  Inventory
         :rtype: dict
         """
-        if not self._insights_client:
-            raise RuntimeError(
-                "Inventory.this_system_profile(): cannot invoke without "
-                "insights_client"
-            )
-        this = self.this_system()
-        inventory_id = this["id"]
-        path = f"hosts/{inventory_id}/system_profile"
-        res_json = self.get(path).json()
-        if res_json["total"] != 1:
-            raise RuntimeError(
-                f"Inventory.this_system_profile(): {res_json['total']} hosts "
-                f"returned for the current UUID ({self._insights_client.uuid})"
-            )
-        return res_json["results"][0]["system_profile"]
+        self._check_insights_client("this_system_profile")
+        path = f"hosts/{self._this_system_id()}/system_profile"
+        res_json = self.get(path, params=self._profile_params(fields)).json()
+        result = self._result_from_response("this_system_profile", res_json)
+        return result["system_profile"]
 
     def this_system_tags(self):
         """
@@ -102,17 +337,206 @@ class Inventory:
         :return: The dict of the tags of the current system in Inventory
         :rtype: dict
         """
-        if not self._insights_client:
-            raise RuntimeError(
-                "Inventory.this_system_tags(): cannot invoke without insights_client"
+        self._check_insights_client("this_system_tags")
+        host_id = self._this_system_id()
+        res_json = self.get(f"hosts/{host_id}/tags").json()
+        return self._result_from_response("this_system_tags", res_json, host_id)
+
+    def this_system_view(self, include=("profile", "tags"), fields=None):
+        """
+        Query Inventory for several details of the current system at once.
+
+        The details are queried concurrently; this is faster than calling
+        `this_system()`, `this_system_profile()`, and `this_system_tags()`
+        one after the other.
+
+        This assumes the current system is already registered with
+        `insights-client`.
+
+        :param include: The details to query: `host` (as `this_system()`),
+            `profile` (as `this_system_profile()`), `tags` (as
+            `this_system_tags()`)
+        :type include: tuple
+        :param fields: The keys of the system profile to query; if not
+            specified, the whole system profile is queried
+        :type fields: list, optional
+        :return: A dict with the queried details, using the names in
+            `include` as keys
+        :rtype: dict
+        """
+        self._check_insights_client("this_system_view")
+        unknown = set(include) - {"host", "profile", "tags"}
+        if unknown:
+            raise ValueError(f"unknown details: {', '.join(sorted(unknown))}")
+        view = {}
+        names = []
+        calls = []
+        host_id = self._host_ids.get(self._insights_client.uuid)
+        if host_id is None:
+            host = self.this_system()
+            host_id = host["id"]
+            if "host" in include:
+                view["host"] = host
+        elif "host" in include:
+            names.append("host")
+            calls.append(self.aget(f"hosts/{host_id}"))
+        if "profile" in include:
+            names.append("profile")
+            calls.append(
+                self.aget(
+                    f"hosts/{host_id}/system_profile",
+                    params=self._profile_params(fields),
+                )
             )
-        this = self.this_system()
-        inventory_id = this["id"]
-        path = f"hosts/{inventory_id}/tags"
-        res_json = self.get(path).json()
-        if res_json["total"] != 1:
-            raise RuntimeError(
-                f"Inventory.this_system_tags(): {res_json['total']} hosts "
-                f"returned for the current UUID ({self._insights_client.uuid})"
+        if "tags" in include:
+            names.append("tags")
+            calls.append(self.aget(f"hosts/{host_id}/tags"))
+        for name, response in zip(names, run_concurrently(*calls)):
+            key = host_id if name == "tags" else 0
+            result = self._result_from_response(
+                "this_system_view", response.json(), key
             )
-        return res_json["results"][inventory_id]
+            view[name] = result["system_profile"] if name == "profile" else result
+        return view
+
+    def _get_poller(self, path, params):
+        key = (path, tuple(sorted(params.items())))
+        with self._pollers_lock:
+            poller = self._pollers.get(key)
+            if poller is None:
+                poller = self._pollers[key] = _Poller(self, path, params)
+        return poller
+
+    def _wait(
+        self,
+        what,
+        poller,
+        extract,
+        predicate,
+        timeout,
+        initial_delay,
+        max_delay,
+        start=None,
+    ):
+        # the latency is measured since 'start', if specified
+        start = start if start is not None else time.monotonic()
+        deadline = time.monotonic() + timeout
+        delay = initial_delay
+        while True:
+            # results newer than the shortest delay are good for all waiters
+            res_json = poller.fetch(max_age=initial_delay / 2)
+            value = extract(res_json) if res_json is not None else None
+            if value is not None and predicate(value):
+                latency = time.monotonic() - start
+                LOGGER.info("%s ready in Inventory after %.2fs", what, latency)
+                TRACER.metric("inventory.wait_latency", latency, resource=what)
+                self.last_wait_latency = latency
+                return value
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise InventoryTimeoutError(
+                    f"{what} not ready in Inventory after {timeout} seconds"
+                )
+            # exponential backoff, with jitter to spread concurrent waiters
+            time.sleep(min(random.uniform(delay / 2, delay), remaining))
+            delay = min(delay * 2, max_delay)
+
+    def wait_for_system(
+        self, predicate=None, timeout=300, initial_delay=1.0, max_delay=30.0
+    ):
+        """
+        Wait for the current system to show up in Inventory.
+
+        Inventory is queried repeatedly, waiting longer after each query
+        (up to `max_delay`), until the current system is found and
+        `predicate` returns true for it.
+
+        This assumes the current system is already registered with
+        `insights-client`.
+
+        :param predicate: A function called with the dict of the current
+            system in Inventory, returning whether it is what is expected;
+            if not specified, any system is good
+        :type predicate: callable, optional
+        :param timeout: How long to wait at most, in seconds; raises
+            `InventoryTimeoutError` when exceeded
+        :type timeout: float
+        :param initial_delay: The wait after the first query, in seconds
+        :type initial_delay: float
+        :param max_delay: The maximum wait between queries, in seconds
+        :type max_delay: float
+        :return: The dict of the current system in Inventory
+        :rtype: dict
+        """
+        self._check_insights_client("wait_for_system")
+        insights_id = self._insights_client.uuid
+
+        def extract(res_json):
+            if res_json["total"] != 1:
+                return None
+            host = res_json["results"][0]
+            self._host_ids[insights_id] = host["id"]
+            return host
+
+        return self._wait(
+            "system",
+            self._get_poller("hosts", {"insights_id": str(insights_id)}),
+            extract,
+            predicate or (lambda host: True),
+            timeout,
+            initial_delay,
+            max_delay,
+        )
+
+    def wait_for_profile(
+        self,
+        predicate=None,
+        fields=None,
+        timeout=300,
+        initial_delay=1.0,
+        max_delay=30.0,
+    ):
+        """
+        Wait for the system profile of the current system to show up in
+        Inventory.
+
+        This is the same as `wait_for_system()`, for the system profile
+        of the current system (waiting also for the system, if needed; the
+        measured latency includes this wait).
+
+        :param predicate: A function called with the dict of the system
+            profile, returning whether it is what is expected; if not
+            specified, any non-empty system profile is good
+        :type predicate: callable, optional
+        :param fields: The keys of the system profile to query; if not
+            specified, the whole system profile is queried
+        :type fields: list, optional
+        :return: The dict of the system profile of the current system in
+            Inventory
+        :rtype: dict
+        """
+        self._check_insights_client("wait_for_profile")
+        start = time.monotonic()
+        host_id = self._host_ids.get(self._insights_client.uuid)
+        if host_id is None:
+            host_id = self.wait_for_system(
+                timeout=timeout, initial_delay=initial_delay, max_delay=max_delay
+            )["id"]
+
+        def extract(res_json):
+            if res_json["total"] != 1:
+                return None
+            return res_json["results"][0]["system_profile"]
+
+        return self._wait(
+            "system profile",
+            self._get_poller(
+                f"hosts/{host_id}/system_profile", self._profile_params(fields) or {}
+            ),
+            extract,
+            predicate or bool,
+            max(timeout - (time.monotonic() - start), 0),
+            initial_delay,
+            max_delay,
+            start=start,
+        )
@@ -0,0 +1,234 @@
+# SPDX-FileCopyrightText: Red Hat
+# SPDX-License-Identifier: MIT
+
+import dataclasses
+import json
+import math
+import pathlib
+import statistics
+
+from .logger import LOGGER
+from .util import atomic_write_text
+
+
+class PerfBudgetExceededError(AssertionError):
+    """
+    The performance of a command is worse than its baseline.
+    """
+
+
+def _percentile(values, percent):
+    # nearest-rank percentile
+    ordered = sorted(values)
+    rank = max(math.ceil(percent / 100 * len(ordered)), 1)
+    return ordered[rank - 1]
+
+
+@dataclasses.dataclass
+class PerfStats:
+    """
+    Performance statistics of repeated executions of a command.
+
+    The times are in seconds, the RSS values in kilobytes.
+    """
+
+    samples: int
+    wall_median: float
+    wall_p95: float
+    cpu_median: float
+    cpu_p95: float
+    rss_median: float
+    rss_p95: float
+
+    METRICS = (
+        "wall_median",
+        "wall_p95",
+        "cpu_median",
+        "cpu_p95",
+        "rss_median",
+        "rss_p95",
+    )
+
+    @classmethod
+    def from_resources(cls, resources):
+        """
+        Compute the statistics from a list of
+        [`ProcessResources`][pytest_client_tools.util.ProcessResources].
+        """
+        wall = [r.wall_time for r in resources]
+        cpu = [r.cpu_time or 0.0 for r in resources]
+        rss = [r.max_rss or 0 for r in resources]
+        return cls(
+            samples=len(resources),
+            wall_median=statistics.median(wall),
+            wall_p95=_percentile(wall, 95),
+            cpu_median=statistics.median(cpu),
+            cpu_p95=_percentile(cpu, 95),
+            rss_median=statistics.median(rss),
+            rss_p95=_percentile(rss, 95),
+        )
+
+    def exceeded_metrics(self, baseline, tolerance):
+        """
+        Compare with a baseline.
+
+        :param baseline: The baseline to compare with
+        :type baseline: pytest_client_tools.perf.PerfStats
+        :param tolerance: The allowed relative increase over the baseline,
+            e.g. `0.2` for 20%
+        :type tolerance: float
+        :return: The list of (metric, value, baseline value) which exceed the
+            baseline more than the tolerance
+        :rtype: list
+        """
+        exceeded = []
+        for metric in self.METRICS:
+            value = getattr(self, metric)
+            baseline_value = getattr(baseline, metric)
+            if value > baseline_value * (1 + tolerance):
+                exceeded.append((metric, value, baseline_value))
+        return exceeded
+
+
+class PerfBaselines:
+    """
+    Performance baselines, stored in a JSON file.
+
+    The file is read when a baseline is first needed, and written by
+    `save()` only if some baseline was changed.
+    """
+
+    def __init__(self, path):
+        self._path = pathlib.Path(path)
+        self._baselines = None
+        self._changed = {}
+
+    @property
+    def path(self):
+        """
+        The path of the JSON file with the baselines.
+        """
+        return self._path
+
+    def _read(self):
+        try:
+            return json.loads(self._path.read_text())
+        except FileNotFoundError:
+            return {}
+
+    def get(self, key):
+        """
+        Return the baseline for the specified key, or `None` if missing.
+        """
+        if self._baselines is None:
+            self._baselines = self._read()
+        data = self._baselines.get(key)
+        if data is None:
+            return None
+        return PerfStats(**data)
+
+    def set(self, key, stats):
+        """
+        Set the baseline for the specified key.
+        """
+        if self._baselines is None:
+            self._baselines = self._read()
+        data = dataclasses.asdict(stats)
+        self._baselines[key] = data
+        self._changed[key] = data
+
+    def save(self):
+        """
+        Save the changed baselines.
+
+        The file is read again before writing it, so baselines saved
+        meanwhile by other processes (e.g. pytest-xdist workers) are kept.
+        """
+        if not self._changed:
+            return
+        baselines = self._read()
+        baselines.update(self._changed)
+        atomic_write_text(self._path, json.dumps(baselines, indent=2, sort_keys=True))
+        self._changed = {}
+
+
+class PerfBudget:
+    """
+    Performance budget for commands.
+
+    This class runs commands repeatedly, comparing their performance
+    statistics with stored baselines.
+    """
+
+    def __init__(self, baselines, key_prefix, repeat=5, tolerance=0.2, update=False):
+        """
+        Create a new PerfBudget object.
+
+        :param baselines: The baselines to compare with
+        :type baselines: pytest_client_tools.perf.PerfBaselines
+        :param key_prefix: The prefix for the keys of the baselines,
+            usually the ID of the test
+        :type key_prefix: str
+        :param repeat: The default number of executions of each command
+        :type repeat: int
+        :param tolerance: The default allowed relative increase over the
+            baselines, e.g. `0.2` for 20%
+        :type tolerance: float
+        :param update: Whether to store the measured statistics as new
+            baselines, rather than comparing them
+        :type update: bool
+        """
+        self._baselines = baselines
+        self._key_prefix = key_prefix
+        self._repeat = repeat
+        self._tolerance = tolerance
+        self._update = update
+
+    def measure(self, name, func, *args, repeat=None, tolerance=None, **kwargs):
+        """
+        Measure the performance of a command.
+
+        `func` is called repeatedly with the specified arguments; it must
+        return the `subprocess.CompletedProcess` of a command run using the
+        client tools wrappers (e.g. `SubscriptionManager.run`), which has
+        the resources used by the command.
+
+        In case there is no baseline yet, the measured statistics are stored
+        as baseline. Otherwise, `PerfBudgetExceededError` is raised when any
+        of the statistics exceed the baseline more than the tolerance.
+
+        :param name: The name of the measurement, unique within the test
+        :type name: str
+        :param func: The function to call
+        :type func: callable
+        :param repeat: The number of executions; if not specified, the
+            default of this object is used
+        :type repeat: int, optional
+        :param tolerance: The allowed relative increase over the baseline;
+            if not specified, the default of this object is used
+        :type tolerance: float, optional
+        :return: The statistics of the executions
+        :rtype: pytest_client_tools.perf.PerfStats
+        """
+        repeat = repeat if repeat is not None else self._repeat
+        tolerance = tolerance if tolerance is not None else self._tolerance
+        resources = [func(*args, **kwargs).resources for _ in range(repeat)]
+        stats = PerfStats.from_resources(resources)
+        key = f"{self._key_prefix}::{name}"
+        baseline = None if self._update else self._baselines.get(key)
+        if baseline is None:
+            LOGGER.info("storing performance baseline for %s: %s", key, stats)
+            self._baselines.set(key, stats)
+            return stats
+        LOGGER.debug("performance of %s: %s (baseline: %s)", key, stats, baseline)
+        exceeded = stats.exceeded_metrics(baseline, tolerance)
+        if exceeded:
+            details = ", ".join(
+                f"{metric}={value:.3f} (baseline {baseline_value:.3f})"
+                for metric, value, baseline_value in exceeded
+            )
+            raise PerfBudgetExceededError(
+                f"{key}: performance exceeds the baseline by more than "
+                f"{tolerance:.0%}: {details}"
+            )
+        return stats
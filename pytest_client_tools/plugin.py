@@ -13,13 +13,19 @@ import time
 import uuid
 
 import pytest
-import toml
 
+from . import SystemNotRegisteredError
 from .candlepin import Candlepin, ping_candlepin
 from .inventory import Inventory
-from .insights_client import InsightsClient, INSIGHTS_CLIENT_FILES_TO_SAVE
+from .insights_client import (
+    InsightsClient,
+    InsightsCollectionCache,
+    INSIGHTS_CLIENT_FILES_TO_SAVE,
+)
 from .logger import LOGGER
+from .perf import PerfBaselines, PerfBudget
 from .podman import Podman
+from .profiling import PROFILE_MODES, TOOL_PROFILER
 from .subscription_manager import (
     SubscriptionManager,
     SUBMAN_FILES_TO_SAVE,
@@ -27,7 +33,18 @@ from .subscription_manager import (
 )
 from .rhc import Rhc, RHC_FILES_TO_SAVE
 from .test_config import TestConfig
-from .util import ClientToolsPluginData, NodeRunningData, logged_run
+from .tool_logs import ToolLogs
+from .tracing import TRACER
+from .util import (
+    COMMAND_STATS,
+    COMMAND_TIMEOUTS,
+    ArtifactsCollector,
+    ClientToolsPluginData,
+    NodeRunningData,
+    journal_cursor,
+    logged_run,
+    read_journal,
+)
 
 
 _MARKERS = {
@@ -40,6 +57,23 @@ _MARKERS = {
     "external_inventory": "tests requiring an external Inventory service",
 }
 _CANDLEPIN_FIXTURES = {x for x in _MARKERS.keys() if "candlepin" in x}
+# the systemd units whose journal is captured for each test by default
+_JOURNAL_UNITS = [
+    "rhsmcertd.service",
+    "rhcd.service",
+    "yggdrasil.service",
+    "insights-client.service",
+    "insights-client.timer",
+    "insights-client-results.service",
+    "insights-client-results.path",
+]
+# the fixtures of the client tools: only the tests using them capture the
+# journal, so unrelated test suites do not pay for it
+_JOURNAL_FIXTURES = ("subman", "subman_session", "insights_client", "rhc")
+_INVENTORY_FIXTURES = ("external_inventory", "fake_inventory")
+_PERF_BASELINES_FILE = "client-tools-perf-baselines.json"
+# fixture -> span of its teardown, for tracing
+_fixture_teardown_spans = {}
 
 
 def _save_and_archive(files, subdir):
@@ -57,18 +91,20 @@ def _save_and_archive(files, subdir):
             artifacts_collector = running_data.artifacts
             backup_path = tmp_path / f"backup-{subdir}"
             backup_path.mkdir()
-            for f in files:
-                with contextlib.suppress(FileNotFoundError):
-                    if f.remove_at_start:
-                        shutil.move(str(f.path), str(backup_path))
-                    else:
-                        shutil.copy2(f.path, backup_path)
+            with TRACER.span(f"backup {subdir} files", "files"):
+                for f in files:
+                    with contextlib.suppress(FileNotFoundError):
+                        if f.remove_at_start:
+                            shutil.move(str(f.path), str(backup_path))
+                        else:
+                            shutil.copy2(f.path, backup_path)
             yield from func(*args, **kwargs)
-            for f in files:
-                with contextlib.suppress(FileNotFoundError):
-                    artifacts_collector.copy(f.path)
-                with contextlib.suppress(FileNotFoundError):
-                    shutil.move(str(backup_path / f.path.name), str(f.path))
+            with TRACER.span(f"restore {subdir} files", "files"):
+                for f in files:
+                    with contextlib.suppress(FileNotFoundError):
+                        artifacts_collector.copy(f.path)
+                    with contextlib.suppress(FileNotFoundError):
+                        shutil.move(str(backup_path / f.path.name), str(f.path))
 
         return function_wrapper
 
@@ -85,7 +121,10 @@ def _create_candlepin_container():
 
 @pytest.fixture(scope="session")
 def test_config(request):
-    return TestConfig()
+    # pytest-xdist workers get the configuration already validated by the
+    # controller, see pytest_configure_node()
+    workerinput = getattr(request.config, "workerinput", {})
+    return TestConfig(snapshot=workerinput.get("client_tools_test_config"))
 
 
 @pytest.fixture(scope="session")
@@ -220,6 +259,56 @@ def insights_client(save_insights_client_files, test_config):
             insights_client.unregister()
 
 
+@pytest.fixture(scope="session")
+def _egg_mirror(request, tmp_path_factory):
+    # imported here to not slow down the loading of the plugin
+    from .fake_insights import EggMirror
+
+    path = request.config.getoption("--client-tools-egg-mirror")
+    cache = getattr(request.config, "cache", None)
+    if not path and cache is not None:
+        # Cache.makedir() was replaced by Cache.mkdir() in pytest 7
+        mkdir = getattr(cache, "mkdir", None) or cache.makedir
+        path = str(mkdir("client-tools-eggs"))
+    elif not path:
+        # no cache (e.g. "-p no:cacheprovider"): a mirror only for the session
+        path = str(tmp_path_factory.mktemp("client-tools-eggs"))
+    mirror = EggMirror(path)
+    mirror.add_system_eggs()
+    return mirror
+
+
+@pytest.fixture
+def insights_egg_mirror(insights_client, fake_insights, _egg_mirror):
+    # imported here to not slow down the loading of the plugin
+    from .fake_insights import EGG_GPG_PATH, EGG_PATH
+
+    if not _egg_mirror.versions:
+        pytest.skip("no insights-core egg available for the mirror")
+    _egg_mirror.select(None)
+    insights_client.config.egg_path = EGG_PATH
+    insights_client.config.egg_gpg_path = EGG_GPG_PATH
+    insights_client.config.auto_update = True
+    insights_client.config.save()
+    fake_insights.egg_mirror = _egg_mirror
+    try:
+        yield _egg_mirror
+    finally:
+        fake_insights.egg_mirror = None
+
+
+@pytest.fixture(scope="session")
+def _insights_collections(tmp_path_factory):
+    cache = InsightsCollectionCache(tmp_path_factory.mktemp("insights-collections"))
+    yield cache
+    cache.close()
+
+
+@pytest.fixture
+def insights_collection(insights_client, _insights_collections):
+    return _insights_collections.get(insights_client)
+
+
 @pytest.fixture
 @_save_and_archive(files=RHC_FILES_TO_SAVE, subdir="rhc")
 def save_rhc_files(request):
@@ -228,20 +317,20 @@ def save_rhc_files(request):
 
 @pytest.fixture
 def rhc(save_rhc_files, test_config):
+    import toml
+
     rhc = Rhc()
-    config_file = pathlib.Path("/etc/rhc/config.toml")
-    try:
-        config = toml.loads(config_file.read_text())
-    except FileNotFoundError:
-        # file not found, start from an empty config
-        config = {}
-    except toml.TomlDecodeError as e:
-        LOGGER.warning(
-            "cannot load %s as TOML (skipping customizations): %s", config_file, e
-        )
-    else:
-        config["log-level"] = "trace"
-        config_file.write_text(toml.dumps(config))
+    if rhc.config.path.exists():
+        try:
+            rhc.config["log-level"] = "trace"
+        except toml.TomlDecodeError as e:
+            LOGGER.warning(
+                "cannot load %s as TOML (skipping customizations): %s",
+                rhc.config.path,
+                e,
+            )
+        else:
+            rhc.config.save()
     try:
         yield rhc
     finally:
@@ -249,11 +338,7 @@ def rhc(save_rhc_files, test_config):
             rhc.disconnect()
 
 
-@pytest.fixture(scope="session")
-def external_inventory(request, test_config):
-    external_candlepin = request.getfixturevalue("external_candlepin")
-    if not external_candlepin:
-        pytest.skip("missing 'external_candlepin' fixture")
+def _insights_verify(test_config):
     # get the CA path: if it is non-empty, then it means that
     # the specified path enforces the SSL validation
     verify = test_config.get("insights", "ca_path")
@@ -261,22 +346,181 @@ def external_inventory(request, test_config):
         # empty/unset CA path: get whether verify the SSL connection
         # using the system CA store
         verify = not test_config.get("insights", "insecure")
+    return verify
+
+
+@pytest.fixture(scope="session")
+def external_inventory(request, test_config):
+    external_candlepin = request.getfixturevalue("external_candlepin")
+    if not external_candlepin:
+        pytest.skip("missing 'external_candlepin' fixture")
     inventory = Inventory(
         base_url=test_config.get("insights", "base_url") + "/inventory/v1",
-        verify=verify,
+        verify=_insights_verify(test_config),
     )
     yield inventory
 
 
+@pytest.fixture(scope="session")
+def _inventory_sweep(test_config):
+    # the UUIDs of the systems, and the IDs of the hosts, registered by the
+    # tests; the hosts are deleted at the end of the session, all at once
+    insights_ids = set()
+    host_ids = set()
+    yield insights_ids, host_ids
+    if not insights_ids and not host_ids:
+        return
+    try:
+        auth = (
+            test_config.get("insights", "username"),
+            test_config.get("insights", "password"),
+        )
+    except KeyError:
+        LOGGER.warning(
+            "cannot delete the hosts of the tests from Inventory: "
+            "'insights.username' and 'insights.password' are not set"
+        )
+        return
+    # the certificates of the systems are gone after unregistering, so
+    # authenticate with the configured credentials
+    inventory = Inventory(
+        base_url=test_config.get("insights", "base_url") + "/inventory/v1",
+        verify=_insights_verify(test_config),
+        cert=None,
+        auth=auth,
+    )
+    try:
+        host_ids.update(inventory.find_host_ids(insights_ids))
+        deleted = inventory.bulk_delete(host_ids)
+    except Exception as e:
+        LOGGER.warning("cannot delete the hosts of the tests from Inventory: %s", e)
+    else:
+        LOGGER.info("deleted %d leftover hosts from Inventory", len(deleted))
+
+
+@pytest.fixture(scope="session")
+def fake_inventory_server():
+    # imported here to not slow down the loading of the plugin
+    from .fake_inventory import FakeInventoryServer
+
+    server = FakeInventoryServer()
+    server.start()
+    try:
+        yield server
+    finally:
+        server.stop()
+
+
+@pytest.fixture
+def fake_inventory(request):
+    if "fake_insights" in request.fixturenames:
+        # share the hosts with the uploads of insights-client
+        request.getfixturevalue("fake_insights")
+        server = request.getfixturevalue("fake_insights_server")
+    else:
+        server = request.getfixturevalue("fake_inventory_server")
+        server.store.clear()
+    # the stand-in does not authenticate the clients
+    return Inventory(
+        base_url=server.url + server.prefix,
+        verify=str(server.certfile) if server.certfile else True,
+        cert=None,
+    )
+
+
+@pytest.fixture(scope="session")
+def fake_insights_server(tmp_path_factory):
+    # imported here to not slow down the loading of the plugin
+    from .fake_insights import FakeInsightsServer
+    from .httpserver import generate_certificate
+
+    directory = tmp_path_factory.mktemp("fake-insights")
+    certfile, keyfile = generate_certificate(directory)
+    server = FakeInsightsServer(directory / "uploads", certfile, keyfile)
+    server.start()
+    try:
+        yield server
+    finally:
+        server.stop()
+
+
+@pytest.fixture
+def fake_insights(insights_client, fake_insights_server):
+    fake_insights_server.clear()
+    fake_insights_server.configure(insights_client.config)
+    insights_client.config.save()
+    yield fake_insights_server
+
+
+@pytest.fixture
+def tool_logs():
+    return ToolLogs()
+
+
+@pytest.fixture(scope="session")
+def _perf_baselines(request):
+    path = request.config.getoption("--client-tools-perf-baselines")
+    if not path:
+        path = pathlib.Path(str(request.config.rootdir)) / _PERF_BASELINES_FILE
+    baselines = PerfBaselines(path)
+    yield baselines
+    baselines.save()
+
+
+@pytest.fixture
+def perf_budget(request, _perf_baselines):
+    config = request.config
+    marker = request.node.get_closest_marker("perf")
+    options = marker.kwargs if marker else {}
+    yield PerfBudget(
+        _perf_baselines,
+        key_prefix=request.node.nodeid,
+        repeat=options.get("repeat", config.getoption("--client-tools-perf-repeat")),
+        tolerance=options.get(
+            "tolerance", config.getoption("--client-tools-perf-tolerance")
+        ),
+        update=config.getoption("--client-tools-perf-update"),
+    )
+
+
 @pytest.fixture
 def _init_inventory_from_insights_client(request):
     insights_client = request.getfixturevalue("insights_client")
     assert insights_client
-    external_inventory = request.getfixturevalue("external_inventory")
-    assert external_inventory
-    external_inventory._insights_client = insights_client
+    inventory_fixture = next(
+        i for i in _INVENTORY_FIXTURES if i in request.fixturenames
+    )
+    inventory = request.getfixturevalue(inventory_fixture)
+    assert inventory
+    inventory._insights_client = insights_client
+    sweep = (
+        request.config.getoption("--client-tools-inventory-sweep")
+        and inventory_fixture == "external_inventory"
+    )
+    if sweep:
+        insights_ids, host_ids = request.getfixturevalue("_inventory_sweep")
     yield
-    external_inventory._insights_client = None
+    if sweep:
+        # collect the UUID of the system while it is still registered; its
+        # hosts are looked up at the end of the session, so also the hosts
+        # showing up late in Inventory are deleted
+        with contextlib.suppress(
+            SystemNotRegisteredError, OSError, ValueError, subprocess.SubprocessError
+        ):
+            insights_ids.add(str(insights_client.uuid))
+        host_ids.update(inventory.seen_host_ids)
+    inventory._insights_client = None
+
+
+def pytest_addhooks(pluginmanager):
+    from . import hooks
+
+    pluginmanager.add_hookspecs(hooks)
+
+
+def pytest_plugin_registered(plugin, manager):
+    # plugins may implement the hooks of the tracer
+    TRACER.update_hooks()
 
 
 def pytest_addoption(parser):
@@ -286,6 +530,92 @@ def pytest_addoption(parser):
         action="store_true",
         help="the container of Candlepin is already running",
     )
+    group.addoption(
+        "--client-tools-perf-baselines",
+        metavar="PATH",
+        help="the JSON file with the baselines for the 'perf_budget' fixture "
+        f"(default: {_PERF_BASELINES_FILE} in the root directory)",
+    )
+    group.addoption(
+        "--client-tools-perf-update",
+        action="store_true",
+        help="store the measurements of the 'perf_budget' fixture as new "
+        "baselines, instead of comparing them",
+    )
+    group.addoption(
+        "--client-tools-perf-repeat",
+        type=int,
+        default=5,
+        metavar="N",
+        help="how many times the 'perf_budget' fixture runs each command "
+        "(default: %(default)s)",
+    )
+    group.addoption(
+        "--client-tools-perf-tolerance",
+        type=float,
+        default=0.2,
+        metavar="RATIO",
+        help="the allowed relative increase over the baselines for the "
+        "'perf_budget' fixture (default: %(default)s)",
+    )
+    group.addoption(
+        "--client-tools-trace",
+        metavar="PATH",
+        help="write a trace of the session (in the JSON Trace Event Format, "
+        "e.g. for Perfetto) to the specified file",
+    )
+    group.addoption(
+        "--client-tools-profile",
+        choices=PROFILE_MODES,
+        help="profile the Python client tools (subscription-manager, "
+        "insights-client), saving the data in the artifacts of each test",
+    )
+    group.addoption(
+        "--client-tools-profile-top",
+        type=int,
+        default=20,
+        metavar="N",
+        help="how many entries to show in the profile summaries "
+        "(default: %(default)s)",
+    )
+    group.addoption(
+        "--client-tools-inventory-sweep",
+        action="store_true",
+        help="delete from Inventory, at the end of the session, the hosts of the "
+        "systems registered by the tests using the 'external_inventory' fixture; "
+        "requires the 'insights.username' and 'insights.password' configuration "
+        "keys",
+    )
+    group.addoption(
+        "--client-tools-egg-mirror",
+        metavar="PATH",
+        help="the directory where the 'insights_egg_mirror' fixture stores "
+        "the core eggs (default: in the cache directory of pytest)",
+    )
+    group.addoption(
+        "--client-tools-timeout",
+        action="append",
+        default=[],
+        metavar="COMMAND=SECONDS",
+        help="the time budget of a command run by the client tools wrappers, "
+        "as 'TOOL[ SUBCOMMAND]=SECONDS' or 'default=SECONDS'; commands "
+        "exceeding it are killed with their process group (can be repeated, "
+        "and it overrides the 'client_tools_timeouts' ini option)",
+    )
+    parser.addini(
+        "client_tools_timeouts",
+        type="linelist",
+        default=[],
+        help="the time budgets of the commands run by the client tools "
+        "wrappers, one 'TOOL[ SUBCOMMAND]=SECONDS' per line",
+    )
+    parser.addini(
+        "client_tools_journal_units",
+        type="linelist",
+        default=_JOURNAL_UNITS,
+        help="the systemd units whose journal entries are saved for each "
+        "test using the client tools fixtures, one per line (empty to disable)",
+    )
 
 
 def pytest_collection_modifyitems(config, items):
@@ -298,6 +628,8 @@ def pytest_collection_modifyitems(config, items):
                 continue
             if fixture_name not in item_markers:
                 markers_to_add.add(fixture_name)
+        if "perf_budget" in item.fixturenames and "perf" not in item_markers:
+            markers_to_add.add("perf")
         for marker in markers_to_add:
             item.add_marker(marker)
         if "rhc" in item.fixturenames:
@@ -305,9 +637,8 @@ def pytest_collection_modifyitems(config, items):
                 item.fixturenames.append("subman")
             if "insights_client" not in item.fixturenames:
                 item.fixturenames.append("insights_client")
-        if (
-            "insights_client" in item.fixturenames
-            and "external_inventory" in item.fixturenames
+        if "insights_client" in item.fixturenames and any(
+            i in item.fixturenames for i in _INVENTORY_FIXTURES
         ):
             item.fixturenames.append("_init_inventory_from_insights_client")
         for jira_marker in item.iter_markers(name="jira"):
@@ -325,8 +656,47 @@ def pytest_configure(config):
     for mark, description in _MARKERS.items():
         config.addinivalue_line("markers", f"{mark}: {description}")
     config.addinivalue_line("markers", "jira(id): test for jira cards")
+    config.addinivalue_line(
+        "markers",
+        "perf(repeat=N, tolerance=RATIO): performance tests using 'perf_budget'",
+    )
     locale.setlocale(locale.LC_ALL, "C.UTF-8")
     pytest._client_tools = ClientToolsPluginData()
+    ArtifactsCollector.current = pytest._client_tools.global_running_data.artifacts
+    TOOL_PROFILER.mode = config.getoption("--client-tools-profile")
+    TOOL_PROFILER.top = config.getoption("--client-tools-profile-top")
+    TRACER.enabled = bool(config.getoption("--client-tools-trace"))
+    TRACER.worker_id = getattr(config, "workerinput", {}).get("workerid", "main")
+    TRACER.set_hook(config.hook)
+    pytest._client_tools.journal_units = config.getini("client_tools_journal_units")
+    COMMAND_TIMEOUTS.clear()
+    for spec in config.getini("client_tools_timeouts") + config.getoption(
+        "--client-tools-timeout"
+    ):
+        try:
+            COMMAND_TIMEOUTS.set_from_spec(spec)
+        except ValueError as e:
+            raise pytest.UsageError(str(e))
+
+
+def pytest_unconfigure(config):
+    TOOL_PROFILER.close()
+
+
+@pytest.hookimpl(optionalhook=True)
+def pytest_configure_node(node):
+    # pytest-xdist controller: read & validate the configuration only once,
+    # passing it to all the workers
+    plugin_data = pytest._client_tools
+    if plugin_data.test_config_snapshot is None:
+        try:
+            plugin_data.test_config_snapshot = TestConfig().snapshot()
+        except Exception as e:
+            # let the workers fail when they use the configuration
+            LOGGER.warning("cannot load the configuration: %s", e)
+            plugin_data.test_config_snapshot = {}
+    if plugin_data.test_config_snapshot:
+        node.workerinput["client_tools_test_config"] = plugin_data.test_config_snapshot
 
 
 def pytest_runtestloop(session):
@@ -336,62 +706,175 @@ def pytest_runtestloop(session):
 
 
 def pytest_runtest_protocol(item, nextitem):
+    # probe here rather than in pytest_configure(), so sessions that do not
+    # run any test do not pay for it
+    log_selinux_audits = pytest._client_tools.log_selinux_audits
+    capture_journal = (
+        any(f in item.fixturenames for f in _JOURNAL_FIXTURES)
+        and pytest._client_tools.capture_journal
+    )
     node_running_data = NodeRunningData(item)
     pytest._client_tools.running_data[item.nodeid] = node_running_data
+    ArtifactsCollector.current = node_running_data.artifacts
+    TRACER.nodeid = item.nodeid
     LOGGER.handlers.remove(pytest._client_tools.global_running_data.handler)
     logging.getLogger().addHandler(node_running_data.handler)
-    if pytest._client_tools.log_selinux_audits:
+    if log_selinux_audits:
         node_running_data.timestamp = datetime.datetime.now()
+    if capture_journal:
+        _start_journal_capture(node_running_data)
 
 
-def pytest_runtest_logfinish(nodeid, location):
-    node_running_data = pytest._client_tools.running_data.pop(nodeid)
-    node_running_data.archive_test_log()
-    if pytest._client_tools.log_selinux_audits:
-        time.sleep(1)
-        marker = f"pytest-client-tools-{uuid.uuid4()}"
-        logged_run(
-            ["auditctl", "-m", marker],
-            check=True,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            text=True,
+def _start_journal_capture(node_running_data):
+    try:
+        node_running_data.journal_cursor = journal_cursor()
+    except (OSError, subprocess.SubprocessError) as e:
+        LOGGER.warning("disabling journal capture: %s", e)
+        pytest._client_tools.capture_journal = False
+    else:
+        node_running_data.capture_journal = True
+
+
+def _collect_journal(node_running_data):
+    try:
+        entries = read_journal(
+            pytest._client_tools.journal_units, node_running_data.journal_cursor
         )
-        for _ in range(1, 100):
-            proc = logged_run(
-                f"ausearch -i -m user | grep -q {marker}",
-                check=False,
-                stdin=subprocess.DEVNULL,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                shell=True,
-                text=True,
-            )
-            if proc.returncode == 0:
-                break
-            time.sleep(0.1)
-        proc_ausearch = logged_run(
-            [
-                "ausearch",
-                "-i",
-                "-m",
-                "avc",
-                "-ts",
-                node_running_data.timestamp.strftime("%x"),
-                node_running_data.timestamp.strftime("%T"),
-            ],
+    except (OSError, subprocess.SubprocessError) as e:
+        LOGGER.warning("disabling journal capture: %s", e)
+        pytest._client_tools.capture_journal = False
+        return
+    if entries:
+        node_running_data.artifacts.write_text("journal.log", entries)
+
+
+def _collect_selinux_denials(node_running_data):
+    time.sleep(1)
+    marker = f"pytest-client-tools-{uuid.uuid4()}"
+    logged_run(
+        ["auditctl", "-m", marker],
+        check=True,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        text=True,
+        internal=True,
+    )
+    for _ in range(1, 100):
+        proc = logged_run(
+            f"ausearch -i -m user | grep -q {marker}",
             check=False,
+            stdin=subprocess.DEVNULL,
             stdout=subprocess.PIPE,
             stderr=subprocess.PIPE,
+            shell=True,
             text=True,
+            internal=True,
         )
-        if proc_ausearch.returncode not in [0, 1]:
-            proc_ausearch.check_returncode()
-        if proc_ausearch.stdout:
-            node_running_data.artifacts.write_text("selinux.log", proc_ausearch.stdout)
+        if proc.returncode == 0:
+            break
+        time.sleep(0.1)
+    proc_ausearch = logged_run(
+        [
+            "ausearch",
+            "-i",
+            "-m",
+            "avc",
+            "-ts",
+            node_running_data.timestamp.strftime("%x"),
+            node_running_data.timestamp.strftime("%T"),
+        ],
+        check=False,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        text=True,
+        internal=True,
+    )
+    if proc_ausearch.returncode not in [0, 1]:
+        proc_ausearch.check_returncode()
+    if proc_ausearch.stdout:
+        node_running_data.artifacts.write_text("selinux.log", proc_ausearch.stdout)
+
+
+def pytest_runtest_logfinish(nodeid, location):
+    node_running_data = pytest._client_tools.running_data.pop(nodeid)
+    node_running_data.archive_test_log()
+    if pytest._client_tools.log_selinux_audits:
+        with TRACER.span("collect SELinux denials", "selinux"):
+            _collect_selinux_denials(node_running_data)
+    if node_running_data.capture_journal and pytest._client_tools.capture_journal:
+        with TRACER.span("collect journal", "journal"):
+            _collect_journal(node_running_data)
     logging.getLogger().handlers.remove(node_running_data.handler)
     LOGGER.addHandler(pytest._client_tools.global_running_data.handler)
+    ArtifactsCollector.current = pytest._client_tools.global_running_data.artifacts
+    TRACER.nodeid = None
+
+
+@pytest.hookimpl(hookwrapper=True)
+def pytest_fixture_setup(fixturedef, request):
+    if not TRACER.active:
+        yield
+        return
+    with TRACER.span(f"setup {fixturedef.argname}", "fixture"):
+        outcome = yield
+    if outcome.excinfo is None:
+        # added after the finalizers of the fixture itself, so it runs before
+        # them and marks the beginning of the teardown
+        key = (id(fixturedef), request.node.nodeid)
+
+        def teardown_start():
+            _fixture_teardown_spans[key] = TRACER.start_span(
+                f"teardown {fixturedef.argname}", "fixture"
+            )
+
+        fixturedef.addfinalizer(teardown_start)
+
+
+def pytest_fixture_post_finalizer(fixturedef, request):
+    span = _fixture_teardown_spans.pop((id(fixturedef), request.node.nodeid), None)
+    if span is not None:
+        span.finish()
+
+
+@pytest.hookimpl(hookwrapper=True)
+def pytest_runtest_makereport(item, call):
+    for name, summary in TOOL_PROFILER.pop_summaries():
+        item.add_report_section(call.when, f"client tools profile: {name}", summary)
+    yield
+
+
+@pytest.hookimpl(optionalhook=True)
+def pytest_testnodedown(node, error):
+    # pytest-xdist controller: collect the statistics of the worker
+    records = getattr(node, "workeroutput", {}).get("client_tools_command_stats")
+    if records:
+        COMMAND_STATS.merge(records)
 
 
 def pytest_sessionfinish(session, exitstatus):
     pytest._client_tools.global_running_data.archive_test_log()
+    workeroutput = getattr(session.config, "workeroutput", None)
+    if workeroutput is not None:
+        # pytest-xdist worker: pass the statistics to the controller
+        workeroutput["client_tools_command_stats"] = COMMAND_STATS.to_records()
+    elif COMMAND_STATS:
+        pytest._client_tools.global_running_data.artifacts.write_text(
+            "client-tools-usage.json", COMMAND_STATS.to_json()
+        )
+    trace_path = session.config.getoption("--client-tools-trace")
+    if trace_path:
+        trace_path = pathlib.Path(trace_path)
+        if workeroutput is not None:
+            # pytest-xdist worker: write a separate trace, merged by the
+            # controller
+            TRACER.write(f"{trace_path}.{TRACER.worker_id}")
+        else:
+            TRACER.write(trace_path, trace_path.parent.glob(f"{trace_path.name}.gw*"))
+
+
+def pytest_terminal_summary(terminalreporter, exitstatus, config):
+    if not COMMAND_STATS:
+        return
+    terminalreporter.write_sep("=", "client tools usage")
+    for line in COMMAND_STATS.format_table():
+        terminalreporter.write_line(line)
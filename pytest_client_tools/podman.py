@@ -5,6 +5,8 @@ import contextlib
 import functools
 import subprocess
 
+from .tracing import TRACER
+
 
 class ContainerNotRunningError(RuntimeError):
     """
@@ -85,19 +87,21 @@ class Podman:
             args.append(":".join([str(p) for p in port_mapping]))
         args.append(self._image)
 
-        proc = subprocess.run(
-            args, check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE
-        )
+        with TRACER.span("podman run", "podman", image=self._image):
+            proc = subprocess.run(
+                args, check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE
+            )
         self._running_id = proc.stdout.rstrip().decode()
 
     @requires_running
     def stop(self):
-        subprocess.run(
-            ["podman", "stop", self._running_id],
-            check=True,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-        )
+        with TRACER.span("podman stop", "podman", image=self._image):
+            subprocess.run(
+                ["podman", "stop", self._running_id],
+                check=True,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+            )
         self._running_id = None
 
     @requires_running
@@ -111,9 +115,10 @@ class Podman:
             actual_src,
             actual_dest,
         ]
-        subprocess.run(
-            args,
-            check=True,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-        )
+        with TRACER.span("podman cp", "podman", src=src, dest=dest):
+            subprocess.run(
+                args,
+                check=True,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+            )
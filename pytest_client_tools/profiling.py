@@ -0,0 +1,250 @@
+# SPDX-FileCopyrightText: Red Hat
+# SPDX-License-Identifier: MIT
+
+import io
+import os
+import pathlib
+import pstats
+import shutil
+import subprocess
+import tempfile
+
+from .logger import LOGGER
+from .util import ArtifactsCollector, async_logged_run, logged_run
+
+
+PROFILE_MODES = ("cprofile", "importtime")
+
+_PROFILE_DIR_ENV = "PYTEST_CLIENT_TOOLS_PROFILE_DIR"
+_IMPORTTIME_PREFIX = "import time:"
+
+# loaded by the Python interpreter of the profiled tools: it starts cProfile
+# as early as possible, and then loads the "real" sitecustomize, if any
+_SITECUSTOMIZE = """# generated by pytest-client-tools
+import atexit
+import cProfile
+import os
+import sys
+
+
+def _start_profile():
+    output_dir = os.environ.get("%(env)s")
+    if not output_dir:
+        return
+    profiler = cProfile.Profile()
+
+    def dump():
+        profiler.disable()
+        profiler.dump_stats(os.path.join(output_dir, "%%d.prof" %% os.getpid()))
+
+    atexit.register(dump)
+    profiler.enable()
+
+
+def _load_next_sitecustomize():
+    this_dir = os.path.dirname(os.path.abspath(__file__))
+    saved_path = sys.path[:]
+    sys.path[:] = [p for p in sys.path if os.path.abspath(p or ".") != this_dir]
+    this_module = sys.modules.pop("sitecustomize", None)
+    try:
+        import sitecustomize  # noqa: F401
+    except ImportError:
+        pass
+    finally:
+        sys.path[:] = saved_path
+        sys.modules["sitecustomize"] = this_module
+
+
+_start_profile()
+_load_next_sitecustomize()
+""" % {
+    "env": _PROFILE_DIR_ENV
+}
+
+
+def _split_importtime(stderr):
+    # split the "-X importtime" lines from the rest of stderr
+    if stderr is None:
+        return None, []
+    is_bytes = isinstance(stderr, bytes)
+    text = stderr.decode(errors="replace") if is_bytes else stderr
+    other_lines = []
+    importtime_lines = []
+    for line in text.splitlines(keepends=True):
+        if line.startswith(_IMPORTTIME_PREFIX):
+            importtime_lines.append(line)
+        else:
+            other_lines.append(line)
+    if not importtime_lines:
+        return stderr, []
+    other = "".join(other_lines)
+    return (other.encode() if is_bytes else other), importtime_lines
+
+
+def _importtime_summary(lines, top):
+    entries = []
+    for line in lines:
+        fields = line.split(":", 1)[1].split("|")
+        if len(fields) != 3 or not fields[0].strip().isdigit():
+            # header line
+            continue
+        entries.append((int(fields[1]), int(fields[0]), fields[2].strip()))
+    entries.sort(reverse=True)
+    summary = [f"{'cumulative (us)':>15} {'self (us)':>10}  module"]
+    for cumulative, self_time, module in entries[:top]:
+        summary.append(f"{cumulative:>15} {self_time:>10}  {module}")
+    return "\n".join(summary) + "\n"
+
+
+def _cprofile_summary(files, top):
+    out = io.StringIO()
+    stats = pstats.Stats(*[str(f) for f in files], stream=out)
+    stats.sort_stats("cumulative").print_stats(top)
+    return out.getvalue()
+
+
+class ToolProfiler:
+    """
+    Profiler of the client tools written in Python.
+
+    When enabled, the commands run through `profiled_run()` (or
+    `async_profiled_run()`) are either
+    profiled using cProfile (`cprofile` mode), or their module imports are
+    timed (`importtime` mode). The resulting data is saved in the artifacts
+    of the current test, and a summary of the top entries is kept for the
+    report of the test.
+    """
+
+    def __init__(self):
+        self.mode = None
+        self.top = 20
+        self._workdir = None
+        self._counter = 0
+        self._summaries = []
+
+    def _get_workdir(self):
+        if self._workdir is None:
+            self._workdir = pathlib.Path(tempfile.mkdtemp(prefix="client-tools-prof-"))
+            (self._workdir / "site").mkdir()
+            (self._workdir / "site" / "sitecustomize.py").write_text(_SITECUSTOMIZE)
+        return self._workdir
+
+    def close(self):
+        """
+        Remove the temporary files of the profiler.
+        """
+        if self._workdir is not None:
+            shutil.rmtree(str(self._workdir), ignore_errors=True)
+            self._workdir = None
+
+    def pop_summaries(self):
+        """
+        Return the summaries of the profiled commands, forgetting them.
+
+        :return: A list of (command name, summary text)
+        :rtype: list
+        """
+        summaries = self._summaries
+        self._summaries = []
+        return summaries
+
+    def _prepare(self, args, kwargs):
+        # the name of the run, its environment, and the directory of its
+        # profile data (if any)
+        self._counter += 1
+        name = f"{os.path.basename(args[0])}-{self._counter}"
+        env = dict(kwargs.pop("env", None) or os.environ)
+        output_dir = None
+        if self.mode == "importtime":
+            added = {"PYTHONPROFILEIMPORTTIME": "1"}
+        else:
+            workdir = self._get_workdir()
+            output_dir = workdir / name
+            output_dir.mkdir()
+            added = {
+                _PROFILE_DIR_ENV: str(output_dir),
+                "PYTHONPATH": os.pathsep.join(
+                    p for p in [str(workdir / "site"), env.get("PYTHONPATH")] if p
+                ),
+            }
+        # only the added variables, as the environment may contain credentials
+        LOGGER.debug("profiling %s with the environment variables %s", name, added)
+        env.update(added)
+        return name, env, output_dir
+
+    def run(self, args, **kwargs):
+        """
+        Run a command using `logged_run()`, profiling it.
+        """
+        name, env, output_dir = self._prepare(args, kwargs)
+        try:
+            proc = logged_run(args, env=env, **kwargs)
+        except subprocess.CalledProcessError as e:
+            e.stderr = self._collect(name, e.stderr, output_dir)
+            raise
+        proc.stderr = self._collect(name, proc.stderr, output_dir)
+        return proc
+
+    async def arun(self, args, **kwargs):
+        """
+        Run a command using `async_logged_run()`, profiling it.
+        """
+        name, env, output_dir = self._prepare(args, kwargs)
+        try:
+            proc = await async_logged_run(args, env=env, **kwargs)
+        except subprocess.CalledProcessError as e:
+            e.stderr = self._collect(name, e.stderr, output_dir)
+            raise
+        proc.stderr = self._collect(name, proc.stderr, output_dir)
+        return proc
+
+    def _collect(self, name, stderr, output_dir):
+        artifacts = ArtifactsCollector.current
+        if self.mode == "importtime":
+            stderr, lines = _split_importtime(stderr)
+            if lines:
+                if artifacts:
+                    artifacts.write_text(f"importtime-{name}.txt", "".join(lines))
+                self._summaries.append((name, _importtime_summary(lines, self.top)))
+            return stderr
+        files = sorted(output_dir.glob("*.prof"))
+        if not files:
+            LOGGER.warning("no profile data collected for %s", name)
+            return stderr
+        if artifacts:
+            for f in files:
+                artifacts.copy(f, name=f"profile-{name}-{f.name}")
+        try:
+            summary = _cprofile_summary(files, self.top)
+        except Exception as e:
+            LOGGER.warning("cannot read the profile data of %s: %s", name, e)
+        else:
+            self._summaries.append((name, summary))
+        shutil.rmtree(str(output_dir), ignore_errors=True)
+        return stderr
+
+
+# the profiler used by profiled_run()
+TOOL_PROFILER = ToolProfiler()
+
+
+def profiled_run(args, **kwargs):
+    """
+    Run a command, profiling it if the profiler is enabled.
+
+    This accepts the same parameters as `logged_run()`.
+    """
+    if TOOL_PROFILER.mode is None:
+        return logged_run(args, **kwargs)
+    return TOOL_PROFILER.run(args, **kwargs)
+
+
+async def async_profiled_run(args, **kwargs):
+    """
+    Run a command using asyncio, profiling it if the profiler is enabled.
+
+    This accepts the same parameters as `async_logged_run()`.
+    """
+    if TOOL_PROFILER.mode is None:
+        return await async_logged_run(args, **kwargs)
+    return await TOOL_PROFILER.arun(args, **kwargs)
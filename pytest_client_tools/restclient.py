@@ -1,10 +1,56 @@
 # SPDX-FileCopyrightText: Red Hat
 # SPDX-License-Identifier: MIT
 
-import requests
-import urllib3
+import functools
+import logging
+import time
 
 from .logger import LOGGER
+from .tracing import TRACER
+
+
+# the HTTP methods which can be retried safely
+_IDEMPOTENT_METHODS = frozenset(["DELETE", "GET", "HEAD", "OPTIONS", "PUT", "TRACE"])
+# the HTTP statuses of temporary failures, retried for idempotent methods
+_RETRY_STATUSES = frozenset([429, 502, 503, 504])
+# the maximum length of the bodies written in the debug logs
+_MAX_LOGGED_BODY = 2048
+
+
+@functools.lru_cache(maxsize=None)
+def _disable_insecure_warnings():
+    # imported here to not slow down the loading of the plugin
+    import urllib3
+
+    urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+
+
+def _make_retry(retries, backoff_factor):
+    # imported here to not slow down the loading of the plugin
+    from urllib3.util.retry import Retry
+
+    kwargs = {
+        "total": retries,
+        "backoff_factor": backoff_factor,
+        "status_forcelist": _RETRY_STATUSES,
+        # return the last response, so raise_for_status() reports it
+        "raise_on_status": False,
+    }
+    try:
+        return Retry(allowed_methods=_IDEMPOTENT_METHODS, **kwargs)
+    except TypeError:
+        # urllib3 < 1.26
+        return Retry(method_whitelist=_IDEMPOTENT_METHODS, **kwargs)
+
+
+def _truncate_body(body):
+    if body is None:
+        return None
+    if isinstance(body, bytes):
+        body = body[:_MAX_LOGGED_BODY].decode(errors="replace")
+    else:
+        body = str(body)[:_MAX_LOGGED_BODY]
+    return body
 
 
 class RestClient:
@@ -12,20 +58,70 @@ class RestClient:
     RestClient
 
     This class represents a client to perform REST calls.
+
+    The connections are kept alive in a pool, sized for concurrent use of
+    the client by multiple threads. The requests with idempotent methods
+    (e.g. GET, DELETE) are retried on connection errors and on temporary
+    failures of the server (e.g. HTTP 503), waiting longer after each retry.
     """
 
-    def __init__(self, base_url, verify=True, cert=None):
+    def __init__(
+        self,
+        base_url,
+        verify=True,
+        cert=None,
+        auth=None,
+        retries=3,
+        backoff_factor=0.5,
+        pool_maxsize=10,
+    ):
+        """
+        Create a new RestClient object.
+
+        :param base_url: The base URL of the REST server
+        :type base_url: str
+        :param verify: Whether to verify the SSL certificate of the server,
+            or the path of the CA bundle to verify it with
+        :type verify: bool or str
+        :param cert: The client certificate, as path or as (certificate, key)
+            tuple
+        :type cert: str or tuple, optional
+        :param auth: The credentials for HTTP basic authentication, as
+            (username, password) tuple
+        :type auth: tuple, optional
+        :param retries: How many times to retry failed idempotent requests
+        :type retries: int
+        :param backoff_factor: The factor for the wait between retries; the
+            wait is `backoff_factor * 2 ** (retry - 1)` seconds
+        :type backoff_factor: float
+        :param pool_maxsize: The maximum number of connections kept alive
+        :type pool_maxsize: int
+        """
+        # imported here to not slow down the loading of the plugin
+        import requests
+        from requests.adapters import HTTPAdapter
+
         self._base_url = base_url
         self._verify = verify
         self._session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_maxsize=pool_maxsize,
+            max_retries=_make_retry(retries, backoff_factor),
+        )
+        self._session.mount("https://", adapter)
+        self._session.mount("http://", adapter)
+        self._headers = {
+            "Content-type": "application/json",
+        }
         self._request_kwargs = {
-            "headers": {
-                "Content-type": "application/json",
-            },
             "verify": self._verify,
         }
         if cert:
             self._request_kwargs["cert"] = cert
+        if auth:
+            self._request_kwargs["auth"] = auth
+        if not self._verify:
+            _disable_insecure_warnings()
 
     @property
     def base_url(self):
@@ -34,21 +130,41 @@ class RestClient:
         """
         return self._base_url
 
+    def close(self):
+        """
+        Close the connections to the REST server.
+        """
+        self._session.close()
+
     def _request(self, req_type, path, **kwargs):
-        actual_kwargs = self._request_kwargs
-        actual_kwargs.update(kwargs)
-        if not self._verify:
-            urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
-        LOGGER.debug(
-            "requesting %s for %s with args=%s",
-            req_type,
-            f"{self._base_url}/{path}",
-            actual_kwargs,
-        )
-        response = self._session.request(
-            req_type, f"{self._base_url}/{path}", **actual_kwargs
+        headers = dict(self._headers)
+        headers.update(kwargs.pop("headers", None) or {})
+        actual_kwargs = dict(self._request_kwargs, headers=headers, **kwargs)
+        url = f"{self._base_url}/{path}"
+        debug = LOGGER.isEnabledFor(logging.DEBUG)
+        if debug:
+            logged_kwargs = dict(actual_kwargs)
+            for key in ("data", "json"):
+                if key in logged_kwargs:
+                    logged_kwargs[key] = _truncate_body(logged_kwargs[key])
+            if "auth" in logged_kwargs:
+                # do not log the credentials
+                logged_kwargs["auth"] = "***"
+            LOGGER.debug(
+                "requesting %s for %s with args=%s", req_type, url, logged_kwargs
+            )
+        start = time.monotonic()
+        with TRACER.span(f"{req_type} {path}", "http") as span:
+            response = self._session.request(req_type, url, **actual_kwargs)
+            span.set(status=response.status_code)
+        TRACER.metric(
+            "http.request_time",
+            time.monotonic() - start,
+            method=req_type,
+            status=response.status_code,
         )
-        LOGGER.debug("result: %s, %s", response, response.text)
+        if debug:
+            LOGGER.debug("result: %s, %s", response, _truncate_body(response.content))
         response.raise_for_status()
         return response
 
@@ -69,3 +185,81 @@ class RestClient:
         Perform a POST REST call.
         """
         return self._request("POST", path, json=data, **kwargs)
+
+
+class AsyncRestClient:
+    """
+    AsyncRestClient
+
+    This class represents a client to perform REST calls using asyncio.
+
+    The calls are performed by a pool of threads using a
+    [`RestClient`][pytest_client_tools.restclient.RestClient] (and thus its
+    pool of connections); the size of the pool limits how many calls are
+    performed at the same time, while the other wait.
+    """
+
+    def __init__(self, base_url, verify=True, cert=None, concurrency=10, **kwargs):
+        """
+        Create a new AsyncRestClient object.
+
+        The parameters are the same as `RestClient`, and in addition:
+
+        :param concurrency: The maximum number of calls performed at the
+            same time
+        :type concurrency: int
+        """
+        self._client = RestClient(
+            base_url, verify=verify, cert=cert, pool_maxsize=concurrency, **kwargs
+        )
+        self._concurrency = concurrency
+        self._executor = None
+
+    @property
+    def base_url(self):
+        """
+        The base URL of the REST server.
+        """
+        return self._client.base_url
+
+    def close(self):
+        """
+        Close the connections to the REST server, and stop the threads.
+        """
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+        self._client.close()
+
+    async def _request(self, req_type, path, **kwargs):
+        # imported here to not slow down the loading of the plugin
+        import asyncio
+        import concurrent.futures
+
+        if self._executor is None:
+            self._executor = concurrent.futures.ThreadPoolExecutor(
+                max_workers=self._concurrency
+            )
+        loop = asyncio.get_event_loop()
+        return await loop.run_in_executor(
+            self._executor,
+            functools.partial(self._client._request, req_type, path, **kwargs),
+        )
+
+    async def get(self, path, **kwargs):
+        """
+        Perform a GET REST call.
+        """
+        return await self._request("GET", path, **kwargs)
+
+    async def delete(self, path, **kwargs):
+        """
+        Perform a DELETE REST call.
+        """
+        return await self._request("DELETE", path, **kwargs)
+
+    async def post(self, path, data, **kwargs):
+        """
+        Perform a POST REST call.
+        """
+        return await self._request("POST", path, json=data, **kwargs)
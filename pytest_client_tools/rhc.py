@@ -6,7 +6,15 @@ import pathlib
 import re
 import subprocess
 
-from .util import SavedFile, logged_run, Version, redact_arguments
+from .util import (
+    SavedFile,
+    StreamedProcess,
+    async_logged_run,
+    atomic_write_text,
+    logged_run,
+    Version,
+    redact_arguments,
+)
 
 
 RHC_FILES_TO_SAVE = (
@@ -15,15 +23,156 @@ RHC_FILES_TO_SAVE = (
 )
 
 
+class RhcConfig:
+    """
+    rhc configuration.
+
+    This class represents a TOML configuration file of `rhc`, i.e.
+    `/etc/rhc/config.toml` by default, or the configuration file of one of
+    its workers in `/etc/rhc/workers`.
+
+    The configuration values are accessed as items using the keys of the
+    TOML file, e.g. `config["log-level"]`. The file is parsed only when
+    a value is accessed for the first time; a missing file is considered
+    as an empty configuration.
+
+    Please note that changing values does not automatically update the
+    configuration file; `save()` must be called explicitly when needed.
+    Only setting a value different than the current one marks the
+    configuration as changed, and `save()` does nothing when there are no
+    changes.
+    """
+
+    def __init__(self, path="/etc/rhc/config.toml"):
+        self._path = pathlib.Path(path)
+        self._config = None
+        self._dirty = set()
+
+    @property
+    def path(self):
+        """
+        The path of the configuration file.
+        """
+        return self._path
+
+    @property
+    def dirty_keys(self):
+        """
+        The keys changed since the configuration was loaded or saved.
+        """
+        return frozenset(self._dirty)
+
+    def _load(self):
+        if self._config is None:
+            # imported here to not slow down the loading of the plugin
+            import toml
+
+            try:
+                self._config = toml.loads(self._path.read_text())
+            except FileNotFoundError:
+                self._config = {}
+        return self._config
+
+    def reload(self):
+        """
+        Reload the configuration.
+
+        Discard all the values set in the instance; the file is parsed again
+        the next time a value is accessed.
+        """
+        self._config = None
+        self._dirty = set()
+
+    def save(self):
+        """
+        Save the configuration.
+
+        Save the configuration values to the underlying configuration file.
+        Nothing is written if no configuration value was changed; otherwise,
+        the file is replaced atomically.
+        """
+        if not self._dirty:
+            return
+        import toml
+
+        atomic_write_text(self._path, toml.dumps(self._config))
+        self._dirty = set()
+
+    def get(self, key, default=None):
+        """
+        Return the value of a configuration key, or `default` if not set.
+        """
+        return self._load().get(key, default)
+
+    def __contains__(self, key):
+        return key in self._load()
+
+    def __getitem__(self, key):
+        return self._load()[key]
+
+    def __setitem__(self, key, value):
+        config = self._load()
+        if key in config and config[key] == value:
+            return
+        config[key] = value
+        self._dirty.add(key)
+
+    def __delitem__(self, key):
+        del self._load()[key]
+        self._dirty.add(key)
+
+
 class Rhc:
     """
     Rhc.
 
     This class represents the `rhc` tool.
+
+    It exposes a public `config` attribute (which is `RhcConfig`)
+    representing the configuration of `rhc`, i.e. `/etc/rhc/config.toml`.
     """
 
+    # options whose values are not logged
+    _REDACTED_OPTIONS = [
+        "--activation-key",
+        "--organization",
+        "--password",
+        "--username",
+    ]
+
     def __init__(self):
-        pass
+        self.config = RhcConfig()
+        self._worker_configs = {}
+
+    def worker_config(self, name):
+        """
+        Return the configuration of a worker of `rhc`.
+
+        :param name: The name of the worker, e.g. `rhc-package-manager`
+        :type name: str
+        :return: The configuration of the worker, i.e.
+            `/etc/rhc/workers/<name>.toml`
+        :rtype: pytest_client_tools.rhc.RhcConfig
+        """
+        try:
+            return self._worker_configs[name]
+        except KeyError:
+            config = RhcConfig(f"/etc/rhc/workers/{name}.toml")
+            self._worker_configs[name] = config
+            return config
+
+    @property
+    def worker_configs(self):
+        """
+        Return the configurations of all the installed workers of `rhc`.
+
+        :return: The configurations of the workers, indexed by worker name
+        :rtype: dict
+        """
+        return {
+            p.stem: self.worker_config(p.stem)
+            for p in sorted(pathlib.Path("/etc/rhc/workers").glob("*.toml"))
+        }
 
     @property
     def is_registered(self):
@@ -34,6 +183,22 @@ class Rhc:
         :rtype: bool
         """
         proc = self.run("status", "--format", "json", check=False)
+        return self._is_registered_from_status(proc)
+
+    async def async_is_registered(self):
+        """
+        Query whether `rhc` is registered, using asyncio.
+
+        This is the same as `is_registered`, as coroutine.
+
+        :return: Whether `rhc` is registered
+        :rtype: bool
+        """
+        proc = await self.arun("status", "--format", "json", check=False)
+        return self._is_registered_from_status(proc)
+
+    @staticmethod
+    def _is_registered_from_status(proc):
         if proc.returncode in [0, 1]:
             doc = json.loads(proc.stdout)
             return doc["rhsm_connected"]
@@ -72,22 +237,65 @@ class Rhc:
         :return: The result of the command execution
         :rtype: subprocess.CompletedProcess
         """
-        logged_args = redact_arguments(
-            list(args),
-            [
-                "--activation-key",
-                "--organization",
-                "--password",
-                "--username",
-            ],
-        )
         return logged_run(
             ["rhc"] + list(args),
             check=check,
             stdout=subprocess.PIPE,
             stderr=subprocess.PIPE,
             text=text,
-            logged_args=logged_args,
+            logged_args=redact_arguments(list(args), self._REDACTED_OPTIONS),
+        )
+
+    async def arun(self, *args, check=True, text=True):
+        """
+        Run `rhc` with the specified arguments, using asyncio.
+
+        This is the same as `run()`, as coroutine; see
+        [`run_concurrently()`][pytest_client_tools.util.run_concurrently].
+
+        :param args: The actual arguments to run using `rhc`
+        :type args: list
+        :param check: Whether raise an exception if the process exits with
+            a return code different than 0
+        :type check: bool
+        :param text: Whether the stdin/stdout of the process are textual
+            (and not bytes)
+        :type text: bool
+        :return: The result of the command execution
+        :rtype: subprocess.CompletedProcess
+        """
+        return await async_logged_run(
+            ["rhc"] + list(args),
+            check=check,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            text=text,
+            logged_args=redact_arguments(list(args), self._REDACTED_OPTIONS),
+        )
+
+    def stream(self, *args, check=True, tail=1000):
+        """
+        Run `rhc` with the specified arguments, streaming its output.
+
+        The output (stdout and stderr merged) is logged and written to an
+        artifact line by line, keeping only its last lines in memory; see
+        [`StreamedProcess`][pytest_client_tools.util.StreamedProcess].
+
+        :param args: The actual arguments to run using `rhc`
+        :type args: list
+        :param check: Whether raise an exception if the process exits with
+            a return code different than 0
+        :type check: bool
+        :param tail: How many lines of the output to keep in memory
+        :type tail: int
+        :return: The running command, to iterate for its output lines
+        :rtype: pytest_client_tools.util.StreamedProcess
+        """
+        return StreamedProcess(
+            ["rhc"] + list(args),
+            logged_args=redact_arguments(list(args), self._REDACTED_OPTIONS),
+            check=check,
+            tail=tail,
         )
 
     def connect(
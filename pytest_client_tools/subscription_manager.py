@@ -7,7 +7,13 @@ import subprocess
 import uuid
 
 from . import SystemNotRegisteredError
-from .util import SavedFile, logged_run, redact_arguments
+from .profiling import async_profiled_run, profiled_run
+from .util import (
+    SavedFile,
+    StreamedProcess,
+    logged_run,
+    redact_arguments,
+)
 
 
 SUBMAN_FILES_TO_SAVE = (
@@ -24,6 +30,16 @@ class SubscriptionManager:
     This class represents the `subscription-manager` tool.
     """
 
+    # options whose values are not logged
+    _REDACTED_OPTIONS = [
+        "--activationkey",
+        "--org",
+        "--password",
+        "--server.proxy_password",
+        "--server.proxy_user",
+        "--username",
+    ]
+
     def __init__(self):
         pass
 
@@ -36,6 +52,22 @@ class SubscriptionManager:
         :rtype: bool
         """
         proc = self.run("identity", check=False)
+        return self._is_registered_from_status(proc)
+
+    async def async_is_registered(self):
+        """
+        Query whether `subscription-manager` is registered, using asyncio.
+
+        This is the same as `is_registered`, as coroutine.
+
+        :return: Whether `subscription-manager` is registered
+        :rtype: bool
+        """
+        proc = await self.arun("identity", check=False)
+        return self._is_registered_from_status(proc)
+
+    @staticmethod
+    def _is_registered_from_status(proc):
         if proc.returncode == 0:
             return True
         if proc.returncode == 1:
@@ -83,24 +115,65 @@ class SubscriptionManager:
         :return: The result of the command execution
         :rtype: subprocess.CompletedProcess
         """
-        logged_args = redact_arguments(
-            list(args),
-            [
-                "--activationkey",
-                "--org",
-                "--password",
-                "--server.proxy_password",
-                "--server.proxy_user",
-                "--username",
-            ],
+        return profiled_run(
+            ["subscription-manager"] + list(args),
+            check=check,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            text=text,
+            logged_args=redact_arguments(list(args), self._REDACTED_OPTIONS),
         )
-        return logged_run(
+
+    async def arun(self, *args, check=True, text=True):
+        """
+        Run `subscription-manager` with the specified arguments, using asyncio.
+
+        This is the same as `run()`, as coroutine; see
+        [`run_concurrently()`][pytest_client_tools.util.run_concurrently].
+
+        :param args: The actual arguments to run using `subscription-manager`
+        :type args: list
+        :param check: Whether raise an exception if the process exits with
+            a return code different than 0
+        :type check: bool
+        :param text: Whether the stdin/stdout of the process are textual
+            (and not bytes)
+        :type text: bool
+        :return: The result of the command execution
+        :rtype: subprocess.CompletedProcess
+        """
+        return await async_profiled_run(
             ["subscription-manager"] + list(args),
             check=check,
             stdout=subprocess.PIPE,
             stderr=subprocess.PIPE,
             text=text,
-            logged_args=logged_args,
+            logged_args=redact_arguments(list(args), self._REDACTED_OPTIONS),
+        )
+
+    def stream(self, *args, check=True, tail=1000):
+        """
+        Run `subscription-manager` with the specified arguments, streaming its output.
+
+        The output (stdout and stderr merged) is logged and written to an
+        artifact line by line, keeping only its last lines in memory; see
+        [`StreamedProcess`][pytest_client_tools.util.StreamedProcess].
+
+        :param args: The actual arguments to run using `subscription-manager`
+        :type args: list
+        :param check: Whether raise an exception if the process exits with
+            a return code different than 0
+        :type check: bool
+        :param tail: How many lines of the output to keep in memory
+        :type tail: int
+        :return: The running command, to iterate for its output lines
+        :rtype: pytest_client_tools.util.StreamedProcess
+        """
+        return StreamedProcess(
+            ["subscription-manager"] + list(args),
+            logged_args=redact_arguments(list(args), self._REDACTED_OPTIONS),
+            check=check,
+            tail=tail,
         )
 
     def config(self, **kwargs):
@@ -192,12 +265,14 @@ def stop_rhsmcertd():
         stdout=subprocess.PIPE,
         stderr=subprocess.PIPE,
         text=True,
+        internal=True,
     )
     pkill_proc = logged_run(
         ["pkill", "-e", "-x", "rhsmcertd"],
         stdout=subprocess.PIPE,
         stderr=subprocess.PIPE,
         text=True,
+        internal=True,
     )
     if pkill_proc.returncode not in [0, 1]:
         pkill_proc.check_returncode()
@@ -1,22 +1,95 @@
 # SPDX-FileCopyrightText: Red Hat
 # SPDX-License-Identifier: MIT
 
-from dynaconf import Dynaconf, Validator
+import copy
+import hashlib
+import json
+import os
+import pathlib
+
+
+_ENVVAR_PREFIX = "PYTEST_CLIENT_TOOLS"
+_SETTINGS_FILES = ["settings.toml", ".secrets.toml"]
+
+
+def _config_fingerprint():
+    # the settings files are searched by Dynaconf in the current directory
+    # and in all its parents, also in their "config" subdirectories
+    cwd = pathlib.Path.cwd()
+    files = []
+    for d in (cwd, *cwd.parents):
+        for subdir in (d, d / "config"):
+            for name in _SETTINGS_FILES:
+                try:
+                    st = (subdir / name).stat()
+                except OSError:
+                    continue
+                files.append([str(subdir / name), st.st_mtime_ns, st.st_size])
+    environ = sorted(
+        [k, v]
+        for k, v in os.environ.items()
+        if k.startswith(_ENVVAR_PREFIX + "_") or k.endswith("_FOR_DYNACONF")
+    )
+    data = json.dumps({"cwd": str(cwd), "files": files, "environ": environ})
+    return hashlib.sha256(data.encode()).hexdigest()
+
+
+def _plain_value(value):
+    if isinstance(value, dict):
+        return {str(k).lower(): _plain_value(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_plain_value(v) for v in value]
+    return value
+
+
+def _flatten_values(values, prefix=""):
+    flat = {}
+    for k, v in values.items():
+        flat[prefix + k] = v
+        if isinstance(v, dict):
+            flat.update(_flatten_values(v, prefix + k + "."))
+    return flat
 
 
 class TestConfig:
     """
     Configuration for the tests.
+
+    The configuration is read and validated when the object is created, and
+    the resulting values are kept as a read-only snapshot; `snapshot()`
+    returns it in a serializable form, which can be passed to the constructor
+    of another `TestConfig` object (for example in a different process) to
+    avoid reading and validating the configuration again.
     """
 
-    def __init__(self):
-        self._settings = Dynaconf(
+    def __init__(self, snapshot=None):
+        """
+        Create a new TestConfig object.
+
+        :param snapshot: A snapshot of the configuration as returned by
+            `snapshot()`; it is used only if the configuration files and the
+            relevant environment variables did not change since it was
+            created, otherwise the configuration is read again
+        :type snapshot: dict, optional
+        """
+        fingerprint = _config_fingerprint()
+        if snapshot is None or snapshot["fingerprint"] != fingerprint:
+            snapshot = self._read_settings(fingerprint)
+        self._snapshot = snapshot
+        self._values = _flatten_values(snapshot["values"])
+
+    @staticmethod
+    def _read_settings(fingerprint):
+        # imported here to not slow down the loading of the plugin
+        from dynaconf import Dynaconf, Validator
+
+        settings = Dynaconf(
             default_env="default",
             environments=True,
-            envvar_prefix="PYTEST_CLIENT_TOOLS",
-            settings_files=["settings.toml", ".secrets.toml"],
+            envvar_prefix=_ENVVAR_PREFIX,
+            settings_files=_SETTINGS_FILES,
         )
-        self._settings.validators.register(
+        settings.validators.register(
             Validator("candlepin.host"),
             Validator("candlepin.port", is_type_of=int, gt=0, lt=65536),
             Validator("candlepin.prefix", startswith="/"),
@@ -54,45 +127,71 @@ class TestConfig:
                 default="/etc/insights-client/cert-api.access.redhat.com.pem",
             ),
             Validator("insights.insecure", is_type_of=bool, default=False),
+            Validator("insights.username"),
+            Validator(
+                "insights.password",
+                must_exist=True,
+                when=Validator("insights.username", must_exist=True),
+            ),
         )
-        self._settings.validators.validate()
+        settings.validators.validate()
+        return {
+            "fingerprint": fingerprint,
+            "environment": settings.current_env,
+            "values": _plain_value(settings.as_dict()),
+        }
+
+    def snapshot(self):
+        """
+        Return a snapshot of the configuration.
+
+        :return: The resolved and validated configuration, including what
+            is needed to check whether it is still valid; it contains only
+            basic types (dict, list, str, numbers, etc), so it can be
+            serialized easily
+        :rtype: dict
+        """
+        return copy.deepcopy(self._snapshot)
 
     @property
     def is_external(self):
         """
         Determines whether an external Candlepin is configured.
         """
-        try:
-            return (
-                self._settings.get("candlepin.host") is not None
-                and self._settings.get("candlepin.port") is not None
-                and self._settings.get("candlepin.prefix") is not None
-                and (
-                    (
-                        self._settings.get("candlepin.username") is not None
-                        and self._settings.get("candlepin.password") is not None
-                    )
-                    or (
-                        self._settings.get("candlepin.activation_keys") is not None
-                        and self._settings.get("candlepin.org") is not None
-                    )
+        return (
+            self._values.get("candlepin.host") is not None
+            and self._values.get("candlepin.port") is not None
+            and self._values.get("candlepin.prefix") is not None
+            and (
+                (
+                    self._values.get("candlepin.username") is not None
+                    and self._values.get("candlepin.password") is not None
+                )
+                or (
+                    self._values.get("candlepin.activation_keys") is not None
+                    and self._values.get("candlepin.org") is not None
                 )
             )
-        except KeyError:
-            return False
+        )
 
     @property
     def environment(self):
         """
         Returns the Dynaconf environment currently in use.
         """
-        return self._settings.current_env
+        return self._snapshot["environment"]
 
     def get(self, *path):
         """
         Query for a configuration key.
 
+        Raises `KeyError` if the key is not set.
+
         :param path: The path/name of the configuration key
         :type path: str
         """
-        return self._settings[".".join(path)]
+        value = self._values[".".join(path).lower()]
+        if isinstance(value, (dict, list)):
+            # do not allow changes to the snapshot
+            value = copy.deepcopy(value)
+        return value
@@ -0,0 +1,293 @@
+# SPDX-FileCopyrightText: Red Hat
+# SPDX-License-Identifier: MIT
+
+import contextlib
+import os
+import pathlib
+import re
+import select
+import time
+
+from .logger import LOGGER
+
+
+# the log files of the client tools, by name
+TOOL_LOGS = {
+    "rhsm": pathlib.Path("/var/log/rhsm/rhsm.log"),
+    "rhsmcertd": pathlib.Path("/var/log/rhsm/rhsmcertd.log"),
+    "insights-client": pathlib.Path("/var/log/insights-client/insights-client.log"),
+}
+# how many rotated files (i.e. `.1`, `.2`, etc) to look at
+_ROTATED_FILES = 3
+# the maximum wait between checks of the logs, also with inotify, in case
+# some change is missed (e.g. a directory created after the start)
+_MAX_WAIT = 1.0
+
+# inotify constants, from <sys/inotify.h>
+_IN_MODIFY = 0x00000002
+_IN_MOVED_TO = 0x00000080
+_IN_CREATE = 0x00000100
+_IN_NONBLOCK = 0o4000
+_IN_CLOEXEC = 0o2000000
+
+
+class LogTimeoutError(RuntimeError):
+    """
+    Raised when waiting for a line in the logs times out.
+    """
+
+    def __init__(self, pattern, timeout):
+        super().__init__(pattern, timeout)
+        self.pattern = pattern
+        self.timeout = timeout
+
+    def __str__(self):
+        return f"no line matching {self.pattern!r} after {self.timeout} seconds"
+
+
+class _Inotify:
+    def __init__(self, directories):
+        # imported here to not slow down the loading of the plugin
+        import ctypes
+
+        libc = ctypes.CDLL(None, use_errno=True)
+        self._fd = libc.inotify_init1(_IN_NONBLOCK | _IN_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        for directory in directories:
+            # missing directories are not watched
+            libc.inotify_add_watch(
+                self._fd,
+                os.fsencode(directory),
+                _IN_MODIFY | _IN_CREATE | _IN_MOVED_TO,
+            )
+
+    def wait(self, timeout):
+        readable, _, _ = select.select([self._fd], [], [], timeout)
+        if readable:
+            # drain the events: only their presence matters
+            with contextlib.suppress(BlockingIOError):
+                while os.read(self._fd, 65536):
+                    pass
+
+    def close(self):
+        os.close(self._fd)
+
+
+class _Polling:
+    def __init__(self, interval):
+        self._interval = interval
+
+    def wait(self, timeout):
+        time.sleep(min(timeout, self._interval))
+
+    def close(self):
+        pass
+
+
+class LogFollower:
+    """
+    Follower of a log file.
+
+    This class reads only the lines appended to a log file since it was
+    created, following the rotations of the file (i.e. when the file is
+    renamed to `.1`, and a new one is created) and its truncations.
+    """
+
+    def __init__(self, path):
+        """
+        Create a new LogFollower object, starting at the current end of the
+        file.
+
+        :param path: The path of the log file
+        :type path: pathlib.Path
+        """
+        self.path = pathlib.Path(path)
+        self._inode = None
+        self._offset = 0
+        self._partial = b""
+        with contextlib.suppress(FileNotFoundError):
+            st = os.stat(self.path)
+            self._inode = (st.st_dev, st.st_ino)
+            self._offset = st.st_size
+
+    def _rotated_path(self):
+        # find where the file followed so far was renamed to
+        for i in range(1, _ROTATED_FILES + 1):
+            path = self.path.with_name(f"{self.path.name}.{i}")
+            with contextlib.suppress(FileNotFoundError):
+                st = os.stat(path)
+                if (st.st_dev, st.st_ino) == self._inode:
+                    return path
+        return None
+
+    def _read_from(self, path, offset):
+        with open(path, "rb") as f:
+            f.seek(offset)
+            data = f.read()
+        return data, offset + len(data)
+
+    def _split(self, data, complete):
+        lines = (self._partial + data).split(b"\n")
+        self._partial = lines.pop()
+        if complete and self._partial:
+            # the rest of a rotated file, which will not grow anymore
+            lines.append(self._partial)
+            self._partial = b""
+        return [line.decode(errors="replace").rstrip("\r") for line in lines]
+
+    def read(self):
+        """
+        Read the lines appended since the last read.
+
+        A line not terminated yet is returned only once complete.
+
+        :return: The new lines, without their line terminators
+        :rtype: list
+        """
+        lines = []
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            st = None
+        inode = (st.st_dev, st.st_ino) if st else None
+        if inode != self._inode:
+            if self._inode is not None:
+                rotated = self._rotated_path()
+                if rotated is not None:
+                    data, _ = self._read_from(rotated, self._offset)
+                    lines.extend(self._split(data, True))
+                else:
+                    LOGGER.debug("%s was replaced, reading it from start", self.path)
+            self._inode = inode
+            self._offset = 0
+            self._partial = b""
+        elif st is not None and st.st_size < self._offset:
+            LOGGER.debug("%s was truncated, reading it from start", self.path)
+            self._offset = 0
+            self._partial = b""
+        if st is not None:
+            with contextlib.suppress(FileNotFoundError):
+                data, self._offset = self._read_from(self.path, self._offset)
+                lines.extend(self._split(data, False))
+        return lines
+
+
+class ToolLogs:
+    """
+    Logs of the client tools.
+
+    This class follows the log files of the client tools (by default
+    `TOOL_LOGS`), giving access only to the lines appended to them since it
+    was created; each access reads only what was appended since the
+    previous one.
+
+    The logs are referred by name, e.g. `rhsm` or `insights-client`; when
+    no name is specified, all the logs are used.
+    """
+
+    def __init__(self, logs=None):
+        """
+        Create a new ToolLogs object.
+
+        :param logs: The log files to follow, by name
+        :type logs: dict, optional
+        """
+        if logs is None:
+            logs = TOOL_LOGS
+        self._followers = {name: LogFollower(path) for name, path in logs.items()}
+        self._lines = {name: [] for name in logs}
+
+    def _names(self, log):
+        if log is None:
+            return list(self._followers)
+        if log not in self._followers:
+            raise KeyError(log)
+        return [log]
+
+    def _update(self, names):
+        for name in names:
+            self._lines[name].extend(self._followers[name].read())
+
+    def new_lines(self, log=None):
+        """
+        Return the lines appended to the logs.
+
+        :param log: The name of the log; if not specified, the lines of all
+            the logs are returned, one log after the other
+        :type log: str, optional
+        :return: The new lines
+        :rtype: list
+        """
+        names = self._names(log)
+        self._update(names)
+        return [line for name in names for line in self._lines[name]]
+
+    def _search(self, regex, names, start):
+        self._update(names)
+        for name in names:
+            lines = self._lines[name]
+            first = start.get(name, 0)
+            for line in lines[first:]:
+                m = regex.search(line)
+                if m:
+                    return m
+            start[name] = len(lines)
+        return None
+
+    def search(self, pattern, log=None):
+        """
+        Search a regular expression in the lines appended to the logs.
+
+        :param pattern: The regular expression to search
+        :type pattern: str or re.Pattern
+        :param log: The name of the log; if not specified, all the logs are
+            searched
+        :type log: str, optional
+        :return: The match of the first line matching, or `None`
+        :rtype: re.Match
+        """
+        return self._search(re.compile(pattern), self._names(log), {})
+
+    def _watcher(self, names):
+        directories = {str(self._followers[name].path.parent) for name in names}
+        try:
+            return _Inotify(sorted(directories))
+        except (AttributeError, OSError) as e:
+            LOGGER.debug("cannot use inotify, polling the logs: %s", e)
+            return _Polling(0.1)
+
+    def wait_for(self, pattern, log=None, timeout=10):
+        """
+        Wait for a line matching a regular expression in the logs.
+
+        The logs are watched using inotify, when available, so the lines
+        are read as soon as they are written; otherwise, the logs are
+        checked periodically.
+
+        :param pattern: The regular expression to search
+        :type pattern: str or re.Pattern
+        :param log: The name of the log; if not specified, all the logs are
+            searched
+        :type log: str, optional
+        :param timeout: How long to wait, in seconds
+        :type timeout: float
+        :return: The match of the first line matching
+        :rtype: re.Match
+        """
+        regex = re.compile(pattern)
+        names = self._names(log)
+        start = {}
+        deadline = time.monotonic() + timeout
+        watcher = self._watcher(names)
+        try:
+            while True:
+                m = self._search(regex, names, start)
+                if m:
+                    return m
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise LogTimeoutError(regex.pattern, timeout)
+                watcher.wait(min(remaining, _MAX_WAIT))
+        finally:
+            watcher.close()
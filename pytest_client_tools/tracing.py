@@ -0,0 +1,260 @@
+# SPDX-FileCopyrightText: Red Hat
+# SPDX-License-Identifier: MIT
+
+import json
+import os
+import pathlib
+import threading
+import time
+
+
+def _now_us():
+    # CLOCK_MONOTONIC is system-wide, so timestamps of different processes
+    # (e.g. pytest-xdist workers) are comparable
+    return time.monotonic() * 1000000
+
+
+class _NullSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, error_type, error_value, traceback):
+        return False
+
+    def set(self, **args):
+        pass
+
+    def finish(self, error=None):
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class Span:
+    """
+    An operation traced by [`Tracer`][pytest_client_tools.tracing.Tracer].
+
+    Its attributes are:
+
+    - `name`: the name of the operation
+    - `category`: the category of the operation, e.g. `subprocess`, `http`,
+      `fixture`
+    - `args`: a dict with additional details, always including the ID of
+      the current test (`nodeid`) and the pytest-xdist worker ID (`worker`)
+    - `start`: the timestamp of the beginning of the operation, in
+      microseconds
+    - `end`: the timestamp of the end of the operation, in microseconds;
+      `None` if the operation is still running
+
+    Spans are used as context managers, tracing the operation within them.
+    """
+
+    def __init__(self, tracer, name, category, args):
+        self._tracer = tracer
+        self.name = name
+        self.category = category
+        self.args = args
+        self.start = None
+        self.end = None
+
+    @property
+    def duration(self):
+        """
+        The duration of the operation, in microseconds; `None` if the
+        operation is still running.
+        """
+        if self.end is None:
+            return None
+        return self.end - self.start
+
+    def __enter__(self):
+        self._tracer._start_span(self)
+        return self
+
+    def __exit__(self, error_type, error_value, traceback):
+        self.finish(error=error_type.__name__ if error_type else None)
+        return False
+
+    def set(self, **args):
+        """
+        Set additional arguments of the span.
+        """
+        self.args.update(args)
+
+    def finish(self, error=None):
+        """
+        Mark the end of the operation.
+
+        :param error: The name of the error that ended the operation, if any
+        :type error: str, optional
+        """
+        if error:
+            self.args["error"] = error
+        self._tracer._finish_span(self)
+
+
+class Tracer:
+    """
+    Tracer of the operations of pytest-client-tools.
+
+    This class collects events in the JSON Trace Event Format, which can be
+    loaded in trace viewers such as Perfetto or `chrome://tracing`. Each
+    event has the ID of the current test and the pytest-xdist worker ID as
+    arguments.
+
+    In addition, the spans and the metrics are passed to the
+    `pytest_client_tools_span_start`, `pytest_client_tools_span_end`, and
+    `pytest_client_tools_metric` hooks, when any plugin implements them.
+
+    The tracer does nothing unless `enabled` is set, or there are
+    implementations of the hooks.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.nodeid = None
+        self.worker_id = os.environ.get("PYTEST_XDIST_WORKER", "main")
+        self._events = []
+        self._lock = threading.Lock()
+        self._hook = None
+        self._span_hooks = False
+        self._metric_hooks = False
+
+    @property
+    def active(self):
+        """
+        Whether spans are traced, either to the trace or to hooks.
+        """
+        return self.enabled or self._span_hooks
+
+    def set_hook(self, hook):
+        """
+        Set the pytest hook relay used to call the hooks.
+        """
+        self._hook = hook
+        self.update_hooks()
+
+    def update_hooks(self):
+        """
+        Check again whether the hooks have implementations.
+        """
+        if self._hook is None:
+            self._span_hooks = self._metric_hooks = False
+            return
+        self._span_hooks = bool(
+            self._hook.pytest_client_tools_span_start.get_hookimpls()
+            or self._hook.pytest_client_tools_span_end.get_hookimpls()
+        )
+        self._metric_hooks = bool(self._hook.pytest_client_tools_metric.get_hookimpls())
+
+    def span(self, name, category, **args):
+        """
+        Return a context manager tracing the operation within it.
+
+        The returned object has a `set(**args)` method to add more arguments
+        to the event while the operation is running.
+
+        :param name: The name of the operation
+        :type name: str
+        :param category: The category of the operation
+        :type category: str
+        :param args: Additional arguments of the event
+        :rtype: pytest_client_tools.tracing.Span
+        """
+        if not self.active:
+            return _NULL_SPAN
+        return Span(self, name, category, args)
+
+    def start_span(self, name, category, **args):
+        """
+        Start tracing an operation.
+
+        This is the same as `span()`, for operations that cannot be wrapped
+        in a context manager: `finish()` must be called on the returned span
+        when the operation ends.
+        """
+        span = self.span(name, category, **args)
+        if span is not _NULL_SPAN:
+            self._start_span(span)
+        return span
+
+    def _start_span(self, span):
+        span.args.setdefault("nodeid", self.nodeid)
+        span.args.setdefault("worker", self.worker_id)
+        span.start = _now_us()
+        if self._span_hooks:
+            self._hook.pytest_client_tools_span_start(span=span)
+
+    def _finish_span(self, span):
+        span.end = _now_us()
+        if self._span_hooks:
+            self._hook.pytest_client_tools_span_end(span=span)
+        if not self.enabled:
+            return
+        event = {
+            "name": span.name,
+            "cat": span.category,
+            "ph": "X",
+            "ts": span.start,
+            "dur": span.end - span.start,
+            "pid": os.getpid(),
+            "tid": threading.get_ident(),
+            "args": span.args,
+        }
+        with self._lock:
+            self._events.append(event)
+
+    def metric(self, name, value, **tags):
+        """
+        Report a metric to the `pytest_client_tools_metric` hook.
+
+        :param name: The name of the metric, e.g. `command.wall_time`
+        :type name: str
+        :param value: The value of the metric
+        :type value: int or float
+        :param tags: Additional details of the metric; the ID of the current
+            test (`nodeid`) and the pytest-xdist worker ID (`worker`) are
+            always added
+        """
+        if not self._metric_hooks:
+            return
+        tags.setdefault("nodeid", self.nodeid)
+        tags.setdefault("worker", self.worker_id)
+        self._hook.pytest_client_tools_metric(name=name, value=value, tags=tags)
+
+    def _metadata_events(self):
+        return [
+            {
+                "name": "process_name",
+                "ph": "M",
+                "pid": os.getpid(),
+                "args": {"name": f"pytest ({self.worker_id})"},
+            }
+        ]
+
+    def write(self, path, extra_paths=()):
+        """
+        Write the collected events as JSON trace file.
+
+        :param path: The path of the trace file
+        :type path: str or pathlib.Path
+        :param extra_paths: Trace files written by other processes, whose
+            events are merged in the written trace; they are removed
+            afterwards
+        :type extra_paths: list
+        """
+        with self._lock:
+            events = self._metadata_events() + self._events
+        for extra_path in extra_paths:
+            doc = json.loads(pathlib.Path(extra_path).read_text())
+            events.extend(doc["traceEvents"])
+        pathlib.Path(path).write_text(
+            json.dumps({"traceEvents": events, "displayTimeUnit": "ms"})
+        )
+        for extra_path in extra_paths:
+            os.unlink(str(extra_path))
+
+
+# the tracer used by pytest-client-tools
+TRACER = Tracer()
@@ -1,17 +1,26 @@
 # SPDX-FileCopyrightText: Red Hat
 # SPDX-License-Identifier: MIT
 
+import collections
+import contextlib
 import dataclasses
 import functools
+import itertools
+import json
+import locale
 import logging
 import os
 import pathlib
 import shutil
+import signal
 import subprocess
 import sys
 import tempfile
+import threading
+import time
 
 from .logger import LOGGER
+from .tracing import TRACER
 
 
 @dataclasses.dataclass
@@ -80,10 +89,33 @@ class ClientToolsPluginData:
         self.global_running_data = NodeRunningData()
         self.global_running_data.handler.setLevel(logging.DEBUG)
         LOGGER.addHandler(self.global_running_data.handler)
-        self.log_selinux_audits = should_log_selinux_denials()
+        self._log_selinux_audits = None
+        self.test_config_snapshot = None
+        self.journal_units = []
+        self._capture_journal = None
+
+    @property
+    def log_selinux_audits(self):
+        # the probe runs tools, so do it only when actually needed
+        if self._log_selinux_audits is None:
+            self._log_selinux_audits = should_log_selinux_denials()
+        return self._log_selinux_audits
+
+    @property
+    def capture_journal(self):
+        if self._capture_journal is None:
+            self._capture_journal = should_capture_journal(self.journal_units)
+        return self._capture_journal
+
+    @capture_journal.setter
+    def capture_journal(self, value):
+        self._capture_journal = value
 
 
 class ArtifactsCollector:
+    # the collector of the test currently running (or of the session)
+    current = None
+
     def __init__(self, name=None, module=None, cls=None):
         self._path = self._init_path(name, module, cls)
 
@@ -98,12 +130,19 @@ class ArtifactsCollector:
             p /= name
         return p
 
-    def copy(self, src):
-        self._path.mkdir(parents=True, exist_ok=True)
-        shutil.copy2(src, self._path)
+    def copy(self, src, name=None):
+        with TRACER.span("copy artifact", "artifacts", path=str(src)):
+            self._path.mkdir(parents=True, exist_ok=True)
+            shutil.copy2(src, self._path / name if name else self._path)
 
     def write_text(self, fn, data):
-        (self._path / fn).write_text(data)
+        with TRACER.span("write artifact", "artifacts", path=fn):
+            self._path.mkdir(parents=True, exist_ok=True)
+            (self._path / fn).write_text(data)
+
+    def open(self, fn, mode="w"):
+        self._path.mkdir(parents=True, exist_ok=True)
+        return open(self._path / fn, mode)
 
 
 class NodeRunningData:
@@ -123,6 +162,8 @@ class NodeRunningData:
             )
         )
         self.timestamp = None
+        self.capture_journal = False
+        self.journal_cursor = None
 
     def archive_test_log(self):
         self.handler.close()
@@ -130,10 +171,437 @@ class NodeRunningData:
             self.artifacts.copy(self.logfile)
 
 
+@dataclasses.dataclass
+class ProcessResources:
+    """
+    Resources used by a process.
+
+    - `wall_time`: the time elapsed while running the process, in seconds
+    - `user_time`: the CPU time spent in user mode, in seconds
+    - `system_time`: the CPU time spent in kernel mode, in seconds
+    - `max_rss`: the maximum resident set size, in kilobytes
+
+    The values other than `wall_time` are `None` when not available.
+    """
+
+    wall_time: float
+    user_time: float = None
+    system_time: float = None
+    max_rss: int = None
+
+    @property
+    def cpu_time(self):
+        """
+        The total CPU time of the process (user + system), in seconds.
+        """
+        if self.user_time is None or self.system_time is None:
+            return None
+        return self.user_time + self.system_time
+
+
+class CommandStats:
+    """
+    Statistics of the resources used by the executed commands.
+
+    The statistics are grouped by tool (i.e. the name of the executable) and
+    by subcommand (i.e. its first argument).
+    """
+
+    def __init__(self):
+        # (tool, subcommand) -> [calls, wall, user, system, max_rss]
+        self._data = {}
+
+    def __bool__(self):
+        return bool(self._data)
+
+    @staticmethod
+    def command_key(args):
+        """
+        Return the (tool, subcommand) key for the arguments of a command.
+        """
+        if isinstance(args, (str, bytes, os.PathLike)):
+            args = os.fsdecode(args).split()
+        args = [os.fsdecode(a) for a in args]
+        tool = os.path.basename(args[0]) if args else ""
+        # only the name of an option, as its value may be sensitive
+        subcommand = args[1].split("=", 1)[0] if len(args) > 1 else ""
+        return (tool, subcommand)
+
+    def add(self, args, resources):
+        """
+        Add the resources used by a command.
+
+        :param args: The arguments of the command
+        :type args: list or str
+        :param resources: The resources used
+        :type resources: pytest_client_tools.util.ProcessResources
+        """
+        self._add(
+            self.command_key(args),
+            [
+                1,
+                resources.wall_time,
+                resources.user_time or 0.0,
+                resources.system_time or 0.0,
+                resources.max_rss or 0,
+            ],
+        )
+
+    def _add(self, key, values):
+        current = self._data.get(key)
+        if current is None:
+            self._data[key] = list(values)
+            return
+        for i in range(4):
+            current[i] += values[i]
+        current[4] = max(current[4], values[4])
+
+    def merge(self, records):
+        """
+        Merge records as returned by `to_records()`.
+        """
+        for r in records:
+            values = [
+                r["calls"],
+                r["wall_time"],
+                r["user_time"],
+                r["system_time"],
+                r["max_rss"],
+            ]
+            self._add((r["tool"], r["subcommand"]), values)
+
+    def to_records(self):
+        """
+        Return the statistics as list of dicts, one for each subcommand.
+        """
+        return [
+            {
+                "tool": tool,
+                "subcommand": subcommand,
+                "calls": calls,
+                "wall_time": wall,
+                "user_time": user,
+                "system_time": system,
+                "max_rss": max_rss,
+            }
+            for (tool, subcommand), (calls, wall, user, system, max_rss) in sorted(
+                self._data.items()
+            )
+        ]
+
+    def to_json(self):
+        """
+        Return the statistics as JSON text, with totals for each tool.
+        """
+        commands = self.to_records()
+        tools = CommandStats()
+        for (tool, _), values in self._data.items():
+            tools._add((tool, ""), values)
+        return json.dumps(
+            {
+                "tools": [
+                    {k: v for k, v in r.items() if k != "subcommand"}
+                    for r in tools.to_records()
+                ],
+                "commands": commands,
+            },
+            indent=2,
+        )
+
+    def format_table(self):
+        """
+        Return the statistics as lines of a table, sorted by total wall time.
+        """
+        lines = [
+            f"{'tool':<24} {'subcommand':<20} {'calls':>6} {'wall (s)':>10} "
+            f"{'avg (s)':>9} {'cpu (s)':>9} {'max rss (KiB)':>14}"
+        ]
+        records = sorted(self.to_records(), key=lambda r: -r["wall_time"])
+        for r in records:
+            lines.append(
+                f"{r['tool']:<24} {r['subcommand']:<20} {r['calls']:>6} "
+                f"{r['wall_time']:>10.2f} {r['wall_time'] / r['calls']:>9.2f} "
+                f"{r['user_time'] + r['system_time']:>9.2f} {r['max_rss']:>14}"
+            )
+        return lines
+
+
+# statistics of all the commands run using logged_run()
+COMMAND_STATS = CommandStats()
+
+
+def _exit_code(status):
+    # the same as os.waitstatus_to_exitcode(), not available in Python < 3.9
+    if os.WIFSIGNALED(status):
+        return -os.WTERMSIG(status)
+    return os.WEXITSTATUS(status)
+
+
+class _RusagePopen(subprocess.Popen):
+    # subprocess.Popen that reaps the process using os.wait4(), so its
+    # resource usage is available after it terminated; both the public ways
+    # to reap a process (poll() and wait()) are overridden, so nothing else
+    # can reap it
+    rusage = None
+
+    def __init__(self, *args, **kwargs):
+        self._reap_lock = threading.Lock()
+        super().__init__(*args, **kwargs)
+
+    def _set_status(self, pid, status, rusage):
+        # called with the lock held
+        if pid == self.pid and self.returncode is None:
+            self.rusage = rusage
+            self.returncode = _exit_code(status)
+
+    def poll(self):
+        with self._reap_lock:
+            if self.returncode is None:
+                try:
+                    pid, status, rusage = os.wait4(self.pid, os.WNOHANG)
+                except ChildProcessError:
+                    # same as subprocess.Popen: the status cannot be known
+                    pid, status, rusage = self.pid, 0, None
+                self._set_status(pid, status, rusage)
+        return self.returncode
+
+    def wait(self, timeout=None):
+        if timeout is None:
+            if self.returncode is None:
+                # blocking without the lock, so poll() in other threads
+                # (e.g. a watchdog killing the process) is not blocked
+                try:
+                    pid, status, rusage = os.wait4(self.pid, 0)
+                except ChildProcessError:
+                    # reaped by poll() in another thread, which set the
+                    # status with the lock held; otherwise, the status
+                    # cannot be known
+                    pid, status, rusage = self.pid, 0, None
+                with self._reap_lock:
+                    self._set_status(pid, status, rusage)
+            return self.returncode
+        deadline = time.monotonic() + timeout
+        delay = 0.0005
+        while self.poll() is None:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise subprocess.TimeoutExpired(self.args, timeout)
+            time.sleep(min(delay, remaining))
+            delay = min(delay * 2, 0.05)
+        return self.returncode
+
+
+class CommandTimeoutError(subprocess.TimeoutExpired):
+    """
+    A command did not finish within its time budget, and it was killed
+    together with all the processes in its process group.
+
+    The output produced until then is available as `output` and `stderr`.
+    """
+
+    def __str__(self):
+        return (
+            f"Command '{self.cmd}' timed out after {self.timeout} seconds, "
+            "and its process group was killed"
+        )
+
+
+class CommandTimeouts:
+    """
+    Time budgets for commands.
+
+    The budgets are set by tool (i.e. the name of the executable), and
+    optionally by subcommand (i.e. the first argument of the tool); the
+    budget of a subcommand takes precedence over the budget of its tool,
+    which takes precedence over the default budget.
+    """
+
+    def __init__(self):
+        self.default = None
+        self._budgets = {}
+
+    def clear(self):
+        """
+        Remove all the budgets.
+        """
+        self.default = None
+        self._budgets = {}
+
+    def set(self, seconds, tool=None, subcommand=None):
+        """
+        Set a time budget.
+
+        :param seconds: The time budget in seconds; `None` means no budget
+        :type seconds: float
+        :param tool: The tool; if not specified, the default budget is set
+        :type tool: str, optional
+        :param subcommand: The subcommand of the tool
+        :type subcommand: str, optional
+        """
+        if tool is None:
+            self.default = seconds
+        else:
+            self._budgets[(tool, subcommand)] = seconds
+
+    def set_from_spec(self, spec):
+        """
+        Set a time budget from a string.
+
+        The format of the string is `TOOL[ SUBCOMMAND]=SECONDS`, or
+        `default=SECONDS` for the default budget; for example
+        `insights-client --register=300`, or `rhc=120`.
+        """
+        command, sep, seconds = spec.rpartition("=")
+        command = command.split()
+        if not sep or not command or len(command) > 2:
+            raise ValueError(f"invalid command timeout: {spec!r}")
+        seconds = float(seconds) if seconds.strip() else None
+        if command == ["default"]:
+            self.set(seconds)
+        else:
+            self.set(seconds, *command)
+
+    def get(self, args):
+        """
+        Return the time budget for the specified command.
+
+        :param args: The arguments of the command
+        :type args: list or str
+        :return: The time budget in seconds, or `None` if not set
+        :rtype: float
+        """
+        if not self._budgets:
+            return self.default
+        tool, subcommand = CommandStats.command_key(args)
+        for key in ((tool, subcommand), (tool, None)):
+            if key in self._budgets:
+                return self._budgets[key]
+        return self.default
+
+
+# time budgets of the commands run using logged_run()
+COMMAND_TIMEOUTS = CommandTimeouts()
+
+# how long to wait for a process group to terminate before killing it
+_KILL_GRACE_TIME = 5
+
+
+def _kill_process_group(process):
+    # terminate nicely first, so the tools can clean up (e.g. lock files)
+    with contextlib.suppress(ProcessLookupError, PermissionError):
+        os.killpg(process.pid, signal.SIGTERM)
+    with contextlib.suppress(subprocess.TimeoutExpired):
+        process.wait(timeout=_KILL_GRACE_TIME)
+    with contextlib.suppress(ProcessLookupError, PermissionError):
+        os.killpg(process.pid, signal.SIGKILL)
+
+
+def _process_resources(process, start):
+    rusage = process.rusage
+    return ProcessResources(
+        wall_time=time.monotonic() - start,
+        user_time=rusage.ru_utime if rusage else None,
+        system_time=rusage.ru_stime if rusage else None,
+        max_rss=rusage.ru_maxrss if rusage else None,
+    )
+
+
+def _is_text_mode(popen_kwargs):
+    return any(
+        popen_kwargs.get(k)
+        for k in ("universal_newlines", "text", "encoding", "errors")
+    )
+
+
+def _run_process(*popenargs, input=None, timeout=None, **kwargs):
+    # same as subprocess.run(), also returning the resources used; in case
+    # of timeout, the whole process group of the command is killed
+    if input is not None:
+        kwargs["stdin"] = subprocess.PIPE
+    if timeout is not None:
+        kwargs["start_new_session"] = True
+    start = time.monotonic()
+    with _RusagePopen(*popenargs, **kwargs) as process:
+        try:
+            stdout, stderr = process.communicate(input, timeout=timeout)
+        except subprocess.TimeoutExpired:
+            _kill_process_group(process)
+            try:
+                stdout, stderr = process.communicate(timeout=_KILL_GRACE_TIME)
+            except subprocess.TimeoutExpired as e:
+                # some process outside the group still has the pipes open;
+                # the partial output is always bytes
+                stdout, stderr = e.output, e.stderr
+                if _is_text_mode(kwargs):
+                    stdout, stderr = (
+                        s.decode(errors="replace") if isinstance(s, bytes) else s
+                        for s in (stdout, stderr)
+                    )
+                for pipe in (process.stdout, process.stderr):
+                    if pipe:
+                        pipe.close()
+            process.wait()
+            error = CommandTimeoutError(
+                process.args, timeout, output=stdout, stderr=stderr
+            )
+            error.resources = _process_resources(process, start)
+            raise error from None
+        except BaseException:
+            if timeout is not None:
+                _kill_process_group(process)
+            else:
+                process.kill()
+            raise
+        # reap the process explicitly, in case communicate() did not
+        retcode = process.wait()
+    proc = subprocess.CompletedProcess(process.args, retcode, stdout, stderr)
+    proc.resources = _process_resources(process, start)
+    return proc
+
+
+def _logged_options(kwargs):
+    # the environment is not logged, as it may contain credentials
+    return {k: v for k, v in kwargs.items() if k != "env"}
+
+
+def _report_command_metrics(tool, subcommand, proc):
+    tags = {"tool": tool, "subcommand": subcommand, "returncode": proc.returncode}
+    TRACER.metric("command.wall_time", proc.resources.wall_time, **tags)
+    if proc.resources.cpu_time is not None:
+        TRACER.metric("command.cpu_time", proc.resources.cpu_time, **tags)
+    if proc.resources.max_rss is not None:
+        TRACER.metric("command.max_rss", proc.resources.max_rss, **tags)
+
+
 def logged_run(*args, **kwargs):
+    """
+    Run a command, logging it and its result.
+
+    This is a wrapper around `subprocess.run()`, accepting the same
+    parameters, and in addition:
+
+    - `logged_args`: the arguments to log instead of the actual ones, for
+      example to hide sensitive values
+    - `internal`: whether the command is a helper of the plugin itself
+      (e.g. `systemctl` or `openssl`) rather than a client tool: it is
+      logged and traced, but not added to `COMMAND_STATS` nor reported as
+      metrics
+
+    If `timeout` is not specified, the time budget for the command set in
+    `COMMAND_TIMEOUTS` (if any) is used. When the command exceeds it, the
+    command is killed together with all the processes in its process group,
+    and `CommandTimeoutError` is raised.
+
+    The returned `subprocess.CompletedProcess` has an additional `resources`
+    attribute (`ProcessResources`) with the resources used by the command,
+    which are also added to `COMMAND_STATS`.
+    """
     logged_args = kwargs.pop("logged_args", None)
+    internal = kwargs.pop("internal", False)
     LOGGER.debug(
-        "running %s with options %s", logged_args if logged_args else args, kwargs
+        "running %s with options %s",
+        logged_args if logged_args else args,
+        _logged_options(kwargs),
     )
     check = kwargs.pop("check", False)
     # switch "text" (if present) into "universal_newlines" for Python < 3.7
@@ -141,20 +609,366 @@ def logged_run(*args, **kwargs):
         text = kwargs.pop("text", None)
         if text is not None:
             kwargs["universal_newlines"] = text
+    command_args = args[0] if args else kwargs["args"]
+    tool, subcommand = CommandStats.command_key(command_args)
+    if kwargs.get("timeout") is None:
+        kwargs["timeout"] = COMMAND_TIMEOUTS.get(command_args)
+    try:
+        with TRACER.span(f"{tool} {subcommand}", "subprocess") as span:
+            proc = _run_process(*args, **kwargs)
+            span.set(returncode=proc.returncode)
+        if not internal:
+            COMMAND_STATS.add(proc.args, proc.resources)
+            _report_command_metrics(tool, subcommand, proc)
+        if logged_args:
+            proc.args = logged_args
+        LOGGER.debug("result: %s, resources: %s", proc, proc.resources)
+        if check:
+            proc.check_returncode()
+    except subprocess.SubprocessError as e:
+        if isinstance(e, CommandTimeoutError):
+            if not internal:
+                COMMAND_STATS.add(e.cmd, e.resources)
+            LOGGER.debug("timeout: %s, resources: %s", e, e.resources)
+        if hasattr(e, "cmd") and logged_args:
+            e.cmd = logged_args
+        raise e from None
+    return proc
+
+
+async def _read_stream(stream, chunks):
+    while True:
+        chunk = await stream.read(65536)
+        if not chunk:
+            return
+        chunks.append(chunk)
+
+
+async def _write_stream(stream, data):
+    stream.write(data)
+    with contextlib.suppress(BrokenPipeError, ConnectionResetError):
+        await stream.drain()
+    stream.close()
+
+
+async def _kill_process_group_async(process):
+    # imported here to not slow down the loading of the plugin
+    import asyncio
+
+    with contextlib.suppress(ProcessLookupError, PermissionError):
+        os.killpg(process.pid, signal.SIGTERM)
+    with contextlib.suppress(asyncio.TimeoutError):
+        await asyncio.wait_for(process.wait(), _KILL_GRACE_TIME)
+    with contextlib.suppress(ProcessLookupError, PermissionError):
+        os.killpg(process.pid, signal.SIGKILL)
+
+
+def _decode_output(data, text):
+    if data is None or not text:
+        return data
+    # the same as the universal newlines mode of subprocess
+    text = data.decode(locale.getpreferredencoding(False))
+    return text.replace("\r\n", "\n").replace("\r", "\n")
+
+
+async def _run_process_async(args, input=None, timeout=None, text=False, **kwargs):
+    # same as _run_process(), only with asyncio; the resources of the process
+    # cannot be known, as the process is reaped by asyncio
+    # imported here to not slow down the loading of the plugin
+    import asyncio
+
+    if input is not None:
+        kwargs["stdin"] = subprocess.PIPE
+    if timeout is not None:
+        kwargs["start_new_session"] = True
+    start = time.monotonic()
+    process = await asyncio.create_subprocess_exec(*args, **kwargs)
+    outputs = ([], [])
+    streams = [
+        (stream, chunks)
+        for stream, chunks in zip((process.stdout, process.stderr), outputs)
+        if stream
+    ]
+    tasks = [_read_stream(stream, chunks) for stream, chunks in streams]
+    if input is not None:
+        tasks.append(_write_stream(process.stdin, input))
+    timed_out = False
+    try:
+        await asyncio.wait_for(asyncio.gather(*tasks, process.wait()), timeout)
+    except asyncio.TimeoutError:
+        timed_out = True
+        await _kill_process_group_async(process)
+        # read what is left of the output
+        with contextlib.suppress(asyncio.TimeoutError):
+            await asyncio.wait_for(
+                asyncio.gather(
+                    *[_read_stream(stream, chunks) for stream, chunks in streams]
+                ),
+                _KILL_GRACE_TIME,
+            )
+        await process.wait()
+    except BaseException:
+        if timeout is not None:
+            await _kill_process_group_async(process)
+        else:
+            with contextlib.suppress(ProcessLookupError):
+                process.kill()
+        raise
+    stdout, stderr = (
+        _decode_output(b"".join(chunks), text) if stream else None
+        for stream, chunks in zip((process.stdout, process.stderr), outputs)
+    )
+    resources = ProcessResources(wall_time=time.monotonic() - start)
+    if timed_out:
+        error = CommandTimeoutError(list(args), timeout, output=stdout, stderr=stderr)
+        error.resources = resources
+        raise error
+    proc = subprocess.CompletedProcess(list(args), process.returncode, stdout, stderr)
+    proc.resources = resources
+    return proc
+
+
+async def async_logged_run(args, logged_args=None, check=False, **kwargs):
+    """
+    Run a command using asyncio, logging it and its result.
+
+    This is the same as `logged_run()`, except that it is a coroutine, and
+    that the returned `resources` have only the elapsed time of the command
+    (as the process is reaped by asyncio). The supported parameters are
+    `input`, `timeout`, `text`, and the parameters of
+    `asyncio.create_subprocess_exec()`.
+    """
+    LOGGER.debug(
+        "running %s with options %s",
+        logged_args if logged_args else args,
+        _logged_options(kwargs),
+    )
+    tool, subcommand = CommandStats.command_key(args)
+    if kwargs.get("timeout") is None:
+        kwargs["timeout"] = COMMAND_TIMEOUTS.get(args)
     try:
-        proc = subprocess.run(*args, **kwargs)
+        with TRACER.span(f"{tool} {subcommand}", "subprocess") as span:
+            proc = await _run_process_async(args, **kwargs)
+            span.set(returncode=proc.returncode)
+        COMMAND_STATS.add(proc.args, proc.resources)
+        _report_command_metrics(tool, subcommand, proc)
         if logged_args:
             proc.args = logged_args
-        LOGGER.debug("result: %s", proc)
+        LOGGER.debug("result: %s, resources: %s", proc, proc.resources)
         if check:
             proc.check_returncode()
     except subprocess.SubprocessError as e:
+        if isinstance(e, CommandTimeoutError):
+            COMMAND_STATS.add(e.cmd, e.resources)
+            LOGGER.debug("timeout: %s, resources: %s", e, e.resources)
         if hasattr(e, "cmd") and logged_args:
             e.cmd = logged_args
         raise e from None
     return proc
 
 
+def run_concurrently(*awaitables):
+    """
+    Run awaitables concurrently, waiting for all of them.
+
+    This is meant to run concurrently queries which do not depend on each
+    other, for example:
+
+    ```python
+    subman_registered, rhc_registered = run_concurrently(
+        subman.async_is_registered(),
+        rhc.async_is_registered(),
+    )
+    ```
+
+    A new event loop is used, so this cannot be called from a coroutine.
+
+    :param awaitables: The awaitables to run
+    :return: The list of the results, in the same order of `awaitables`
+    :rtype: list
+    """
+    # imported here to not slow down the loading of the plugin
+    import asyncio
+
+    loop = asyncio.new_event_loop()
+    try:
+        asyncio.set_event_loop(loop)
+        if sys.version_info[:2] < (3, 8):
+            # the default child watcher of older Python versions is attached
+            # to a specific loop
+            asyncio.get_child_watcher().attach_loop(loop)
+        return loop.run_until_complete(asyncio.gather(*awaitables))
+    finally:
+        asyncio.set_event_loop(None)
+        loop.close()
+
+
+class StreamedProcess:
+    """
+    A command whose output is read while it runs.
+
+    The output of the command (stdout and stderr merged, as text) is read
+    line by line: each line is logged, and written to the
+    `output-<tool>-<n>.log` artifact of the current test. Only the last
+    lines of the output are kept in memory, as `tail`.
+
+    Iterating over this object returns the lines of the output (without
+    the trailing newline) as soon as the command prints them; at the end of
+    the output, `wait()` is called. Leaving the iteration earlier does not
+    stop the command: `close()` (or exiting the `with` block, as this object
+    is a context manager) kills the command if it is still running.
+
+    The time budgets in `COMMAND_TIMEOUTS` apply also to the commands run
+    this way.
+    """
+
+    _counter = itertools.count(1)
+
+    def __init__(
+        self, args, logged_args=None, check=False, tail=1000, timeout=None, **kwargs
+    ):
+        """
+        Start a command.
+
+        :param args: The arguments of the command
+        :type args: list
+        :param logged_args: The arguments to log instead of the actual ones,
+            for example to hide sensitive values
+        :type logged_args: list, optional
+        :param check: Whether `wait()` raises an exception if the process
+            exits with a return code different than 0
+        :type check: bool
+        :param tail: How many lines of the output to keep in memory
+        :type tail: int
+        :param timeout: The time budget of the command in seconds; if not
+            specified, the one in `COMMAND_TIMEOUTS` is used
+        :type timeout: float, optional
+        :param kwargs: Additional parameters for `subprocess.Popen`
+        """
+        self.args = logged_args if logged_args else args
+        self.tail = collections.deque(maxlen=tail)
+        self.resources = None
+        self._check = check
+        self._tool, self._subcommand = CommandStats.command_key(args)
+        self._timeout = timeout if timeout is not None else COMMAND_TIMEOUTS.get(args)
+        self._timed_out = False
+        self._result = None
+        LOGGER.debug("streaming %s with options %s", self.args, kwargs)
+        self._span = TRACER.start_span(f"{self._tool} {self._subcommand}", "subprocess")
+        self._start = time.monotonic()
+        try:
+            self._process = _RusagePopen(
+                args,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.STDOUT,
+                universal_newlines=True,
+                errors="replace",
+                start_new_session=True,
+                **kwargs,
+            )
+        except BaseException as e:
+            # the same as the span of logged_run() when the command fails
+            # to start
+            self._span.finish(error=type(e).__name__)
+            raise
+        self._watchdog = None
+        if self._timeout is not None:
+            self._watchdog = threading.Timer(self._timeout, self._expire)
+            self._watchdog.daemon = True
+            self._watchdog.start()
+        self._artifact = None
+        if ArtifactsCollector.current:
+            name = f"output-{self._tool}-{next(self._counter)}.log"
+            self._artifact = ArtifactsCollector.current.open(name)
+
+    @property
+    def returncode(self):
+        """
+        The exit code of the command; `None` if it is still running.
+        """
+        return self._process.poll()
+
+    def _expire(self):
+        self._timed_out = True
+        _kill_process_group(self._process)
+
+    def _lines(self):
+        if self._result is not None:
+            return
+        for line in iter(self._process.stdout.readline, ""):
+            line = line.rstrip("\n")
+            self.tail.append(line)
+            LOGGER.debug("%s: %s", self._tool, line)
+            if self._artifact:
+                self._artifact.write(line + "\n")
+            yield line
+
+    def __iter__(self):
+        yield from self._lines()
+        self.wait()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, error_type, error_value, traceback):
+        self.close()
+        return False
+
+    def wait(self):
+        """
+        Wait for the command to finish, reading the rest of its output.
+
+        :return: The result of the command execution, with the tail of its
+            output as `stdout`
+        :rtype: subprocess.CompletedProcess
+        """
+        for _ in self._lines():
+            pass
+        self._finish()
+        return self._check_result()
+
+    def close(self):
+        """
+        Stop reading the output of the command, killing it if still running.
+        """
+        if self._result is not None:
+            return
+        if self._process.poll() is None:
+            _kill_process_group(self._process)
+        self._finish()
+
+    def _finish(self):
+        if self._result is not None:
+            return
+        self._process.wait()
+        if self._watchdog:
+            self._watchdog.cancel()
+        self._process.stdout.close()
+        if self._artifact:
+            self._artifact.close()
+        self.resources = _process_resources(self._process, self._start)
+        self._result = subprocess.CompletedProcess(
+            self.args, self._process.returncode, "\n".join(self.tail), None
+        )
+        self._result.resources = self.resources
+        self._span.set(returncode=self._result.returncode)
+        self._span.finish(error="CommandTimeoutError" if self._timed_out else None)
+        COMMAND_STATS.add(self._process.args, self.resources)
+        _report_command_metrics(self._tool, self._subcommand, self._result)
+        LOGGER.debug("result: %s, resources: %s", self._result, self.resources)
+
+    def _check_result(self):
+        if self._timed_out:
+            error = CommandTimeoutError(
+                self.args, self._timeout, output=self._result.stdout
+            )
+            error.resources = self.resources
+            raise error
+        if self._check:
+            self._result.check_returncode()
+        return self._result
+
+
 def should_log_selinux_denials():
     def require_tool(tool):
         if not shutil.which(tool):
@@ -186,6 +1000,7 @@ def should_log_selinux_denials():
         stdout=subprocess.PIPE,
         stderr=subprocess.PIPE,
         text=True,
+        internal=True,
     )
     auditd_status = proc_systemctl.stdout.strip()
     if auditd_status not in ["running"]:
@@ -197,6 +1012,64 @@ def should_log_selinux_denials():
     return True
 
 
+def should_capture_journal(units):
+    if not units:
+        LOGGER.info("disabling journal capture because there are no units")
+        return False
+    if os.environ.get("PYTEST_CLIENT_TOOLS_DISABLE_JOURNAL", None):
+        LOGGER.info(
+            "disabling journal capture because the environment variable "
+            "PYTEST_CLIENT_TOOLS_DISABLE_JOURNAL is set"
+        )
+        return False
+    if not shutil.which("journalctl"):
+        LOGGER.info("disabling journal capture because 'journalctl' is not available")
+        return False
+    return True
+
+
+def journal_cursor():
+    """
+    Return the cursor of the last entry of the journal, or `None` if the
+    journal is empty.
+    """
+    # not using logged_run(), as this is not a command of the tests
+    args = ["journalctl", "--quiet", "--lines=1", "--output=json"]
+    LOGGER.debug("running %s", args)
+    proc = subprocess.run(
+        args,
+        check=True,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        universal_newlines=True,
+    )
+    for line in proc.stdout.splitlines():
+        return json.loads(line)["__CURSOR"]
+    return None
+
+
+def read_journal(units, cursor=None):
+    """
+    Return the entries of the journal for the specified units, after the
+    specified cursor, with a single query.
+    """
+    args = ["journalctl", "--quiet", "--no-pager", "--output=short-iso-precise"]
+    if cursor:
+        args.append(f"--after-cursor={cursor}")
+    for unit in units:
+        args.append(f"--unit={unit}")
+    # not using logged_run(), as this is not a command of the tests
+    LOGGER.debug("running %s", args)
+    proc = subprocess.run(
+        args,
+        check=True,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        universal_newlines=True,
+    )
+    return proc.stdout
+
+
 def redact_arguments(args, redact_list):
     REDACTED_MARK = "<redacted>"
     new_args = []
@@ -219,3 +1092,39 @@ def redact_arguments(args, redact_list):
             continue
         new_args.append(arg)
     return new_args
+
+
+def atomic_write_text(path, data):
+    """
+    Atomically replace the content of a text file.
+
+    The data is written to a temporary file in the same directory of `path`,
+    which is then renamed over `path`; this way, readers of the file never see
+    a partially written file. The permissions and the ownership of an existing
+    file are preserved.
+
+    :param path: The path of the file to write
+    :type path: str or pathlib.Path
+    :param data: The new content of the file
+    :type data: str
+    """
+    path = pathlib.Path(path)
+    fd, tmp_name = tempfile.mkstemp(dir=str(path.parent), prefix=f".{path.name}.")
+    try:
+        with os.fdopen(fd, "w") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        try:
+            st = os.stat(str(path))
+        except FileNotFoundError:
+            os.chmod(tmp_name, 0o644)
+        else:
+            os.chmod(tmp_name, st.st_mode & 0o7777)
+            with contextlib.suppress(PermissionError):
+                os.chown(tmp_name, st.st_uid, st.st_gid)
+        os.replace(tmp_name, str(path))
+    except BaseException:
+        with contextlib.suppress(FileNotFoundError):
+            os.unlink(tmp_name)
+        raise
@@ -2,8 +2,61 @@
 # SPDX-License-Identifier: MIT
 
 
+import http.server
 import os
+import pathlib
+import socketserver
+import threading
+
+import pytest
 
 os.environ["PYTEST_CLIENT_TOOLS_DISABLE_SELINUX"] = "1"
 
 pytest_plugins = "pytester"
+
+
+@pytest.fixture
+def run_with_plugin(pytester, monkeypatch):
+    """
+    Run pytest with the plugin in a subprocess, so it does not interfere
+    with the current session.
+    """
+    root = pathlib.Path(__file__).parent.parent
+    monkeypatch.setenv(
+        "PYTHONPATH", os.pathsep.join([str(root), os.environ.get("PYTHONPATH", "")])
+    )
+
+    def run(*args):
+        # block the plugin if installed, and load it explicitly
+        return pytester.runpytest_subprocess(
+            "-p", "no:client-tools", "-p", "pytest_client_tools.plugin", *args
+        )
+
+    yield run
+
+
+class _ThreadingHTTPServer(socketserver.ThreadingMixIn, http.server.HTTPServer):
+    daemon_threads = True
+
+
+@pytest.fixture
+def http_server():
+    """
+    Start local HTTP servers in threads, using the specified handler class.
+    """
+    servers = []
+
+    def start(handler_class):
+        httpd = _ThreadingHTTPServer(("127.0.0.1", 0), handler_class)
+        httpd.url = f"http://127.0.0.1:{httpd.server_address[1]}"
+        thread = threading.Thread(
+            target=httpd.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True
+        )
+        thread.start()
+        servers.append(httpd)
+        return httpd
+
+    yield start
+    for httpd in servers:
+        httpd.shutdown()
+        httpd.server_close()
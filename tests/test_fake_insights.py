@@ -0,0 +1,159 @@
+# SPDX-FileCopyrightText: Red Hat
+# SPDX-License-Identifier: MIT
+
+
+import json
+import zipfile
+
+import pytest
+import requests
+
+from pytest_client_tools import fake_insights
+from pytest_client_tools.fake_insights import EggMirror, FakeInsightsServer
+from pytest_client_tools.httpserver import generate_certificate
+from pytest_client_tools.insights_client import InsightsClientConfig
+from pytest_client_tools.inventory import Inventory
+
+
+@pytest.fixture
+def server(tmp_path):
+    certfile, keyfile = generate_certificate(tmp_path)
+    server = FakeInsightsServer(tmp_path / "uploads", certfile, keyfile)
+    server.start()
+    yield server
+    server.stop()
+
+
+def _upload(server, data, facts):
+    return requests.post(
+        server.upload_url,
+        files={
+            "file": (
+                "/var/tmp/insights-test.tar.gz",
+                data,
+                "application/vnd.redhat.advisor.collection+tgz",
+            ),
+            "metadata": json.dumps(facts),
+        },
+        verify=str(server.certfile),
+    )
+
+
+def test_upload(server):
+    data = bytes(range(256)) * 100
+    facts = {"insights_id": "machine-1", "fqdn": "test.example.com"}
+    res = _upload(server, data, facts)
+    assert res.status_code == 202
+    (upload,) = server.uploads
+    assert res.json()["request_id"] == upload.request_id
+    assert upload.read() == data
+    assert upload.filename == "/var/tmp/insights-test.tar.gz"
+    assert upload.path.parent == server.directory
+    assert upload.content_type == "application/vnd.redhat.advisor.collection+tgz"
+    assert upload.metadata == facts
+    # the system is now in Inventory
+    inventory = Inventory(
+        server.url + server.prefix, verify=str(server.certfile), cert=None
+    )
+    hosts = inventory.get("hosts", params={"insights_id": "machine-1"}).json()
+    assert [h["id"] for h in hosts["results"]] == [upload.host_id]
+    assert hosts["results"][0]["fqdn"] == "test.example.com"
+    # uploading again does not add another host
+    _upload(server, b"second", facts)
+    assert len(server.uploads) == 2
+    assert len(server.store.hosts) == 1
+    res = requests.post(
+        server.url + "/inventory/v1/hosts/checkin",
+        json={"insights_id": "machine-1"},
+        verify=str(server.certfile),
+    )
+    assert res.status_code == 201
+    server.clear()
+    assert server.uploads == []
+    assert server.store.hosts == []
+    assert not server.directory.exists()
+
+
+def test_upload_invalid(server):
+    res = requests.post(server.upload_url, data=b"archive", verify=str(server.certfile))
+    assert res.status_code == 415
+    assert server.uploads == []
+
+
+def test_configure(server, tmp_path):
+    path = tmp_path / "insights-client.conf"
+    path.write_text("[insights-client]\nauto_config=False\n")
+    config = InsightsClientConfig(path)
+    server.configure(config)
+    config.save()
+    config.reload(force=True)
+    assert config.base_url == f"127.0.0.1:{server.url.rsplit(':', 1)[1]}"
+    assert config.upload_url == server.upload_url
+    assert config.cert_verify == str(server.certfile)
+    assert config.legacy_upload is False
+
+
+def _make_egg(path, version):
+    with zipfile.ZipFile(path, "w") as z:
+        z.writestr("insights/VERSION", f"{version}\n")
+    path.with_name(path.name + ".asc").write_text(f"signature of {version}")
+    return path
+
+
+def test_egg_mirror(server, tmp_path, monkeypatch):
+    verify = str(server.certfile)
+    assert (
+        requests.get(server.url + fake_insights.EGG_PATH, verify=verify).status_code
+        == 404
+    )
+    old_egg = _make_egg(tmp_path / "old.egg", "3.4.10")
+    new_egg = _make_egg(tmp_path / "new.egg", "3.10.1")
+    monkeypatch.setattr(fake_insights, "_SYSTEM_EGGS", (str(new_egg),))
+    mirror = EggMirror(tmp_path / "mirror")
+    assert mirror.versions == []
+    assert mirror.add(old_egg, str(old_egg) + ".asc") == "3.4.10"
+    assert mirror.add_system_eggs() == ["3.10.1"]
+    # cached by version, so kept by a new mirror in the same directory
+    mirror = EggMirror(tmp_path / "mirror")
+    # other directories are ignored
+    (tmp_path / "mirror" / "lost+found").mkdir()
+    (tmp_path / "mirror" / "lost+found" / "insights-core.egg.asc").touch()
+    assert mirror.versions == ["3.4.10", "3.10.1"]
+    server.egg_mirror = mirror
+    res = requests.get(server.url + fake_insights.EGG_PATH, verify=verify)
+    assert res.content == new_egg.read_bytes()
+    res = requests.get(
+        server.url + fake_insights.EGG_PATH,
+        headers={"If-None-Match": res.headers["ETag"]},
+        verify=verify,
+    )
+    assert res.status_code == 304
+    mirror.select("3.4.10")
+    res = requests.get(server.url + "/module-update-router/v1/channel", verify=verify)
+    url = server.url + res.json()["url"] + "/insights-core.egg"
+    assert requests.get(url, verify=verify).content == old_egg.read_bytes()
+    res = requests.get(url + ".asc", verify=verify)
+    assert res.text == "signature of 3.4.10"
+    with pytest.raises(ValueError):
+        mirror.select("1.0")
+
+
+@pytest.mark.parametrize("version", ["", "../3.4.5", "latest"])
+def test_egg_mirror_invalid_version(version, tmp_path):
+    egg = _make_egg(tmp_path / "invalid.egg", version)
+    mirror = EggMirror(tmp_path / "mirror")
+    with pytest.raises(ValueError):
+        mirror.add(egg, str(egg) + ".asc")
+    assert not (tmp_path / "mirror").exists()
+
+
+def test_egg_mirror_without_cache(pytester, run_with_plugin):
+    pytester.makepyfile(
+        """
+        def test_mirror(_egg_mirror, tmp_path_factory):
+            basetemp = tmp_path_factory.getbasetemp()
+            assert basetemp in _egg_mirror.directory.parents
+        """
+    )
+    result = run_with_plugin("-p", "no:cacheprovider")
+    result.assert_outcomes(passed=1)
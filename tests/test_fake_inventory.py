@@ -0,0 +1,82 @@
+# SPDX-FileCopyrightText: Red Hat
+# SPDX-License-Identifier: MIT
+
+
+import pytest
+import requests
+
+from pytest_client_tools.fake_inventory import FakeInventoryServer
+from pytest_client_tools.inventory import Inventory
+
+
+class _FakeInsightsClient:
+    uuid = "machine-1"
+
+
+@pytest.fixture
+def server():
+    server = FakeInventoryServer()
+    server.start()
+    yield server
+    server.stop()
+
+
+@pytest.fixture
+def inventory(server):
+    inventory = Inventory(server.url + server.prefix, cert=None)
+    inventory._insights_client = _FakeInsightsClient()
+    return inventory
+
+
+def test_this_system(server, inventory):
+    host = server.store.add_host(
+        insights_id="machine-1",
+        display_name="test",
+        system_profile={"arch": "x86_64", "os_release": "9.4"},
+        tags=[{"namespace": "ns", "key": "k", "value": "v"}],
+    )
+    server.store.add_host(insights_id="machine-2")
+    assert inventory.this_system()["id"] == host["id"]
+    assert inventory.this_system_profile(fields=["arch"]) == {"arch": "x86_64"}
+    assert inventory.this_system_tags() == [
+        {"namespace": "ns", "key": "k", "value": "v"}
+    ]
+    server.store.update_host(host["id"], system_profile={"os_release": "9.5"})
+    profile = inventory.wait_for_profile(
+        lambda profile: profile["os_release"] == "9.5", timeout=5
+    )
+    assert profile["arch"] == "x86_64"
+
+
+def test_list_and_delete(server, inventory):
+    for i in range(15):
+        tags = [{"namespace": "ns", "key": "even", "value": str(i % 2 == 0)}]
+        server.store.add_host(display_name=f"Test-{i}", tags=tags)
+    server.store.add_host(display_name="other")
+    hosts = list(inventory.iter_hosts({"display_name": "test-"}, page_size=4))
+    assert len(hosts) == 15
+    res = inventory.get("hosts", params={"tags": "ns/even=True"})
+    assert res.json()["total"] == 8
+    deleted = inventory.bulk_delete([h["id"] for h in hosts])
+    assert len(deleted) == 15
+    assert [h["display_name"] for h in server.store.hosts] == ["other"]
+    with pytest.raises(requests.HTTPError) as excinfo:
+        inventory.get(f"hosts/{hosts[0]['id']}/tags")
+    assert excinfo.value.response.status_code == 404
+
+
+def test_fake_inventory_fixture(pytester, run_with_plugin):
+    pytester.makepyfile(
+        """
+        def test_seed(fake_inventory, fake_inventory_server):
+            fake_inventory_server.store.add_host(display_name="test")
+            res = fake_inventory.get("hosts")
+            assert res.json()["results"][0]["display_name"] == "test"
+
+
+        def test_isolated(fake_inventory):
+            assert fake_inventory.get("hosts").json()["total"] == 0
+        """
+    )
+    result = run_with_plugin()
+    result.assert_outcomes(passed=2)
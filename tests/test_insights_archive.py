@@ -0,0 +1,145 @@
+# SPDX-FileCopyrightText: Red Hat
+# SPDX-License-Identifier: MIT
+
+
+import gzip
+import io
+import json
+import tarfile
+import tempfile
+import time
+
+import pytest
+
+from pytest_client_tools import insights_archive
+from pytest_client_tools.insights_archive import InsightsArchive
+
+
+_TOP = "insights-host-20240101000000"
+
+
+def _make_archive(path, files, links=(), top=_TOP, mode="w:gz"):
+    with tarfile.open(path, mode) as tar:
+        if top:
+            info = tarfile.TarInfo(top)
+            info.type = tarfile.DIRTYPE
+            tar.addfile(info)
+        prefix = f"{top}/" if top else ""
+        for name, data in files.items():
+            info = tarfile.TarInfo(prefix + name)
+            info.size = len(data)
+            tar.addfile(info, io.BytesIO(data))
+        for name, target in links:
+            info = tarfile.TarInfo(prefix + name)
+            info.type = tarfile.SYMTYPE
+            info.linkname = target
+            tar.addfile(info)
+    return path
+
+
+def test_read(tmp_path):
+    spec = {"name": "hostname", "results": {"object": {"relative_path": "x"}}}
+    spec_name = "meta_data/insights.specs.Specs.hostname.json"
+    path = _make_archive(
+        tmp_path / "archive.tar.gz",
+        {
+            "data/etc/hostname": b"test.example.com\n",
+            "data/etc/hosts": b"127.0.0.1 localhost\n",
+            "data/etc/binary": bytes(range(256)),
+            spec_name: json.dumps(spec).encode(),
+        },
+        links=[("data/etc/hostname.link", "hostname")],
+    )
+    with InsightsArchive(path) as archive:
+        assert "data/etc/hostname" in archive
+        assert len(archive.names) == 5
+        assert archive.read("data/etc/hostname") == "test.example.com\n"
+        assert archive.read("data/etc/hostname.link") == "test.example.com\n"
+        assert archive.read("data/etc/binary", text=False) == bytes(range(256))
+        assert archive.json(spec_name) == spec
+        assert archive.glob("data/etc/host*") == [
+            "data/etc/hostname",
+            "data/etc/hostname.link",
+            "data/etc/hosts",
+        ]
+        assert archive.glob("*.json") == [spec_name]
+        with pytest.raises(KeyError):
+            archive.read("data/etc/missing")
+
+
+def test_read_without_top_directory(tmp_path):
+    path = _make_archive(
+        tmp_path / "archive.tar",
+        {"data/a": b"a", "meta_data/b": b"b"},
+        top=None,
+        mode="w",
+    )
+    archive = InsightsArchive(path)
+    assert archive.names == ["data/a", "meta_data/b"]
+    assert archive.read("meta_data/b") == "b"
+
+
+@pytest.mark.parametrize("mode", ["w", "w:gz", "w:bz2", "w:xz"])
+def test_read_any_order(tmp_path, mode):
+    files = {f"data/{i}": str(i).encode() * 1000 for i in range(10)}
+    path = _make_archive(tmp_path / "archive", files, mode=mode)
+    archive = InsightsArchive(path, cache_size=0)
+    for name in reversed(list(files)):
+        assert archive.read(name, text=False) == files[name]
+    archive.close()
+    # opened again when needed
+    assert archive.read("data/0", text=False) == files["data/0"]
+    archive.close()
+
+
+def test_cache_eviction(tmp_path):
+    files = {f"data/{i}": bytes([i]) * 100 for i in range(10)}
+    path = _make_archive(tmp_path / "archive.tar.gz", files)
+    archive = InsightsArchive(path, cache_size=250)
+    for name, data in files.items():
+        assert archive.read(name, text=False) == data
+    # only the last two files are cached
+    assert list(archive._cache) == ["data/8", "data/9"]
+    archive.read("data/8")
+    archive.read("data/0")
+    assert list(archive._cache) == ["data/8", "data/0"]
+
+
+def test_many_files(tmp_path):
+    files = {f"data/dir{i % 100}/file{i}": b"x" * 50 for i in range(20000)}
+    path = _make_archive(tmp_path / "archive.tar.gz", files)
+    start = time.monotonic()
+    archive = InsightsArchive(path)
+    assert len(archive.glob("data/dir7/*")) == 200
+    assert archive.read("data/dir99/file19999") == "x" * 50
+    assert time.monotonic() - start < 5
+
+
+def test_corrupted_archive(tmp_path, monkeypatch):
+    # a member with a long name, whose actual header is corrupted: the
+    # error shows up only while reading the members
+    path = _make_archive(
+        tmp_path / "archive.tar",
+        {"data/uname": b"Linux\n", "data/" + "x" * 200: b"long\n"},
+        mode="w",
+    )
+    data = bytearray(path.read_bytes())
+    # after the top directory, the file with its data, and the extended
+    # header (GNU or pax) of the long name with its data
+    checksum = 512 * 5 + 148
+    for i, c in enumerate(b"garbage!"):
+        data[checksum + i] = c
+    path = tmp_path / "archive.tar.gz"
+    path.write_bytes(gzip.compress(bytes(data)))
+    copies = []
+    original = tempfile.TemporaryFile
+
+    def temporary_file():
+        copies.append(original())
+        return copies[-1]
+
+    monkeypatch.setattr(insights_archive.tempfile, "TemporaryFile", temporary_file)
+    with pytest.raises(tarfile.ReadError):
+        InsightsArchive(path)
+    assert len(copies) == 1
+    assert copies[0].closed
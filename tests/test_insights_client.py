@@ -2,9 +2,17 @@
 # SPDX-License-Identifier: MIT
 
 
+import os
+import uuid
+
 import pytest
 
-from pytest_client_tools.insights_client import InsightsClientConfig
+from pytest_client_tools import insights_client
+from pytest_client_tools.insights_client import (
+    InsightsClient,
+    InsightsClientConfig,
+    InsightsCollectionCache,
+)
 
 
 def test_config_not_existing(tmp_path):
@@ -144,3 +152,190 @@ def test_config_cert_verify_write(key_value, tmp_path):
     conf.save()
     conf_file_text = conf_file.read_text()
     assert f"cert_verify={key_value}" in conf_file_text
+
+
+def test_config_save_unchanged(tmp_path):
+    conf_file = tmp_path / "file.conf"
+    conf_file.write_text(
+        """[insights-client]
+# a comment that is lost when saving
+cmd_timeout=120
+"""
+    )
+    conf = InsightsClientConfig(conf_file)
+    # setting the same value does not mark the configuration as changed
+    conf.cmd_timeout = 120
+    conf.save()
+    assert "# a comment" in conf_file.read_text()
+    conf.cmd_timeout = 60
+    conf.save()
+    conf_file_text = conf_file.read_text()
+    assert "# a comment" not in conf_file_text
+    assert "cmd_timeout=60" in conf_file_text
+    # no leftover temporary files
+    assert list(tmp_path.iterdir()) == [conf_file]
+
+
+def test_config_save_keeps_mode(tmp_path):
+    conf_file = tmp_path / "file.conf"
+    conf_file.write_text("[insights-client]\n")
+    conf_file.chmod(0o600)
+    conf = InsightsClientConfig(conf_file)
+    conf.loglevel = "DEBUG"
+    conf.save()
+    assert conf_file.stat().st_mode & 0o777 == 0o600
+
+
+def test_config_reload_unchanged(tmp_path):
+    conf_file = tmp_path / "file.conf"
+    conf_file.write_text(
+        """[insights-client]
+auto_config=True
+"""
+    )
+    conf = InsightsClientConfig(conf_file)
+    parsed = conf._config
+    conf.reload()
+    assert conf._config is parsed
+    # pending changes are discarded even if the file is unchanged
+    conf.auto_config = False
+    conf.reload()
+    assert conf._config is not parsed
+    assert conf.auto_config
+    parsed = conf._config
+    conf.reload(force=True)
+    assert conf._config is not parsed
+
+
+_FAKE_INSIGHTS_CLIENT = """#!/bin/sh
+echo "$1" >> {calls}
+case "$1" in
+--status)
+    if [ -e {machine_id} ]; then
+        echo "This host is registered"
+    else
+        echo "This host is unregistered"
+        exit 1
+    fi
+    ;;
+--register)
+    echo {uuid} > {machine_id}
+    ;;
+--unregister)
+    rm {machine_id}
+    ;;
+esac
+"""
+
+
+def test_registration_cached(monkeypatch, tmp_path):
+    machine_id = tmp_path / "machine-id"
+    calls = tmp_path / "calls"
+    system_uuid = uuid.uuid4()
+    bindir = tmp_path / "bin"
+    bindir.mkdir()
+    tool = bindir / "insights-client"
+    tool.write_text(
+        _FAKE_INSIGHTS_CLIENT.format(
+            calls=calls, machine_id=machine_id, uuid=system_uuid
+        )
+    )
+    tool.chmod(0o755)
+    monkeypatch.setenv("PATH", str(bindir), prepend=os.pathsep)
+    monkeypatch.setattr(insights_client, "_REGISTRATION_FILES", [str(machine_id)])
+    monkeypatch.setattr(insights_client, "InsightsClientConfig", lambda: None)
+
+    def status_calls():
+        return calls.read_text().split().count("--status")
+
+    client = InsightsClient()
+    assert not client.is_registered
+    assert not client.is_registered
+    assert status_calls() == 1
+    client.register()
+    assert client.is_registered
+    assert client.is_registered
+    assert status_calls() == 2
+    client.run("--version")
+    assert client.is_registered
+    assert status_calls() == 2
+    # changed outside of this object
+    machine_id.unlink()
+    assert not client.is_registered
+    assert status_calls() == 3
+
+
+@pytest.fixture
+def fake_collect(monkeypatch, tmp_path):
+    source = tmp_path / "source"
+    (source / "insights-host" / "data").mkdir(parents=True)
+    (source / "insights-host" / "data" / "uname").write_text("Linux\n")
+    calls = tmp_path / "calls"
+    bindir = tmp_path / "bin"
+    bindir.mkdir()
+    tool = bindir / "insights-client"
+    tool.write_text(
+        f"""#!/bin/sh
+[ "$1" = "--offline" ] || exit 1
+echo "$@" >> {calls}
+output="${{2#--output-file=}}"
+case "$output" in
+*.tar.gz) ;;
+*) output="$output.tar.gz" ;;
+esac
+tar czf "$output" -C {source} insights-host
+"""
+    )
+    tool.chmod(0o755)
+    monkeypatch.setenv("PATH", str(bindir), prepend=os.pathsep)
+    return calls
+
+
+def test_collect(fake_collect, monkeypatch, tmp_path):
+    monkeypatch.setattr(insights_client, "InsightsClientConfig", lambda: None)
+    archive = InsightsClient().collect(path=tmp_path / "archive.tar.gz")
+    assert archive.path == tmp_path / "archive.tar.gz"
+    assert archive.read("data/uname") == "Linux\n"
+    archive.close()
+    # the extension is appended by insights-client
+    archive = InsightsClient().collect(path=tmp_path / "other")
+    assert archive.path == tmp_path / "other.tar.gz"
+    assert archive.read("data/uname") == "Linux\n"
+    archive.close()
+
+
+def test_collection_cache(fake_collect, monkeypatch, tmp_path):
+    conf_file = tmp_path / "insights-client.conf"
+    conf_file.write_text("[insights-client]\n")
+    tags_file = tmp_path / "tags.yaml"
+    tags_file.write_text("env: test\n")
+    monkeypatch.setattr(
+        insights_client,
+        "InsightsClientConfig",
+        lambda: InsightsClientConfig(conf_file),
+    )
+    monkeypatch.setattr(
+        insights_client, "_COLLECTION_FILES", {"tags_file": str(tags_file)}
+    )
+    cache = InsightsCollectionCache(tmp_path / "cache")
+
+    def collections():
+        return len(fake_collect.read_text().splitlines())
+
+    archive = cache.get(InsightsClient())
+    assert archive.read("data/uname") == "Linux\n"
+    assert cache.get(InsightsClient()) is archive
+    assert collections() == 1
+    # changed referenced file
+    tags_file.write_text("env: prod\n")
+    other = cache.get(InsightsClient())
+    assert other is not archive
+    assert collections() == 2
+    # changed configuration
+    client = InsightsClient()
+    client.config.obfuscate = True
+    assert cache.get(client) not in (archive, other)
+    assert collections() == 3
+    assert cache.get(client, "--no-upload") is not cache.get(client)
+    assert collections() == 4
+    cache.close()
@@ -0,0 +1,254 @@
+# SPDX-FileCopyrightText: Red Hat
+# SPDX-License-Identifier: MIT
+
+
+import http.server
+import base64
+import json
+import logging
+import threading
+import time
+import urllib.parse
+
+import pytest
+
+from pytest_client_tools.inventory import Inventory, InventoryTimeoutError
+from pytest_client_tools.logger import LOGGER
+
+
+_PROFILE = {"arch": "x86_64", "os_release": "9.4", "installed_packages": ["a", "b"]}
+
+
+class _Handler(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        url = urllib.parse.urlsplit(self.path)
+        query = urllib.parse.parse_qs(url.query)
+        self.server.requests.append(self.path)
+        self.server.authorizations.append(self.headers.get("Authorization"))
+        parts = url.path.strip("/").split("/")
+        if parts == ["hosts"] and "insights_id" not in query:
+            prefix = query.get("display_name", [""])[0]
+            hosts = [
+                h for h in self.server.hosts if h["display_name"].startswith(prefix)
+            ]
+            per_page = int(query["per_page"][0])
+            start = (int(query["page"][0]) - 1) * per_page
+            data = {"total": len(hosts), "results": hosts[start:][:per_page]}
+        elif parts == ["hosts"]:
+            insights_id = query["insights_id"][0]
+            host_id = f"host-{insights_id}"
+            if self.server.hidden_searches > 0:
+                # not propagated yet
+                self.server.hidden_searches -= 1
+                data = {"total": 0, "results": []}
+            else:
+                data = {"total": 1, "results": [{"id": host_id}]}
+        else:
+            time.sleep(self.server.delay)
+            host_id = parts[1]
+            if len(parts) == 2:
+                data = {"total": 1, "results": [{"id": host_id}]}
+            elif parts[2] == "system_profile":
+                profile = _PROFILE
+                fields = query.get("fields[system_profile]")
+                if fields:
+                    keys = fields[0].split(",")
+                    profile = {k: v for k, v in profile.items() if k in keys}
+                data = {
+                    "total": 1,
+                    "results": [{"id": host_id, "system_profile": profile}],
+                }
+            else:
+                data = {"total": 1, "results": {host_id: [{"key": "k"}]}}
+        body = json.dumps(data).encode()
+        etag = f'"{hash(body)}"'
+        if self.headers.get("If-None-Match") == etag:
+            self.server.not_modified += 1
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("ETag", etag)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_DELETE(self):
+        self.server.requests.append(self.path)
+        host_id = self.path.rsplit("/", 1)[1]
+        with self.server.lock:
+            hosts = [h for h in self.server.hosts if h["id"] != host_id]
+            status = 200 if len(hosts) < len(self.server.hosts) else 404
+            self.server.hosts = hosts
+            self.server.active += 1
+            self.server.max_active = max(self.server.max_active, self.server.active)
+        time.sleep(self.server.delay)
+        with self.server.lock:
+            self.server.active -= 1
+        self.send_response(status)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+
+class _FakeInsightsClient:
+    uuid = "1"
+
+
+@pytest.fixture
+def server(http_server):
+    httpd = http_server(_Handler)
+    httpd.requests = []
+    httpd.authorizations = []
+    httpd.lock = threading.Lock()
+    httpd.active = 0
+    httpd.max_active = 0
+    httpd.delay = 0
+    httpd.hidden_searches = 0
+    httpd.not_modified = 0
+    httpd.hosts = []
+    return httpd
+
+
+@pytest.fixture
+def inventory(server):
+    inventory = Inventory(server.url, cert=None)
+    inventory._insights_client = _FakeInsightsClient()
+    return inventory
+
+
+def _searches(server):
+    return [r for r in server.requests if r.startswith("/hosts?")]
+
+
+def test_host_id_cached(server, inventory):
+    assert inventory.this_system_profile() == _PROFILE
+    assert inventory.this_system_tags() == [{"key": "k"}]
+    assert inventory.this_system_profile(fields=["arch"]) == {"arch": "x86_64"}
+    assert _searches(server) == ["/hosts?insights_id=1"]
+    # registered again
+    inventory._insights_client.uuid = "2"
+    inventory.this_system_tags()
+    assert _searches(server) == ["/hosts?insights_id=1", "/hosts?insights_id=2"]
+
+
+def test_this_system_view(server, inventory):
+    view = inventory.this_system_view(fields=["arch", "os_release"])
+    assert view == {
+        "profile": {"arch": "x86_64", "os_release": "9.4"},
+        "tags": [{"key": "k"}],
+    }
+    server.delay = 0.3
+    start = time.monotonic()
+    view = inventory.this_system_view(include=("host", "profile", "tags"))
+    # concurrent, not sequential
+    assert time.monotonic() - start < 0.8
+    assert view["host"] == {"id": "host-1"}
+    assert view["profile"] == _PROFILE
+    assert len(_searches(server)) == 1
+    with pytest.raises(ValueError):
+        inventory.this_system_view(include=("groups",))
+
+
+def test_wait_for_system(server, inventory):
+    server.hidden_searches = 3
+    host = inventory.wait_for_system(initial_delay=0.01, max_delay=0.02, timeout=5)
+    assert host == {"id": "host-1"}
+    assert len(_searches(server)) == 4
+    # the empty results were not transferred again
+    assert server.not_modified == 2
+    assert inventory.last_wait_latency > 0
+    calls = []
+
+    def predicate(host):
+        calls.append(host)
+        return len(calls) == 3
+
+    inventory.wait_for_system(predicate, initial_delay=0.01, timeout=5)
+    assert len(calls) == 3
+
+
+def test_wait_for_system_timeout(server, inventory):
+    server.hidden_searches = 1000
+    start = time.monotonic()
+    with pytest.raises(InventoryTimeoutError):
+        inventory.wait_for_system(initial_delay=0.01, max_delay=0.05, timeout=0.3)
+    assert time.monotonic() - start < 1
+
+
+def test_wait_for_profile(server, inventory):
+    server.hidden_searches = 1
+    profile = inventory.wait_for_profile(
+        lambda profile: profile["arch"] == "x86_64",
+        fields=["arch"],
+        initial_delay=0.01,
+        timeout=5,
+    )
+    assert profile == {"arch": "x86_64"}
+    assert len(_searches(server)) == 2
+
+
+def test_iter_hosts(server, inventory):
+    server.hosts = [{"id": str(i), "display_name": f"test-{i}"} for i in range(25)]
+    server.hosts.append({"id": "other", "display_name": "other"})
+    hosts = list(inventory.iter_hosts({"display_name": "test-"}, page_size=10))
+    assert [h["id"] for h in hosts] == [str(i) for i in range(25)]
+    assert len([r for r in server.requests if "page=" in r]) == 3
+    # stopping early
+    iterator = inventory.iter_hosts(page_size=10)
+    assert next(iterator)["id"] == "0"
+    iterator.close()
+
+
+def test_bulk_delete(server, inventory):
+    server.hosts = [{"id": str(i), "display_name": f"test-{i}"} for i in range(20)]
+    server.delay = 0.1
+    deleted = inventory.bulk_delete([str(i) for i in range(20)] + ["missing"])
+    # concurrent deletions, at most 10 at the same time
+    assert 1 < server.max_active <= 10
+    assert deleted == [str(i) for i in range(20)]
+    assert server.hosts == []
+
+
+def test_bulk_delete_concurrency(server, inventory):
+    server.hosts = [{"id": str(i), "display_name": f"test-{i}"} for i in range(20)]
+    server.delay = 0.3
+    inventory.bulk_delete([str(i) for i in range(20)], concurrency=20)
+    # more than the default limit of deletions at the same time
+    assert server.max_active > 10
+    assert server.hosts == []
+
+
+def test_bulk_delete_seen_hosts(server, inventory):
+    host_id = inventory.this_system()["id"]
+    server.hosts = [{"id": host_id, "display_name": "test"}]
+    assert inventory.bulk_delete(inventory.seen_host_ids) == [host_id]
+    assert inventory.seen_host_ids == set()
+
+
+def test_find_host_ids(server, inventory):
+    assert inventory.find_host_ids(["1", "2"]) == ["host-1", "host-2"]
+    assert sorted(_searches(server)) == [
+        "/hosts?insights_id=1",
+        "/hosts?insights_id=2",
+    ]
+    server.hidden_searches = 1
+    assert inventory.find_host_ids(["3"]) == []
+
+
+def test_auth(server, caplog):
+    caplog.set_level(logging.DEBUG, logger=LOGGER.name)
+    inventory = Inventory(server.url, cert=None, auth=("user", "secret"))
+    inventory.find_host_ids(["1"])
+    expected = base64.b64encode(b"user:secret").decode()
+    assert server.authorizations == [f"Basic {expected}"]
+    # the credentials are not logged
+    assert "requesting GET" in caplog.text
+    assert "secret" not in caplog.text
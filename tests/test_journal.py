@@ -0,0 +1,95 @@
+# SPDX-FileCopyrightText: Red Hat
+# SPDX-License-Identifier: MIT
+
+
+import os
+
+_FAKE_JOURNALCTL = """#!/bin/sh
+echo "$@" >> {calls}
+case "$*" in
+*--after-cursor=cursor-1*)
+    echo "2024-01-01T00:00:00.000000+0000 host rhsmcertd[1]: started"
+    ;;
+*--lines=1*)
+    echo '{{"__CURSOR": "cursor-1", "MESSAGE": "last"}}'
+    ;;
+esac
+"""
+
+
+def test_journal_capture(pytester, run_with_plugin, monkeypatch, tmp_path):
+    calls = tmp_path / "calls"
+    bindir = tmp_path / "bin"
+    bindir.mkdir()
+    tool = bindir / "journalctl"
+    tool.write_text(_FAKE_JOURNALCTL.format(calls=calls))
+    tool.chmod(0o755)
+    pytester.makeini(
+        """
+        [pytest]
+        client_tools_journal_units =
+            rhsmcertd.service
+            rhcd.service
+        """
+    )
+    pytester.makeconftest(
+        """
+        import pytest
+
+
+        @pytest.fixture
+        def subman_session():
+            return None
+        """
+    )
+    pytester.makepyfile(
+        """
+        def test_one(subman_session):
+            pass
+
+
+        def test_two(subman_session):
+            pass
+
+
+        def test_unrelated():
+            pass
+        """
+    )
+    monkeypatch.setenv("PATH", str(bindir), prepend=os.pathsep)
+    result = run_with_plugin()
+    result.assert_outcomes(passed=3)
+    lines = calls.read_text().splitlines()
+    # one query for the cursor, and one for the entries of all the units,
+    # only for the tests using the fixtures of the client tools
+    assert len(lines) == 4
+    assert lines[1] == (
+        "--quiet --no-pager --output=short-iso-precise --after-cursor=cursor-1 "
+        "--unit=rhsmcertd.service --unit=rhcd.service"
+    )
+    journals = sorted(pytester.path.glob("**/journal.log"))
+    assert len(journals) == 2
+    assert "rhsmcertd[1]: started" in journals[0].read_text()
+
+
+def test_no_journal_for_unrelated_tests(
+    pytester, run_with_plugin, monkeypatch, tmp_path
+):
+    calls = tmp_path / "calls"
+    bindir = tmp_path / "bin"
+    bindir.mkdir()
+    tool = bindir / "journalctl"
+    tool.write_text(_FAKE_JOURNALCTL.format(calls=calls))
+    tool.chmod(0o755)
+    pytester.makepyfile(
+        """
+        def test_one():
+            pass
+        """
+    )
+    monkeypatch.setenv("PATH", str(bindir), prepend=os.pathsep)
+    result = run_with_plugin()
+    result.assert_outcomes(passed=1)
+    assert not calls.exists()
+    assert "client tools usage" not in result.stdout.str()
+    assert not (pytester.path / "artifacts").exists()
@@ -0,0 +1,111 @@
+# SPDX-FileCopyrightText: Red Hat
+# SPDX-License-Identifier: MIT
+
+
+import json
+import types
+
+import pytest
+
+from pytest_client_tools.perf import (
+    PerfBaselines,
+    PerfBudget,
+    PerfBudgetExceededError,
+    PerfStats,
+)
+from pytest_client_tools.util import ProcessResources
+
+
+def fake_run(wall_times):
+    wall_times = iter(wall_times)
+
+    def run():
+        wall_time = next(wall_times)
+        return types.SimpleNamespace(
+            resources=ProcessResources(wall_time, wall_time / 2, 0.0, 1000)
+        )
+
+    return run
+
+
+def test_stats_from_resources():
+    stats = PerfStats.from_resources(
+        [ProcessResources(float(i), 1.0, 1.0, 100 * i) for i in range(1, 21)]
+    )
+    assert stats.samples == 20
+    assert stats.wall_median == 10.5
+    assert stats.wall_p95 == 19.0
+    assert stats.cpu_median == 2.0
+    assert stats.cpu_p95 == 2.0
+    assert stats.rss_median == 1050
+    assert stats.rss_p95 == 1900
+
+
+def test_budget_baseline(tmp_path):
+    path = tmp_path / "baselines.json"
+    baselines = PerfBaselines(path)
+    budget = PerfBudget(baselines, "test", repeat=3)
+    # no baseline yet: stored
+    stats = budget.measure("cmd", fake_run([1.0, 2.0, 3.0]))
+    assert stats.wall_median == 2.0
+    assert baselines.get("test::cmd") == stats
+    baselines.save()
+    assert json.loads(path.read_text())["test::cmd"]["wall_median"] == 2.0
+    # within the tolerance
+    budget = PerfBudget(PerfBaselines(path), "test", repeat=3)
+    budget.measure("cmd", fake_run([1.0, 2.2, 3.3]))
+    # exceeding the tolerance
+    with pytest.raises(PerfBudgetExceededError, match="wall_median=3.000"):
+        budget.measure("cmd", fake_run([3.0, 3.0, 3.0]))
+    budget.measure("cmd", fake_run([3.0, 3.0, 3.0]), tolerance=0.5)
+
+
+def test_budget_update(tmp_path):
+    path = tmp_path / "baselines.json"
+    baselines = PerfBaselines(path)
+    PerfBudget(baselines, "test", repeat=1).measure("cmd", fake_run([1.0]))
+    baselines.save()
+    baselines = PerfBaselines(path)
+    budget = PerfBudget(baselines, "test", repeat=1, update=True)
+    budget.measure("cmd", fake_run([5.0]))
+    # other processes may have saved their baselines meanwhile
+    other = PerfBaselines(path)
+    PerfBudget(other, "other", repeat=1).measure("cmd", fake_run([1.0]))
+    other.save()
+    baselines.save()
+    doc = json.loads(path.read_text())
+    assert doc["test::cmd"]["wall_median"] == 5.0
+    assert doc["other::cmd"]["wall_median"] == 1.0
+
+
+def test_perf_budget_fixture(pytester, run_with_plugin):
+    pytester.makepyfile(
+        """
+        import sys
+
+        import pytest
+
+        from pytest_client_tools.util import logged_run
+
+
+        @pytest.mark.perf(repeat=3)
+        def test_perf(perf_budget, request):
+            assert request.node.get_closest_marker("perf")
+            stats = perf_budget.measure(
+                "python", logged_run, [sys.executable, "-c", "pass"]
+            )
+            assert stats.samples == 3
+
+
+        def test_perf_marker(perf_budget, request):
+            assert request.node.get_closest_marker("perf")
+        """
+    )
+    result = run_with_plugin("--strict-markers")
+    result.assert_outcomes(passed=2)
+    baselines_file = pytester.path / "client-tools-perf-baselines.json"
+    baselines = json.loads(baselines_file.read_text())
+    assert list(baselines) == ["test_perf_budget_fixture.py::test_perf::python"]
+    result = run_with_plugin("--client-tools-perf-tolerance=-1")
+    result.assert_outcomes(passed=1, failed=1)
+    result.stdout.fnmatch_lines(["*PerfBudgetExceededError*"])
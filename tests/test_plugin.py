@@ -0,0 +1,51 @@
+# SPDX-FileCopyrightText: Red Hat
+# SPDX-License-Identifier: MIT
+
+
+import pathlib
+import subprocess
+import sys
+
+import pytest
+
+
+# modules that must not be imported just by loading the plugin
+HEAVY_MODULES = ("asyncio", "dynaconf", "requests", "toml", "urllib3")
+# maximum cumulative time (in microseconds) for importing the plugin
+IMPORT_BUDGET_US = 100000
+
+
+@pytest.mark.skipif(
+    sys.version_info[:2] < (3, 7), reason="'-X importtime' requires Python 3.7"
+)
+def test_plugin_import_budget():
+    # import pytest first, so only the cost of the plugin itself is measured
+    proc = subprocess.run(
+        [
+            sys.executable,
+            "-X",
+            "importtime",
+            "-c",
+            "import pytest; import pytest_client_tools.plugin",
+        ],
+        check=True,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        universal_newlines=True,
+        cwd=str(pathlib.Path(__file__).parent.parent),
+    )
+    imported = {}
+    plugin_imports = False
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        _, cumulative, name = line.split("|")
+        name = name.strip()
+        if name == "pytest":
+            plugin_imports = True
+            continue
+        if plugin_imports:
+            imported[name] = int(cumulative)
+    heavy = sorted(n for n in imported if n.split(".")[0] in HEAVY_MODULES)
+    assert not heavy
+    assert imported["pytest_client_tools.plugin"] < IMPORT_BUDGET_US
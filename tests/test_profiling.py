@@ -0,0 +1,101 @@
+# SPDX-FileCopyrightText: Red Hat
+# SPDX-License-Identifier: MIT
+
+
+import logging
+import subprocess
+import sys
+
+import pytest
+
+from pytest_client_tools.logger import LOGGER
+from pytest_client_tools.profiling import ToolProfiler
+from pytest_client_tools.util import ArtifactsCollector, run_concurrently
+
+SCRIPT = "import json, sys; print('out'); print('err', file=sys.stderr)"
+
+
+@pytest.fixture
+def artifacts(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    artifacts = ArtifactsCollector(name="test")
+    monkeypatch.setattr(ArtifactsCollector, "current", artifacts)
+    yield tmp_path / "artifacts" / "test"
+
+
+@pytest.fixture
+def profiler():
+    profiler = ToolProfiler()
+    yield profiler
+    profiler.close()
+
+
+@pytest.mark.parametrize("text", [True, False])
+def test_profile_importtime(text, artifacts, profiler):
+    profiler.mode = "importtime"
+    profiler.top = 5
+    proc = profiler.run(
+        [sys.executable, "-c", SCRIPT],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        text=text,
+    )
+    # the import times are not part of the output of the command
+    if text:
+        assert proc.stderr == "err\n"
+    else:
+        assert proc.stderr == b"err\n"
+    files = list(artifacts.iterdir())
+    assert len(files) == 1
+    assert files[0].name.startswith("importtime-")
+    assert "| json\n" in files[0].read_text()
+    summaries = profiler.pop_summaries()
+    assert len(summaries) == 1
+    # header + top entries
+    assert len(summaries[0][1].splitlines()) == 6
+    assert not profiler.pop_summaries()
+
+
+def test_profile_cprofile(artifacts, profiler):
+    profiler.mode = "cprofile"
+    with pytest.raises(subprocess.CalledProcessError) as excinfo:
+        profiler.run(
+            [sys.executable, "-c", SCRIPT + "; sys.exit(1)"],
+            check=True,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            text=True,
+        )
+    assert excinfo.value.stderr == "err\n"
+    files = list(artifacts.iterdir())
+    assert len(files) == 1
+    assert files[0].name.startswith("profile-")
+    assert files[0].name.endswith(".prof")
+    summaries = profiler.pop_summaries()
+    assert len(summaries) == 1
+    assert "function calls" in summaries[0][1]
+
+
+def test_profile_environment_not_logged(artifacts, profiler, monkeypatch, caplog):
+    monkeypatch.setenv("CLIENT_TOOLS_TEST_PASSWORD", "secret-value")
+    caplog.set_level(logging.DEBUG, logger=LOGGER.name)
+    profiler.mode = "importtime"
+    profiler.run([sys.executable, "-c", "pass"], stderr=subprocess.PIPE, text=True)
+    assert "PYTHONPROFILEIMPORTTIME" in caplog.text
+    assert "secret-value" not in caplog.text
+
+
+def test_profile_async(artifacts, profiler):
+    profiler.mode = "importtime"
+    (proc,) = run_concurrently(
+        profiler.arun(
+            [sys.executable, "-c", SCRIPT],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            text=True,
+        )
+    )
+    assert proc.stderr == "err\n"
+    (artifact,) = artifacts.iterdir()
+    assert "| json\n" in artifact.read_text()
+    assert len(profiler.pop_summaries()) == 1
@@ -0,0 +1,117 @@
+# SPDX-FileCopyrightText: Red Hat
+# SPDX-License-Identifier: MIT
+
+
+import http.server
+import json
+import logging
+import threading
+import time
+
+import pytest
+import requests
+
+from pytest_client_tools.restclient import AsyncRestClient, RestClient
+from pytest_client_tools.util import run_concurrently
+
+
+class _Handler(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _reply(self):
+        length = int(self.headers.get("Content-Length", 0))
+        body = self.rfile.read(length) if length else b""
+        self.server.requests.append((self.command, self.path, dict(self.headers)))
+        with self.server.lock:
+            self.server.active += 1
+            self.server.max_active = max(self.server.max_active, self.server.active)
+        time.sleep(self.server.delay)
+        with self.server.lock:
+            self.server.active -= 1
+        status = self.server.statuses.pop(0) if self.server.statuses else 200
+        data = json.dumps({"path": self.path, "body": body.decode()}).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    do_GET = do_POST = do_DELETE = _reply
+
+
+@pytest.fixture
+def server(http_server):
+    httpd = http_server(_Handler)
+    httpd.requests = []
+    httpd.statuses = []
+    httpd.delay = 0
+    httpd.lock = threading.Lock()
+    httpd.active = 0
+    httpd.max_active = 0
+    return httpd
+
+
+@pytest.fixture
+def client(server):
+    client = RestClient(server.url, backoff_factor=0)
+    yield client
+    client.close()
+
+
+def test_request_kwargs_not_shared(server, client):
+    client.get("first", headers={"X-Test": "yes"}, params={"a": "1"})
+    client.get("second")
+    (_, first_path, first_headers), (_, second_path, second_headers) = server.requests
+    assert first_path == "/first?a=1"
+    assert first_headers["X-Test"] == "yes"
+    assert first_headers["Content-type"] == "application/json"
+    assert second_path == "/second"
+    assert "X-Test" not in second_headers
+    assert second_headers["Content-type"] == "application/json"
+
+
+def test_retry_idempotent(server, client):
+    server.statuses = [503, 503]
+    assert client.get("status").json()["path"] == "/status"
+    assert len(server.requests) == 3
+
+
+def test_retry_exhausted(server, client):
+    server.statuses = [503] * 10
+    with pytest.raises(requests.HTTPError) as excinfo:
+        client.delete("hosts/1")
+    assert excinfo.value.response.status_code == 503
+    assert len(server.requests) == 4
+
+
+def test_no_retry_post(server, client):
+    server.statuses = [503]
+    with pytest.raises(requests.HTTPError):
+        client.post("consumers", {"name": "test"})
+    assert len(server.requests) == 1
+
+
+def test_body_logging(server, client, caplog):
+    with caplog.at_level(logging.INFO, logger="pytest_client_tools"):
+        client.post("consumers", {"name": "test"})
+    assert not caplog.records
+    with caplog.at_level(logging.DEBUG, logger="pytest_client_tools"):
+        client.post("consumers", {"name": "x" * 10000})
+    result = caplog.records[-1].getMessage()
+    assert result.startswith("result: <Response [200]>")
+    assert len(result) < 3000
+
+
+def test_async_client(server):
+    server.delay = 0.2
+    client = AsyncRestClient(server.url, concurrency=10)
+    responses = run_concurrently(*[client.get(f"hosts/{i}") for i in range(20)])
+    # concurrent requests, at most as many as the concurrency
+    assert 1 < server.max_active <= 10
+    assert [r.json()["path"] for r in responses] == [f"/hosts/{i}" for i in range(20)]
+    (response,) = run_concurrently(client.post("consumers", {"name": "test"}))
+    assert json.loads(response.json()["body"]) == {"name": "test"}
+    client.close()
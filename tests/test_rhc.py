@@ -0,0 +1,73 @@
+# SPDX-FileCopyrightText: Red Hat
+# SPDX-License-Identifier: MIT
+
+
+import pytest
+import toml
+
+from pytest_client_tools.rhc import RhcConfig
+
+
+def test_config_not_existing(tmp_path):
+    conf_file = tmp_path / "config.toml"
+    conf = RhcConfig(conf_file)
+    assert "log-level" not in conf
+    assert conf.get("log-level") is None
+    # nothing to save
+    conf.save()
+    assert not conf_file.exists()
+    conf["log-level"] = "trace"
+    conf.save()
+    assert toml.loads(conf_file.read_text()) == {"log-level": "trace"}
+
+
+def test_config_lazy_load(tmp_path):
+    conf_file = tmp_path / "config.toml"
+    conf = RhcConfig(conf_file)
+    # the file is read only when needed
+    conf_file.write_text('log-level = "error"\n')
+    assert conf["log-level"] == "error"
+    with pytest.raises(KeyError):
+        assert conf["broker"]
+
+
+def test_config_invalid(tmp_path):
+    conf_file = tmp_path / "config.toml"
+    conf_file.write_text("this is not TOML\n")
+    conf = RhcConfig(conf_file)
+    with pytest.raises(toml.TomlDecodeError):
+        conf["log-level"] = "trace"
+
+
+def test_config_set_keys(tmp_path):
+    conf_file = tmp_path / "config.toml"
+    conf_file.write_text(
+        """# a comment that is lost when saving
+log-level = "trace"
+cert-file = "/etc/pki/consumer/cert.pem"
+"""
+    )
+    conf = RhcConfig(conf_file)
+    # setting the same value does not mark the configuration as changed
+    conf["log-level"] = "trace"
+    assert not conf.dirty_keys
+    conf.save()
+    assert "# a comment" in conf_file.read_text()
+    conf["log-level"] = "debug"
+    del conf["cert-file"]
+    assert conf.dirty_keys == {"log-level", "cert-file"}
+    conf.save()
+    assert not conf.dirty_keys
+    assert toml.loads(conf_file.read_text()) == {"log-level": "debug"}
+    # no leftover temporary files
+    assert list(tmp_path.iterdir()) == [conf_file]
+
+
+def test_config_reload(tmp_path):
+    conf_file = tmp_path / "config.toml"
+    conf_file.write_text('log-level = "error"\n')
+    conf = RhcConfig(conf_file)
+    conf["log-level"] = "trace"
+    conf.reload()
+    assert not conf.dirty_keys
+    assert conf["log-level"] == "error"
@@ -0,0 +1,86 @@
+# SPDX-FileCopyrightText: Red Hat
+# SPDX-License-Identifier: MIT
+
+
+import json
+import os
+
+import pytest
+from dynaconf.validator import ValidationError
+
+# not importing TestConfig directly, otherwise pytest tries to collect it
+from pytest_client_tools import test_config
+
+
+@pytest.fixture
+def settings_dir(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "settings.toml").write_text(
+        """[default]
+candlepin.host = "candlepin.example.com"
+candlepin.port = 8443
+candlepin.prefix = "/candlepin"
+candlepin.activation_keys = ["key-1", "key-2"]
+candlepin.org = "1234"
+"""
+    )
+    yield tmp_path
+
+
+def test_config_values(settings_dir):
+    conf = test_config.TestConfig()
+    assert conf.get("candlepin", "host") == "candlepin.example.com"
+    assert conf.get("candlepin.port") == 8443
+    # validated and with defaults
+    assert conf.get("candlepin", "org") == "1234"
+    assert conf.get("candlepin", "insecure") is False
+    assert conf.get("insights", "insecure") is False
+    assert conf.is_external
+    with pytest.raises(KeyError):
+        conf.get("insights", "legacy_upload")
+    # returned values cannot change the configuration
+    conf.get("candlepin", "activation_keys").append("key-3")
+    assert conf.get("candlepin", "activation_keys") == ["key-1", "key-2"]
+
+
+def test_config_snapshot(settings_dir, monkeypatch):
+    snapshot = test_config.TestConfig().snapshot()
+    # the snapshot is serializable
+    snapshot = json.loads(json.dumps(snapshot))
+
+    def fail(*args, **kwargs):
+        raise AssertionError("the configuration must not be read")
+
+    with monkeypatch.context() as m:
+        m.setattr(test_config.TestConfig, "_read_settings", staticmethod(fail))
+        conf = test_config.TestConfig(snapshot=snapshot)
+        assert conf.get("candlepin", "host") == "candlepin.example.com"
+        assert conf.snapshot() == snapshot
+
+
+@pytest.mark.parametrize("change", ["file", "environ"])
+def test_config_snapshot_outdated(change, settings_dir, monkeypatch):
+    snapshot = test_config.TestConfig().snapshot()
+    if change == "file":
+        settings_file = settings_dir / "settings.toml"
+        settings_file.write_text(
+            settings_file.read_text().replace("candlepin.example.com", "other")
+        )
+        # make sure the modification time changes
+        st = settings_file.stat()
+        os.utime(str(settings_file), ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+    else:
+        monkeypatch.setenv("PYTEST_CLIENT_TOOLS_CANDLEPIN__HOST", "other")
+    conf = test_config.TestConfig(snapshot=snapshot)
+    assert conf.get("candlepin", "host") == "other"
+
+
+def test_config_insights_credentials(settings_dir, monkeypatch):
+    monkeypatch.setenv("PYTEST_CLIENT_TOOLS_INSIGHTS__USERNAME", "user")
+    # the password is required together with the username
+    with pytest.raises(ValidationError):
+        test_config.TestConfig()
+    monkeypatch.setenv("PYTEST_CLIENT_TOOLS_INSIGHTS__PASSWORD", "secret")
+    conf = test_config.TestConfig()
+    assert conf.get("insights", "username") == "user"
+    assert conf.get("insights", "password") == "secret"
@@ -0,0 +1,86 @@
+# SPDX-FileCopyrightText: Red Hat
+# SPDX-License-Identifier: MIT
+
+
+import threading
+import time
+
+import pytest
+
+from pytest_client_tools import tool_logs
+from pytest_client_tools.tool_logs import LogFollower, LogTimeoutError, ToolLogs
+
+
+def _append(path, text):
+    with open(path, "a") as f:
+        f.write(text)
+
+
+def test_follower(tmp_path):
+    log = tmp_path / "tool.log"
+    log.write_text("old line\n")
+    follower = LogFollower(log)
+    assert follower.read() == []
+    _append(log, "first\nsec")
+    assert follower.read() == ["first"]
+    _append(log, "ond\n")
+    assert follower.read() == ["second"]
+    # rotation
+    _append(log, "last before rotation")
+    log.rename(tmp_path / "tool.log.1")
+    log.write_text("after rotation\n")
+    assert follower.read() == ["last before rotation", "after rotation"]
+    # truncation
+    log.write_text("truncated\n")
+    assert follower.read() == ["truncated"]
+    log.unlink()
+    assert follower.read() == []
+    log.write_text("created again\n")
+    assert follower.read() == ["created again"]
+
+
+def test_follower_missing_at_start(tmp_path):
+    follower = LogFollower(tmp_path / "tool.log")
+    assert follower.read() == []
+    (tmp_path / "tool.log").write_text("line\n")
+    assert follower.read() == ["line"]
+
+
+def test_tool_logs(tmp_path):
+    logs = {"a": tmp_path / "a.log", "b": tmp_path / "b.log"}
+    logs["a"].write_text("before\n")
+    tl = ToolLogs(logs)
+    _append(logs["a"], "a1\n")
+    _append(logs["b"], "b1 id=42\n")
+    assert tl.new_lines("a") == ["a1"]
+    _append(logs["a"], "a2\n")
+    assert tl.new_lines() == ["a1", "a2", "b1 id=42"]
+    assert tl.search(r"id=(\d+)").group(1) == "42"
+    assert tl.search(r"id=", log="a") is None
+    with pytest.raises(KeyError):
+        tl.new_lines("c")
+
+
+@pytest.mark.parametrize("inotify", [True, False])
+def test_wait_for(tmp_path, monkeypatch, inotify):
+    def no_inotify(directories):
+        raise OSError("inotify not available")
+
+    if not inotify:
+        monkeypatch.setattr(tool_logs, "_Inotify", no_inotify)
+    log = tmp_path / "tool.log"
+    tl = ToolLogs({"tool": log})
+    watcher = tl._watcher(["tool"])
+    watcher.close()
+    assert isinstance(watcher, tool_logs._Polling) != inotify
+    timer = threading.Timer(0.2, _append, [log, "working\ndone: ok\n"])
+    timer.start()
+    start = time.monotonic()
+    try:
+        m = tl.wait_for(r"done: (\w+)", timeout=5)
+    finally:
+        timer.join()
+    assert m.group(1) == "ok"
+    assert time.monotonic() - start < 0.9
+    with pytest.raises(LogTimeoutError):
+        tl.wait_for("never", timeout=0.2)
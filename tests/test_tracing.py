@@ -0,0 +1,154 @@
+# SPDX-FileCopyrightText: Red Hat
+# SPDX-License-Identifier: MIT
+
+
+import json
+
+import pytest
+
+from pytest_client_tools.tracing import Tracer
+
+
+def test_tracer_disabled(tmp_path):
+    tracer = Tracer()
+    with tracer.span("op", "cat") as span:
+        span.set(foo="bar")
+    tracer.write(tmp_path / "trace.json")
+    doc = json.loads((tmp_path / "trace.json").read_text())
+    assert [e["ph"] for e in doc["traceEvents"]] == ["M"]
+
+
+def test_tracer_events(tmp_path):
+    tracer = Tracer()
+    tracer.enabled = True
+    tracer.nodeid = "test.py::test"
+    with tracer.span("op", "cat", a=1) as span:
+        span.set(b=2)
+    with pytest.raises(ValueError):
+        with tracer.span("failing", "cat"):
+            raise ValueError()
+    other = Tracer()
+    other.enabled = True
+    other.worker_id = "gw1"
+    with other.span("other", "cat"):
+        pass
+    other.write(tmp_path / "trace.json.gw1")
+    tracer.write(tmp_path / "trace.json", [tmp_path / "trace.json.gw1"])
+    assert not (tmp_path / "trace.json.gw1").exists()
+    doc = json.loads((tmp_path / "trace.json").read_text())
+    events = {e["name"]: e for e in doc["traceEvents"] if e["ph"] == "X"}
+    assert events["op"]["args"] == {
+        "a": 1,
+        "b": 2,
+        "nodeid": "test.py::test",
+        "worker": "main",
+    }
+    assert events["op"]["dur"] >= 0
+    assert events["failing"]["args"]["error"] == "ValueError"
+    assert events["other"]["args"]["worker"] == "gw1"
+
+
+def test_trace_session(pytester, run_with_plugin):
+    pytester.makepyfile(
+        """
+        import sys
+
+        import pytest
+
+        from pytest_client_tools.util import logged_run
+
+
+        @pytest.fixture
+        def myfixture():
+            yield
+            logged_run([sys.executable, "-c", "pass"])
+
+
+        def test_run(myfixture):
+            logged_run([sys.executable, "-c", "pass"])
+        """
+    )
+    result = run_with_plugin("--client-tools-trace=trace.json")
+    result.assert_outcomes(passed=1)
+    doc = json.loads((pytester.path / "trace.json").read_text())
+    events = [e for e in doc["traceEvents"] if e["ph"] == "X"]
+    names = [e["name"] for e in events]
+    assert "setup myfixture" in names
+    assert "teardown myfixture" in names
+    runs = [e for e in events if e["cat"] == "subprocess"]
+    assert len(runs) == 2
+    assert all(e["args"]["nodeid"] == "test_trace_session.py::test_run" for e in runs)
+    teardown = next(e for e in events if e["name"] == "teardown myfixture")
+    # the command run in the teardown is within its span
+    assert teardown["ts"] <= runs[1]["ts"]
+    assert runs[1]["ts"] + runs[1]["dur"] <= teardown["ts"] + teardown["dur"]
+
+
+def test_hooks(pytester, run_with_plugin):
+    pytester.makeconftest(
+        """
+        import json
+
+        SPANS = []
+        METRICS = []
+
+
+        def pytest_client_tools_span_start(span):
+            assert span.end is None
+            SPANS.append(("start", span.category, span.name))
+
+
+        def pytest_client_tools_span_end(span):
+            assert span.duration >= 0
+            SPANS.append(("end", span.category, span.name, span.args["nodeid"]))
+
+
+        def pytest_client_tools_metric(name, value, tags):
+            METRICS.append((name, tags["tool"], tags["returncode"]))
+
+
+        def pytest_sessionfinish(session):
+            with open("hooks.json", "w") as f:
+                json.dump({"spans": SPANS, "metrics": METRICS}, f)
+        """
+    )
+    pytester.makepyfile(
+        """
+        import sys
+
+        from pytest_client_tools.tracing import TRACER
+        from pytest_client_tools.util import logged_run
+
+
+        def test_run():
+            assert TRACER.active
+            logged_run([sys.executable, "-c", "pass"])
+        """
+    )
+    result = run_with_plugin()
+    result.assert_outcomes(passed=1)
+    doc = json.loads((pytester.path / "hooks.json").read_text())
+    subprocess_spans = [s for s in doc["spans"] if s[1] == "subprocess"]
+    assert [s[0] for s in subprocess_spans] == ["start", "end"]
+    assert subprocess_spans[1][3] == "test_hooks.py::test_run"
+    assert sorted(m[0] for m in doc["metrics"]) == [
+        "command.cpu_time",
+        "command.max_rss",
+        "command.wall_time",
+    ]
+
+
+def test_no_hooks(pytester, run_with_plugin):
+    pytester.makepyfile(
+        """
+        from pytest_client_tools.tracing import TRACER
+
+
+        def test_inactive():
+            assert not TRACER.active
+            with TRACER.span("op", "cat") as span:
+                assert span.__class__.__name__ == "_NullSpan"
+        """
+    )
+    result = run_with_plugin()
+    result.assert_outcomes(passed=1)
@@ -2,9 +2,30 @@
 # SPDX-License-Identifier: MIT
 
 
+import json
+import os
+import subprocess
+import sys
+import time
+
 import pytest
 
-from pytest_client_tools.util import redact_arguments
+from pytest_client_tools import util
+from pytest_client_tools.rhc import Rhc
+from pytest_client_tools.subscription_manager import SubscriptionManager
+from pytest_client_tools.tracing import Tracer
+from pytest_client_tools.util import (
+    ArtifactsCollector,
+    CommandStats,
+    CommandTimeoutError,
+    CommandTimeouts,
+    StreamedProcess,
+    async_logged_run,
+    ProcessResources,
+    logged_run,
+    redact_arguments,
+    run_concurrently,
+)
 
 
 @pytest.mark.parametrize(
@@ -31,3 +52,304 @@ from pytest_client_tools.util import redact_arguments
 )
 def test_redact_arguments(args, redact_list, expected_args):
     assert redact_arguments(args, redact_list) == expected_args
+
+
+def test_logged_run_resources(monkeypatch):
+    stats = CommandStats()
+    monkeypatch.setattr(util, "COMMAND_STATS", stats)
+    proc = logged_run(
+        [sys.executable, "-c", "print(sum(range(1000000)))"],
+        check=True,
+        stdout=subprocess.PIPE,
+        text=True,
+    )
+    assert proc.stdout.strip() == str(sum(range(1000000)))
+    assert proc.resources.wall_time > 0
+    assert proc.resources.cpu_time > 0
+    assert proc.resources.max_rss > 0
+    records = stats.to_records()
+    assert len(records) == 1
+    assert records[0]["subcommand"] == "-c"
+    assert records[0]["calls"] == 1
+
+
+def test_logged_run_failure_resources(monkeypatch):
+    stats = CommandStats()
+    monkeypatch.setattr(util, "COMMAND_STATS", stats)
+    with pytest.raises(subprocess.CalledProcessError) as excinfo:
+        logged_run(
+            [sys.executable, "-c", "import sys; sys.exit(3)"],
+            check=True,
+            logged_args=["<hidden>"],
+        )
+    assert excinfo.value.cmd == ["<hidden>"]
+    assert stats.to_records()[0]["calls"] == 1
+
+
+def test_logged_run_internal(monkeypatch):
+    stats = CommandStats()
+    monkeypatch.setattr(util, "COMMAND_STATS", stats)
+    proc = logged_run([sys.executable, "-c", "pass"], check=True, internal=True)
+    assert proc.resources.wall_time > 0
+    assert not stats
+
+
+def test_streamed_process_poll_resources(monkeypatch):
+    monkeypatch.setattr(util, "COMMAND_STATS", CommandStats())
+    monkeypatch.setattr(ArtifactsCollector, "current", None)
+    proc = StreamedProcess([sys.executable, "-c", "print(sum(range(1000000)))"])
+    # reaping the process by polling it must not lose its resources
+    while proc.returncode is None:
+        time.sleep(0.01)
+    proc.wait()
+    assert proc.resources.cpu_time > 0
+    assert proc.resources.max_rss > 0
+
+
+@pytest.mark.parametrize(
+    "args,expected_key",
+    [
+        (
+            ["/usr/bin/subscription-manager", "identity"],
+            ("subscription-manager", "identity"),
+        ),
+        (["insights-client", "--status"], ("insights-client", "--status")),
+        (["insights-client", "--group=secret"], ("insights-client", "--group")),
+        (["rhc"], ("rhc", "")),
+        ("ausearch -i -m user", ("ausearch", "-i")),
+    ],
+)
+def test_command_stats_key(args, expected_key):
+    assert CommandStats.command_key(args) == expected_key
+
+
+def test_command_stats_aggregate():
+    stats = CommandStats()
+    assert not stats
+    stats.add(["rhc", "status"], ProcessResources(1.0, 0.5, 0.25, 1000))
+    stats.add(["rhc", "status"], ProcessResources(2.0, 0.5, 0.25, 3000))
+    stats.add(["rhc", "connect"], ProcessResources(4.0, 1.0, 1.0, 2000))
+    stats.add(["rhc", "connect"], ProcessResources(0.5))
+    assert stats
+    merged = CommandStats()
+    merged.merge(stats.to_records())
+    merged.merge(stats.to_records())
+    doc = json.loads(merged.to_json())
+    assert doc["tools"] == [
+        {
+            "tool": "rhc",
+            "calls": 8,
+            "wall_time": 15.0,
+            "user_time": 4.0,
+            "system_time": 3.0,
+            "max_rss": 3000,
+        }
+    ]
+    assert [(r["subcommand"], r["calls"]) for r in doc["commands"]] == [
+        ("connect", 4),
+        ("status", 4),
+    ]
+    table = merged.format_table()
+    assert len(table) == 3
+    assert table[1].split()[:3] == ["rhc", "connect", "4"]
+
+
+def test_command_timeouts():
+    timeouts = CommandTimeouts()
+    assert timeouts.get(["rhc", "connect"]) is None
+    timeouts.set_from_spec("default=60")
+    timeouts.set_from_spec("rhc=120")
+    timeouts.set_from_spec("insights-client --register=300.5")
+    assert timeouts.get(["/usr/bin/rhc", "connect"]) == 120
+    assert timeouts.get(["insights-client", "--register"]) == 300.5
+    assert timeouts.get(["insights-client", "--status"]) == 60
+    assert timeouts.get(["subscription-manager", "identity"]) == 60
+    for spec in ("rhc", "=5", "a b c=5", "rhc=soon"):
+        with pytest.raises(ValueError):
+            timeouts.set_from_spec(spec)
+
+
+def test_logged_run_timeout_kills_process_group(monkeypatch, tmp_path):
+    stats = CommandStats()
+    timeouts = CommandTimeouts()
+    timeouts.set(0.5, os.path.basename(sys.executable))
+    monkeypatch.setattr(util, "COMMAND_STATS", stats)
+    monkeypatch.setattr(util, "COMMAND_TIMEOUTS", timeouts)
+    pid_file = tmp_path / "pid"
+    script = (
+        "import subprocess, sys; "
+        "p = subprocess.Popen(['sleep', '60']); "
+        f"open({str(pid_file)!r}, 'w').write(str(p.pid)); "
+        "print('partial', flush=True); "
+        "p.wait()"
+    )
+    start = time.monotonic()
+    with pytest.raises(CommandTimeoutError) as excinfo:
+        logged_run(
+            [sys.executable, "-c", script],
+            stdout=subprocess.PIPE,
+            text=True,
+            logged_args=["<hidden>"],
+        )
+    assert time.monotonic() - start < 10
+    assert excinfo.value.cmd == ["<hidden>"]
+    assert excinfo.value.timeout == 0.5
+    assert excinfo.value.output.strip() == "partial"
+    assert "process group was killed" in str(excinfo.value)
+    assert stats.to_records()[0]["calls"] == 1
+    grandchild = int(pid_file.read_text())
+    state = None
+    for _ in range(50):
+        try:
+            with open(f"/proc/{grandchild}/stat") as f:
+                state = f.read().rsplit(")", 1)[1].split()[0]
+        except FileNotFoundError:
+            state = None
+        # a killed process not reaped yet is a zombie
+        if state in (None, "Z"):
+            break
+        time.sleep(0.1)
+    assert state in (None, "Z")
+
+
+def test_streamed_process(monkeypatch, tmp_path):
+    stats = CommandStats()
+    monkeypatch.setattr(util, "COMMAND_STATS", stats)
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(ArtifactsCollector, "current", ArtifactsCollector())
+    script = (
+        "import sys; "
+        "[print(i) for i in range(100)]; "
+        "print('error', file=sys.stderr); "
+        "sys.exit(2)"
+    )
+    with StreamedProcess([sys.executable, "-c", script], check=True, tail=5) as proc:
+        assert next(iter(proc)) == "0"
+        with pytest.raises(subprocess.CalledProcessError):
+            proc.wait()
+    assert list(proc.tail) == ["96", "97", "98", "99", "error"]
+    assert proc.returncode == 2
+    assert proc.resources.wall_time > 0
+    assert stats.to_records()[0]["calls"] == 1
+    (artifact,) = (tmp_path / "artifacts").glob("output-*.log")
+    assert artifact.read_text().splitlines() == [str(i) for i in range(100)] + ["error"]
+
+
+def test_streamed_process_stop_early(monkeypatch):
+    monkeypatch.setattr(util, "COMMAND_STATS", CommandStats())
+    monkeypatch.setattr(ArtifactsCollector, "current", None)
+    script = "import time; print('ready', flush=True); time.sleep(60)"
+    start = time.monotonic()
+    with StreamedProcess([sys.executable, "-c", script], check=True) as proc:
+        for line in proc:
+            if line == "ready":
+                break
+    assert time.monotonic() - start < 10
+    assert proc.returncode < 0
+    assert proc.tail[-1] == "ready"
+
+
+def test_streamed_process_start_failure(monkeypatch, tmp_path):
+    tracer = Tracer()
+    tracer.enabled = True
+    monkeypatch.setattr(util, "TRACER", tracer)
+    monkeypatch.setattr(ArtifactsCollector, "current", None)
+    with pytest.raises(FileNotFoundError):
+        StreamedProcess([str(tmp_path / "missing")])
+    tracer.write(tmp_path / "trace.json")
+    doc = json.loads((tmp_path / "trace.json").read_text())
+    (event,) = [e for e in doc["traceEvents"] if e["ph"] == "X"]
+    assert event["args"]["error"] == "FileNotFoundError"
+
+
+def test_streamed_process_timeout(monkeypatch):
+    monkeypatch.setattr(util, "COMMAND_STATS", CommandStats())
+    monkeypatch.setattr(ArtifactsCollector, "current", None)
+    script = "import time; print('partial', flush=True); time.sleep(60)"
+    proc = StreamedProcess([sys.executable, "-c", script], timeout=0.5)
+    with pytest.raises(CommandTimeoutError) as excinfo:
+        list(proc)
+    assert excinfo.value.output == "partial"
+
+
+def _assert_overlap(log):
+    # all the commands were running at the same time, i.e. concurrently
+    spans = [tuple(map(float, line.split())) for line in log.read_text().splitlines()]
+    assert max(start for start, _ in spans) < min(end for _, end in spans)
+
+
+_TIMED_SCRIPT = """
+import sys, time
+start = time.time()
+time.sleep(0.5)
+with open({log!r}, "a") as f:
+    f.write(f"{{start}} {{time.time()}}\\n")
+"""
+
+
+def test_async_logged_run(monkeypatch, tmp_path):
+    stats = CommandStats()
+    monkeypatch.setattr(util, "COMMAND_STATS", stats)
+    log = tmp_path / "times"
+    script = _TIMED_SCRIPT.format(log=str(log)) + "print(sys.stdin.read().upper())"
+    procs = run_concurrently(
+        *[
+            async_logged_run(
+                [sys.executable, "-c", script],
+                input=f"input {i}".encode(),
+                stdout=subprocess.PIPE,
+                text=True,
+                check=True,
+            )
+            for i in range(3)
+        ]
+    )
+    _assert_overlap(log)
+    assert [p.stdout for p in procs] == [f"INPUT {i}\n" for i in range(3)]
+    assert all(p.resources.wall_time >= 0.5 for p in procs)
+    assert stats.to_records()[0]["calls"] == 3
+
+
+def test_async_logged_run_errors(monkeypatch):
+    monkeypatch.setattr(util, "COMMAND_STATS", CommandStats())
+    script = "import sys; print('partial', flush=True); sys.exit(int(sys.argv[1]))"
+
+    async def run(code, **kwargs):
+        return await async_logged_run(
+            [sys.executable, "-c", script, code],
+            logged_args=["<hidden>"],
+            stdout=subprocess.PIPE,
+            **kwargs,
+        )
+
+    with pytest.raises(subprocess.CalledProcessError) as excinfo:
+        run_concurrently(run("3", check=True))
+    assert excinfo.value.cmd == ["<hidden>"]
+    assert excinfo.value.output == b"partial\n"
+    sleeper = "import time; print('partial', flush=True); time.sleep(60)"
+    with pytest.raises(CommandTimeoutError) as excinfo:
+        run_concurrently(
+            async_logged_run(
+                [sys.executable, "-c", sleeper], stdout=subprocess.PIPE, timeout=0.5
+            )
+        )
+    assert excinfo.value.output == b"partial\n"
+
+
+def test_async_is_registered(monkeypatch, tmp_path):
+    monkeypatch.setattr(util, "COMMAND_STATS", CommandStats())
+    bindir = tmp_path / "bin"
+    bindir.mkdir()
+    log = tmp_path / "times"
+    script = f"#!{sys.executable}\n" + _TIMED_SCRIPT.format(log=str(log))
+    (bindir / "subscription-manager").write_text(script + "sys.exit(1)\n")
+    (bindir / "rhc").write_text(script + "print('{\"rhsm_connected\": true}')\n")
+    for tool in bindir.iterdir():
+        tool.chmod(0o755)
+    monkeypatch.setenv("PATH", str(bindir), prepend=os.pathsep)
+    registered = run_concurrently(
+        SubscriptionManager().async_is_registered(),
+        Rhc().async_is_registered(),
+    )
+    _assert_overlap(log)
+    assert registered == [False, True]